@@ -2,7 +2,19 @@ import os
 import requests
 import json
 import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 from datetime import datetime
+from market_stream import load_snapshot
+from outbox import Outbox
+from rate_limit import SlidingWindowLimiter, BinanceWeightScheduler
+from coinalyze_batch import CoinalyzeBatcher
+from meta_cache import MetaCache, perp_universe
+from candle_store import DailyCandleStore
+from kline_cache import KlinePanel
+from indicators import compute, latest_table, overheated
+from series_cache import SeriesCache, percentile_rank, DAY_MS
 
 # ==================== CONFIGURATION ====================
 # API Keys
@@ -11,10 +23,41 @@ COINGLASS_API_KEY = os.environ.get("COINGLASS_SECRET") or "438d3e0c3aaa4fdd9caa5
 COINALYZE_API_KEY = os.environ.get("COINALYZE_KEY") or "af1e3712-4a26-4293-bba4-579f6b736daa"
 DISCORD_WEBHOOK_URL = os.environ.get("DISCORD_WEBHOOK_URL") or "https://discord.com/api/webhooks/1469265206646542348/cBUvNdqBZgji_AY7huzVjVbQ-XEkDAL3A0Z1snmdc2IEaFFN5yAxenAgrEuqaIVPllme"
 
+# A Discord 429 asking for a longer pause than this is left to the outbox backoff instead of waited out inline
+DISCORD_MAX_RETRY_AFTER = 60
+DISCORD_MAX_RETRIES = 3
+
+# Coinglass on-chain index series (cached locally, see series_cache.py)
+COINGLASS_API = "https://open-api-v4.coinglass.com/api"
+COINGLASS_SERIES = {
+    'sth_realized_price': 'bitcoin-sth-realized-price',
+    'mvrv_z': 'bitcoin-mvrv-z-score',
+}
+
+# Coinalyze allows 40 requests per minute; one limiter is shared by every Coinalyze call
+COINALYZE_API = "https://api.coinalyze.net/v1"
+coinalyze_limiter = SlidingWindowLimiter(limit=40, window=60)
+
+# Seconds (from the start of the gather phase) each source has to deliver before it is reported as N/A.
+# Coinalyze is paced at 40 requests/minute, so it gets the longest budget.
+SOURCE_DEADLINES = {
+    'binance': 20,
+    'coinalyze': 150,
+    'fear_greed': 15,
+    'candles': 30,
+    'alts': 90,
+    'onchain': 20,
+}
+
 # Thresholds
 ALTS_OI_REL_THRESHOLD = 0.55  # Warning if Alts OI > 55% of Total
 VOLUME_SPIKE_THRESHOLD = 0.9  # Warning if Alt Volume > 90% of BTC Volume
 
+# Alt indicator scan: top perps by 24h volume, on a cached daily-kline panel
+NON_ALTS = ['BTCUSDT', 'ETHUSDT', 'USDCUSDT', 'FDUSDUSDT']
+ALT_UNIVERSE = 300
+ALT_PANEL_DAYS = 400
+
 # ==================== DATA FETCHER ====================
 class DataFetcher:
     def __init__(self):
@@ -28,10 +71,21 @@ class DataFetcher:
             "api_key": COINALYZE_API_KEY.strip(),
             "accept": "application/json"
         }
+        self.last_status = None   # HTTP status of the last failed Coinalyze call
+        # Packs multi-symbol Coinalyze lookups and remembers markets that never return data
+        self.batcher = CoinalyzeBatcher(self)
+        # Local weight budget for Binance klines (many symbols are fetched in parallel)
+        self.binance_limiter = BinanceWeightScheduler()
+        # Disk cache for slow-changing metadata (market catalogue), refreshed in the background
+        self.meta = MetaCache()
     
     # ... (binance 24hr ticker remains same or similar)
     def get_binance_ticker_24hr(self):
         """Fetch 24hr ticker data from Binance"""
+        # Prefer the live snapshot written by market_stream.py (no request weight)
+        snapshot = load_snapshot()
+        if snapshot:
+            return [x for x in snapshot[0] if x['symbol'].endswith('USDT')]
         try:
             url = "https://fapi.binance.com/fapi/v1/ticker/24hr"
             resp = requests.get(url, timeout=10)
@@ -47,6 +101,17 @@ class DataFetcher:
             # So fallback is complex for full list, but we can potentially handle single price later.
             return []
             
+    def get_perp_universe(self):
+        """Trading USDT-margined perpetuals (cached on disk, shared TTL with main.py); None if unavailable"""
+        def load():
+            url = "https://fapi.binance.com/fapi/v1/exchangeInfo"
+            self.binance_limiter.acquire(url)
+            resp = requests.get(url, timeout=10)
+            self.binance_limiter.observe(url, resp.status_code, resp.headers)
+            resp.raise_for_status()
+            return perp_universe(resp.json())
+        return self.meta.get('binance_perp_universe', load)
+
     def get_btc_price_fallback(self):
         """Fallback to get BTC price from Spot API"""
         try:
@@ -57,8 +122,8 @@ class DataFetcher:
         except:
             return 0
 
-    def get_binance_daily_candles(self, symbol="BTCUSDT", limit=250):
-        """Fetch daily candles for MA calculation"""
+    def get_binance_daily_candles(self, symbol="BTCUSDT", limit=250, start_time=None):
+        """Fetch daily candles for MA calculation (from start_time, ms, when given)"""
         # Endpoint: https://fapi.binance.com/fapi/v1/klines
         try:
             url = "https://fapi.binance.com/fapi/v1/klines"
@@ -67,7 +132,11 @@ class DataFetcher:
                 "interval": "1d",
                 "limit": limit
             }
+            if start_time is not None:
+                params["startTime"] = int(start_time)
+            self.binance_limiter.acquire(f"{url}?limit={limit}")
             resp = requests.get(url, params=params, timeout=10)
+            self.binance_limiter.observe(url, resp.status_code, resp.headers)
             resp.raise_for_status()
             # Returns list of lists: [ [open_time, open, high, low, close, ...], ... ]
             return resp.json()
@@ -90,202 +159,268 @@ class DataFetcher:
             print(f"Error fetching F&G: {e}")
             return None
 
-    def get_coinalyze_funding(self, symbols):
-        """Fetch predicted funding rates (Deprecated)"""
-        url = "https://api.coinalyze.net/v1/predicted-funding-rate"
-        try:
-            params = {"symbols": symbols}
-            resp = requests.get(url, params=params, headers=self.coinalyze_headers, timeout=10)
+    def coinalyze_get(self, path, params=None, timeout=15, retries=3):
+        """GET a Coinalyze endpoint under the shared rate limit; returns parsed JSON or None"""
+        url = f"{COINALYZE_API}/{path}"
+        self.last_status = None   # a network error must not leave a previous call's status behind
+        for attempt in range(retries):
+            coinalyze_limiter.acquire()
+            try:
+                resp = requests.get(url, params=params, headers=self.coinalyze_headers, timeout=timeout)
+            except Exception as e:
+                print(f"Error fetching Coinalyze {path}: {e}")
+                continue
+            self.last_status = resp.status_code
             if resp.status_code == 200:
                 return resp.json()
+            if resp.status_code == 429:
+                # Retry-After applies to every Coinalyze call, not just this one
+                wait_time = float(resp.headers.get('Retry-After', 5)) + 1
+                print(f"Coinalyze rate limited. Pausing Coinalyze calls for {wait_time:.1f}s...")
+                coinalyze_limiter.pause(wait_time)
+                continue
+            try:
+                print(f"Coinalyze {path} Error: {resp.status_code} {resp.text}")
+            except: pass
             return None
-        except Exception as e:
-            print(f"Error fetching Predicted Funding: {e}")
-            return None
+        return None
+
+    def get_coinalyze_funding(self, symbols):
+        """Fetch predicted funding rates (Deprecated)"""
+        return self.coinalyze_get("predicted-funding-rate", {"symbols": symbols}, timeout=10)
 
     def get_coinalyze_current_funding(self, symbols):
         """Fetch CURRENT funding rates"""
-        url = "https://api.coinalyze.net/v1/funding-rate"
-        try:
-            params = {"symbols": symbols}
-            resp = requests.get(url, params=params, headers=self.coinalyze_headers, timeout=10)
-            if resp.status_code == 200:
-                return resp.json()
-            return None
-        except Exception as e:
-            print(f"Error fetching Current Funding: {e}")
-            return None
+        return self.coinalyze_get("funding-rate", {"symbols": symbols}, timeout=10)
 
     def get_future_markets(self):
-        """Fetch list of supported future markets"""
-        url = f"https://api.coinalyze.net/v1/future-markets"
-        
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                resp = requests.get(url, headers=self.coinalyze_headers, timeout=15)
-                if resp.status_code == 200:
-                    return resp.json()
-                elif resp.status_code == 429:
-                    wait_time = float(resp.headers.get('Retry-After', 5)) + 1
-                    print(f"Markets fetch rate limited. Waiting {wait_time:.1f}s...")
-                    time.sleep(wait_time)
-                    continue
-                else:
-                    try:
-                        print(f"Coinalyze Markets Error: {resp.status_code} {resp.text}")
-                    except: pass
-                    return []
-            except Exception as e:
-                print(f"Error fetching Coinalyze Markets: {e}")
-                return []
-        return []
+        """Fetch list of supported future markets (cached on disk for a day)"""
+        return self.meta.get('coinalyze_future_markets', lambda: self.coinalyze_get("future-markets")) or []
 
     def get_coinalyze_oi(self, symbols_list=None):
         """Fetch Open Interest from Coinalyze"""
         if not symbols_list:
             return []
-            
-        try:
-            url = f"https://api.coinalyze.net/v1/open-interest"
-            symbols_str = ",".join(symbols_list)
-            params = {"symbols": symbols_str}
-            
-            # Simple retry logic
-            max_retries = 3
-            for attempt in range(max_retries):
-                resp = requests.get(url, params=params, headers=self.coinalyze_headers, timeout=15)
-                
-                if resp.status_code == 200:
-                    return resp.json()
-                elif resp.status_code == 429:
-                    # Rate limited
-                    wait_time = float(resp.headers.get('Retry-After', 5)) + 1
-                    print(f"Rate limited. Waiting {wait_time:.1f}s...")
-                    time.sleep(wait_time)
-                    continue
-                else:
-                    print(f"Coinalyze OI Error: {resp.status_code} {resp.text}")
-                    return []
-            return []
-        except Exception as e:
-            print(f"Error fetching Coinalyze OI: {e}")
-            return []
+        return self.coinalyze_get("open-interest", {"symbols": ",".join(symbols_list)}) or []
 
     def get_all_open_interest(self, markets):
         """Fetch Open Interest for ALL markets in batches"""
         if not markets:
             return {}
-            
-        all_oi_data = {}
-        # Batch size 100 (Max allowed by API is often higher, but 100 is safe)
-        batch_size = 100
-        symbols = [m['symbol'] for m in markets]
-        
-        print(f"Fetching OI for {len(symbols)} markets (~{len(symbols)//batch_size + 1} requests)...")
-        print("Note: Throttling to avoid rate limits (approx 1 min total).")
-        
-        for i in range(0, len(symbols), batch_size):
-            batch = symbols[i:i+batch_size]
-            try:
-                url = f"https://api.coinalyze.net/v1/open-interest"
-                symbols_str = ",".join(batch)
-                params = {"symbols": symbols_str}
-                
-                # Retry logic
-                for attempt in range(3):
-                    try:
-                        resp = requests.get(url, params=params, headers=self.coinalyze_headers, timeout=20)
-                        if resp.status_code == 200:
-                            data = resp.json()
-                            if data:
-                                for item in data:
-                                    all_oi_data[item['symbol']] = float(item.get('value', 0))
-                            break # Success
-                        elif resp.status_code == 429:
-                            wait = float(resp.headers.get('Retry-After', 5)) + 1
-                            print(f"Rate limit hit. Waiting {wait:.1f}s...")
-                            time.sleep(wait)
-                            continue
-                        else:
-                            print(f"Batch Error: {resp.status_code}")
-                            break
-                    except Exception as err:
-                        print(f"Batch Exception: {err}")
-                        time.sleep(1)
-                
-                # Coinalyze Rate Limit: 40 requests per minute
-                # 60s / 40 = 1.5s per request.
-                # We sleep 1.6s to be safe and avoid hitting 429.
-                time.sleep(1.6)
-                
-            except Exception as e:
-                print(f"Error in batch {i}: {e}")
-                
-        return all_oi_data
+        oi, _ = self.get_oi_and_funding([m['symbol'] for m in markets], [])
+        return oi
 
-    def get_coinglass_sth_price(self):
-        """Fetch STH Realized Price"""
-        # Endpoint: https://open-api-v4.coinglass.com/api/index/bitcoin-sth-realized-price (guess based on slug)
-        # Actually standard charts are usually under /index/
+    def get_oi_and_funding(self, oi_symbols, funding_symbols):
+        """OI and current funding for two (usually overlapping) symbol sets, planned together"""
+        res = self.batcher.fetch({"open-interest": oi_symbols, "funding-rate": funding_symbols})
+        print(f"Coinalyze: {self.batcher.requests} requests for {len(oi_symbols)} OI / "
+              f"{len(funding_symbols)} funding symbols")
+        self.batcher.save()
+        oi = {sym: float(x.get('value', 0)) for sym, x in res["open-interest"].items()}
+        funding = {sym: float(x.get('value', 0)) for sym, x in res["funding-rate"].items()}
+        return oi, funding
+
+    def get_coinglass_index(self, slug, start_time=None):
+        """Raw Coinglass index series (points after start_time, ms, when given); None on failure"""
         try:
-            url = "https://open-api-v4.coinglass.com/api/index/bitcoin-sth-realized-price"
-            resp = requests.get(url, headers=self.coinglass_headers, timeout=10)
-            
+            params = {"startTime": int(start_time)} if start_time else None
+            resp = requests.get(f"{COINGLASS_API}/index/{slug}", params=params,
+                                headers=self.coinglass_headers, timeout=10)
             if resp.status_code == 200:
                 data = resp.json()
-                if data.get('code') == '0' and data.get('data'):
-                    # Data format might be list of [time, value]
-                    # Or 'data': [{'t':..., 'v':...}]
-                    series = data.get('data', [])
-                    if series:
-                         # Assume list of time-value pairs if simpler api, or list of dicts. 
-                         # Let's handle both safely.
-                         last = series[-1]
-                         val = 0
-                         if isinstance(last, dict): val = last.get('v', 0)
-                         elif isinstance(last, list): val = last[1]
-                         else: val = last # If single value
-                         return float(val)
-            # Try V3 fallback or different slug if first failed? No, just keep simple.
-            return 0
+                if data.get('code') == '0':
+                    # Data format might be list of [time, value] or [{'t':..., 'v':...}]
+                    return data.get('data') or []
+                print(f"Coinglass {slug}: {data.get('msg')}")
+            else:
+                print(f"Coinglass {slug}: HTTP {resp.status_code}")
         except Exception as e:
-            print(f"Coinglass STH Error: {e}")
-            return 0
+            print(f"Coinglass {slug} Error: {e}")
+        return None
+
+    def get_coinglass_series(self, name):
+        """Locally cached index series; only points after the last stored one are downloaded"""
+        cache = SeriesCache(name)
+        cache.update(lambda start: self.get_coinglass_index(COINGLASS_SERIES[name], start))
+        return cache
+
+    def get_coinglass_sth_price(self):
+        """Latest STH Realized Price"""
+        return self.get_coinglass_series('sth_realized_price').latest() or 0
 
     def get_coinglass_mvrv(self):
-        """Fetch MVRV Z-Score"""
+        """Latest MVRV Z-Score"""
+        return self.get_coinglass_series('mvrv_z').latest() or 0
+
+# ==================== GATHER ====================
+def gather_sources(sources, deadlines, default_deadline=30):
+    """
+    Run {name: fn} concurrently, one thread per source.
+    Returns {name: result}; a source that raises or misses its deadline maps to None.
+    The phase therefore takes as long as its slowest source, capped by the largest deadline.
+    """
+    start = time.monotonic()
+    pool = ThreadPoolExecutor(max_workers=max(1, len(sources)), thread_name_prefix="gather")
+    futures = {name: pool.submit(fn) for name, fn in sources.items()}
+    results = {}
+    for name, fut in futures.items():
+        deadline = deadlines.get(name, default_deadline)
         try:
-            # Trying slug 'bitcoin-mvrv-z-score' based on naming convention
-            url = "https://open-api-v4.coinglass.com/api/index/bitcoin-mvrv-z-score"
-            resp = requests.get(url, headers=self.coinglass_headers, timeout=10)
-            
-            if resp.status_code == 200:
-                data = resp.json()
-                if data.get('code') == '0' and data.get('data'):
-                    series = data.get('data', [])
-                    if series:
-                         last = series[-1]
-                         val = 0
-                         if isinstance(last, dict): val = last.get('v', 0)
-                         elif isinstance(last, list): val = last[1]
-                         else: val = last
-                         return float(val)
-            return 0
+            results[name] = fut.result(timeout=max(0.0, deadline - (time.monotonic() - start)))
+        except FutureTimeout:
+            print(f"Source '{name}' missed its {deadline}s deadline, reporting N/A")
+            results[name] = None
         except Exception as e:
-            print(f"Coinglass MVRV Error: {e}")
-            return 0
+            print(f"Source '{name}' failed: {e}")
+            results[name] = None
+    # Late sources keep running in the background (their HTTP calls have timeouts) but are not awaited
+    pool.shutdown(wait=False, cancel_futures=True)
+    print(f"Gather phase took {time.monotonic() - start:.1f}s")
+    return results
 
 # ==================== ANALYZER_SENDER ====================
+def rank_alts(tickers, universe=None, limit=ALT_UNIVERSE):
+    """Top alts by 24h quote volume. The ticker feed also lists quarterlies and settling/delisted
+    contracts, so when the trading USDT-perp universe is known only those symbols are ranked."""
+    if universe:
+        universe = set(universe)
+        tickers = [x for x in tickers if x['symbol'] in universe]
+    ranked = sorted(tickers, key=lambda x: float(x['quoteVolume']), reverse=True)
+    return [x['symbol'] for x in ranked if x['symbol'] not in NON_ALTS][:limit]
+
+def discord_retry_after(resp):
+    """Seconds Discord asks us to wait after a 429 (JSON body first, then the Retry-After header)"""
+    try:
+        return float(resp.json()['retry_after'])
+    except (ValueError, KeyError, TypeError):
+        pass
+    try:
+        return float(resp.headers.get('Retry-After', 1))
+    except (TypeError, ValueError):
+        return 1.0
+
 class BtcMonitor:
     def __init__(self):
         self.fetcher = DataFetcher()
+        # Rendered reports are queued here first, so a failed webhook call is retried
+        # on the next run instead of re-running the whole (slow, rate-limited) scan
+        self.outbox = Outbox()
+        # The 24h ticker list feeds both the volume check and the alt scan; fetched once per job
+        self._tickers = None
+        self._tickers_lock = threading.Lock()
+
+    def tickers(self):
+        with self._tickers_lock:
+            if self._tickers is None:
+                self._tickers = self.fetcher.get_binance_ticker_24hr()
+            return self._tickers
 
     def job(self):
+        # Deliver anything a previous run failed to send before scanning again
+        if self.outbox.pending():
+            self.flush_outbox(wait=10)
+
         print(f"\n[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Starting Job...")
-        
+        self._tickers = None
+
+        # Gather: the four sources live on independent hosts, so they are fetched concurrently.
+        # A source that fails or misses its deadline comes back as None and shows up as N/A.
+        data = gather_sources({
+            'binance': self.market_heat,
+            'coinalyze': self.speculation_heat,
+            'fear_greed': self.fetcher.get_fear_and_greed,
+            'candles': self.load_candles,
+            'alts': self.alt_indicators,
+            'onchain': self.onchain_series,
+        }, SOURCE_DEADLINES)
+
         # 1. Market Heat (Binance Volume) & Price
-        binance_data = self.fetcher.get_binance_ticker_24hr()
+        current_btc_price, hot_alts = data['binance'] or (0, [])
+
+        # 2. Speculation Heat (Coinalyze Aggregation)
+        oi = data['coinalyze'] or {}
+        alts_oi_share = oi.get('alts_oi_share', 0)
+        funding_annual = oi.get('funding_annual', 0)
+        funding_annual_str = f"{funding_annual:+.2f}%" if 'funding_annual' in oi else "N/A"
+
+        oi_status = "Healthy"
+        if alts_oi_share > (ALTS_OI_REL_THRESHOLD * 100):
+            oi_status = "⚠️ Overheated (Alts domination)"
+        if 'total' in oi:
+            oi_str = (
+                f" • Total: ${oi['total']/1e9:.1f}B\n"
+                f" • BTC: ${oi['btc']/1e9:.1f}B\n"
+                f" • ETH: ${oi['eth']/1e9:.1f}B\n"
+                f" • Alts: ${oi['alts']/1e9:.1f}B ({oi_status})"
+            )
+        else:
+            oi_str = " • N/A"
+
+        # 3. Fear & Greed
+        fg_data = data['fear_greed']
+        fg_str = f"{fg_data.get('value')} ({fg_data.get('value_classification')})" if fg_data else "N/A"
+
+        # 4. Technical Models (closed daily candles, kept locally; only new candles are fetched)
+        ma_msg = self.technical_models(data['candles'], current_btc_price) if data['candles'] else "MA: N/A"
+        if data['onchain']:
+            ma_msg = "\n".join(x for x in (ma_msg, self.onchain_models(data['onchain'], current_btc_price)) if x)
+        price_str = f"${current_btc_price:,.0f}" if current_btc_price else "N/A"
+
+        # 5. Overheated alts (RSI + distance above MA200 across the top perps)
+        hot_indicators = data['alts']
+        if hot_indicators is None:
+            alts_msg = "N/A"
+        elif hot_indicators:
+            alts_msg = "\n".join(
+                f"**{r['symbol']}** RSI {r['rsi']:.0f} | MA200 {r['dist_ma200']:+.0f}% | "
+                f"ATR {r['atr_pct']:.1f}% | RV {r['rvol']:.0f}%"
+                for r in hot_indicators
+            )
+        else:
+            alts_msg = "✅ 无过热山寨 (RSI < 70 或距 MA200 < 30%)"
+
+        # 6. Construct Report
+        report = {
+            "title": "🛡️ BTC Decision System Daily",
+            "color": 16711680 if (hot_alts or hot_indicators or alts_oi_share > 55 or funding_annual > 50) else 65280, 
+            "fields": [
+                {
+                    "name": "1. 投机热度 & 情绪",
+                    "value": (
+                        f"**Fear & Greed**: {fg_str}\n"
+                        f"**Funding Rate (Annual)**: {funding_annual_str}\n"
+                        f"**Open Interest (OI)**:\n"
+                        f"{oi_str}"
+                    ),
+                    "inline": False
+                },
+                {
+                    "name": "2. 市场过热 (Volume Spike)",
+                    "value":  "\n".join(hot_alts) if hot_alts else "✅ 无异常 (无山寨币成交量 > 90% BTC)",
+                    "inline": False
+                },
+                {
+                    "name": "3. 趋势估值 (Technical Models)",
+                    "value": f"**BTC Price**: {price_str}\n{ma_msg}",
+                    "inline": False
+                },
+                {
+                    "name": "4. 山寨过热 (Alt Indicators)",
+                    "value": alts_msg,
+                    "inline": False
+                }
+            ],
+            "footer": {"text": f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M UTC')}\nSources: Coinalyze (OI/Fund), Alt.me (F&G), Binance (Vol/MA), Coinglass (On-chain)."}
+        }
+        
+        if self.send_discord_embed(report):
+            print("Report sent!")
+        else:
+            print("Report queued in outbox, will retry on the next run.")
+
+    def market_heat(self):
+        """BTC price and alts whose 24h volume rivals BTC -> (price, hot_alts)"""
+        binance_data = self.tickers()
         current_btc_price = 0
         hot_alts = []
         
@@ -302,7 +437,7 @@ class BtcMonitor:
             # Hot Alts Logic
             for x in sorted_vol[:10]:
                 sym = x['symbol']
-                if sym in ['BTCUSDT', 'ETHUSDT', 'USDCUSDT', 'FDUSDUSDT']: continue
+                if sym in NON_ALTS: continue
                 vol = float(x['quoteVolume'])
                 ratio_btc = vol / btc_vol if btc_vol > 0 else 0
                 if ratio_btc > VOLUME_SPIKE_THRESHOLD:
@@ -310,8 +445,10 @@ class BtcMonitor:
         else:
              print("Warning: Binance data fetch failed. Using fallback for BTC Price.")
              current_btc_price = self.fetcher.get_btc_price_fallback()
+        return current_btc_price, hot_alts
 
-        # 2. Speculation Heat (Coinalyze Aggregation)
+    def speculation_heat(self):
+        """Aggregated OI split (BTC / ETH / alts) and BTC funding from Coinalyze; None if unavailable"""
         print("Fetching OI and Funding from Coinalyze...")
         all_markets_raw = self.fetcher.get_future_markets()
         
@@ -321,123 +458,156 @@ class BtcMonitor:
         TOP_EXCHANGES = ['A', '6', '4', '3']
         
         all_markets = [m for m in all_markets_raw if m.get('exchange') in TOP_EXCHANGES] if all_markets_raw else []
+        if not all_markets:
+            print("Error: Could not fetch markets from Coinalyze.")
+            return None
+
+        print(f"Total Markets: {len(all_markets_raw)}. Filtered (Top Exchanges): {len(all_markets)}")
+
+        # Fetch OI for ALL markets, plus funding for every BTC perp in the same plan
+        # (the top-10-by-OI selection below is then made locally)
+        btc_perp_syms = [m['symbol'] for m in all_markets if m.get('base_asset') == 'BTC' and m.get('is_perpetual')]
+        all_oi_map, funding_map = self.fetcher.get_oi_and_funding(
+            [m['symbol'] for m in all_markets], btc_perp_syms)
         
+        # Sum up
+        total_market_oi_usd = sum(all_oi_map.values())
         btc_oi_usd = 0
         eth_oi_usd = 0
-        total_market_oi_usd = 0
-        alts_usd = 0
-        
-        funding_annual = 0
-        funding_annual_str = "N/A"
         
-        if all_markets:
-            print(f"Total Markets: {len(all_markets_raw)}. Filtered (Top Exchanges): {len(all_markets)}")
-
-            
-            # Fetch OI for ALL markets
-            all_oi_map = self.fetcher.get_all_open_interest(all_markets)
+        # Filter for BTC/ETH
+        for m in all_markets:
+            sym = m['symbol']
+            base = m.get('base_asset', '')
+            oi = all_oi_map.get(sym, 0)
             
-            # Sum up
-            total_market_oi_usd = sum(all_oi_map.values())
-            
-            # Filter for BTC/ETH
-            for m in all_markets:
-                sym = m['symbol']
-                base = m.get('base_asset', '')
-                oi = all_oi_map.get(sym, 0)
-                
-                if base == 'BTC':
-                    btc_oi_usd += oi
-                elif base == 'ETH':
-                    eth_oi_usd += oi
-            
-            alts_usd = total_market_oi_usd - btc_oi_usd - eth_oi_usd
-            alts_oi_share = (alts_usd / total_market_oi_usd * 100) if total_market_oi_usd > 0 else 0
-            
-            # BTC Funding (Weighted or Simple Average of top BTC perps)
-            # Find top BTC perps by OI
-            btc_markets = [m for m in all_markets if m.get('base_asset') == 'BTC' and m.get('is_perpetual')]
-            btc_markets.sort(key=lambda x: all_oi_map.get(x['symbol'], 0), reverse=True)
-            top_btc_syms = [m['symbol'] for m in btc_markets[:10]]
-            
-            if top_btc_syms:
-                fund_resp = self.fetcher.get_coinalyze_current_funding(",".join(top_btc_syms))
-                if fund_resp:
-                    vals = [float(x.get('value', 0)) for x in fund_resp]
-                    if vals:
-                        avg_pf = sum(vals) / len(vals)
-                        funding_annual = avg_pf * 3 * 365 * 100
-                        funding_annual_str = f"{funding_annual:+.2f}%"
-        
-        else:
-            print("Error: Could not fetch markets from Coinalyze.")
-            alts_oi_share = 0
-
-        oi_status = "Healthy"
-        if alts_oi_share > (ALTS_OI_REL_THRESHOLD * 100):
-            oi_status = "⚠️ Overheated (Alts domination)"
-
-        # 3. Fear & Greed
-        fg_data = self.fetcher.get_fear_and_greed()
-        fg_str = f"{fg_data.get('value')} ({fg_data.get('value_classification')})" if fg_data else "N/A"
+            if base == 'BTC':
+                btc_oi_usd += oi
+            elif base == 'ETH':
+                eth_oi_usd += oi
         
-        # 4. Technical Models
-        ma_msg = ""
-        candles = self.fetcher.get_binance_daily_candles("BTCUSDT", limit=250)
-        if candles and len(candles) >= 200:
-            closes = [float(x[4]) for x in candles]
-            ma_200 = sum(closes[-200:]) / 200
-            ma_111 = sum(closes[-111:]) / 111 if len(closes) >= 111 else 0
-            diff_ma200 = ((current_btc_price - ma_200) / ma_200) * 100
-            ma_msg = f"**MA200 (Bull/Bear Line)**: ${ma_200:,.0f} (Diff: {diff_ma200:+.1f}%)\n**MA111 (Pi Cycle Use)**: ${ma_111:,.0f}"
-
-        # 5. Construct Report
-        report = {
-            "title": "🛡️ BTC Decision System Daily",
-            "color": 16711680 if (hot_alts or alts_oi_share > 55 or funding_annual > 50) else 65280, 
-            "fields": [
-                {
-                    "name": "1. 投机热度 & 情绪",
-                    "value": (
-                        f"**Fear & Greed**: {fg_str}\n"
-                        f"**Funding Rate (Annual)**: {funding_annual_str}\n"
-                        f"**Open Interest (OI)**:\n"
-                        f" • Total: ${total_market_oi_usd/1e9:.1f}B\n"
-                        f" • BTC: ${btc_oi_usd/1e9:.1f}B\n"
-                        f" • ETH: ${eth_oi_usd/1e9:.1f}B\n"
-                        f" • Alts: ${alts_usd/1e9:.1f}B ({oi_status})"
-                    ),
-                    "inline": False
-                },
-                {
-                    "name": "2. 市场过热 (Volume Spike)",
-                    "value":  "\n".join(hot_alts) if hot_alts else "✅ 无异常 (无山寨币成交量 > 90% BTC)",
-                    "inline": False
-                },
-                {
-                    "name": "3. 趋势估值 (Technical Models)",
-                    "value": f"**BTC Price**: ${current_btc_price:,.0f}\n{ma_msg}",
-                    "inline": False
-                }
-            ],
-            "footer": {"text": f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M UTC')}\nSources: Coinalyze (OI/Fund), Alt.me (F&G), Binance (Vol/MA)."}
+        alts_usd = total_market_oi_usd - btc_oi_usd - eth_oi_usd
+        result = {
+            'total': total_market_oi_usd,
+            'btc': btc_oi_usd,
+            'eth': eth_oi_usd,
+            'alts': alts_usd,
+            'alts_oi_share': (alts_usd / total_market_oi_usd * 100) if total_market_oi_usd > 0 else 0,
         }
         
-        self.send_discord_embed(report)
-        print("Report sent!")
+        # BTC Funding (Weighted or Simple Average of top BTC perps)
+        # Find top BTC perps by OI
+        btc_markets = [m for m in all_markets if m.get('base_asset') == 'BTC' and m.get('is_perpetual')]
+        btc_markets.sort(key=lambda x: all_oi_map.get(x['symbol'], 0), reverse=True)
+        top_btc_syms = [m['symbol'] for m in btc_markets[:10]]
+        
+        vals = [funding_map[s] for s in top_btc_syms if s in funding_map]
+        if vals:
+            avg_pf = sum(vals) / len(vals)
+            result['funding_annual'] = avg_pf * 3 * 365 * 100
+        return result
+
+    def load_candles(self):
+        """Bring the local daily-candle store up to date (only candles closed since the last run are fetched)"""
+        store = DailyCandleStore("BTCUSDT")
+        added = store.update(lambda start, limit: self.fetcher.get_binance_daily_candles(
+            "BTCUSDT", limit=limit, start_time=start))
+        store.save()
+        print(f"Daily candles: {added} new, {store.daily.count} stored")
+        return store
+
+    def alt_indicators(self):
+        """SMA/EMA/RSI/ATR/realized vol for the top alts in one vectorized pass -> overheated rows"""
+        tickers = self.tickers()
+        if not tickers:
+            return None
+        universe = self.fetcher.get_perp_universe()
+        if not universe:
+            print("Perp universe unavailable, ranking alts from the unfiltered ticker list")
+        symbols = rank_alts(tickers, universe)
+
+        panel = KlinePanel(days=ALT_PANEL_DAYS)
+        requests_made = panel.update(symbols, lambda sym, start, limit: self.fetcher.get_binance_daily_candles(
+            sym, limit=limit, start_time=start))
+        panel.save()
+
+        cpu = time.process_time()
+        hits = overheated(latest_table(panel.symbols, compute(panel)))
+        print(f"Alt indicators: {len(symbols)} symbols, {requests_made} kline requests, "
+              f"{time.process_time() - cpu:.3f}s CPU")
+        return hits
+
+    def onchain_series(self):
+        """Coinglass index series, brought up to date in the local cache"""
+        return {name: self.fetcher.get_coinglass_series(name) for name in COINGLASS_SERIES}
+
+    def onchain_models(self, series, price):
+        """STH realized-price distance and MVRV Z with percentile ranks, from cached history only"""
+        lines = []
+        sth = series['sth_realized_price'].latest()
+        if sth and price:
+            lines.append(f"**STH Realized Price**: ${sth:,.0f} (Diff: {(price - sth) / sth * 100:+.1f}%)")
+        mvrv = series['mvrv_z']
+        z = mvrv.latest()
+        if z is not None:
+            year_ago = mvrv.last_ts - 365 * DAY_MS
+            lines.append(f"**MVRV Z-Score**: {z:.2f} (P{percentile_rank(mvrv.values(), z):.0f} all-time, "
+                         f"P{percentile_rank(mvrv.values(year_ago), z):.0f} 1y)")
+        return "\n".join(lines)
+
+    def technical_models(self, store, price):
+        """MA200 / Mayer multiple / Pi Cycle (MA111 vs MA350x2) / 200-week MA from the candle store"""
+        ma_200, ma_111, ma_350 = store.ma(200), store.ma(111), store.ma(350)
+        wma_200 = store.weekly_ma(200)
+        lines = []
+        if ma_200:
+            diff_ma200 = ((price - ma_200) / ma_200) * 100 if price else 0
+            lines.append(f"**MA200 (Bull/Bear Line)**: ${ma_200:,.0f} (Diff: {diff_ma200:+.1f}%)")
+            if price:
+                lines.append(f"**Mayer Multiple**: {price / ma_200:.2f}")
+        if ma_111 and ma_350:
+            # Pi Cycle Top fires when MA111 crosses above 2x MA350
+            pi_ratio = ma_111 / (2 * ma_350)
+            pi_flag = " ⚠️ Crossed" if pi_ratio >= 1 else ""
+            lines.append(f"**Pi Cycle**: MA111 ${ma_111:,.0f} vs MA350x2 ${2 * ma_350:,.0f} ({pi_ratio * 100:.0f}%){pi_flag}")
+        if wma_200:
+            diff_wma = ((price - wma_200) / wma_200) * 100 if price else 0
+            lines.append(f"**200W MA**: ${wma_200:,.0f} (Diff: {diff_wma:+.1f}%)")
+        return "\n".join(lines)
 
     def send_discord_embed(self, embed_data):
         payload = {
             "username": "Antigravity BTC Monitor",
             "embeds": [embed_data]
         }
-        try:
-            resp = requests.post(DISCORD_WEBHOOK_URL, json=payload)
-            resp.raise_for_status()
-        except requests.exceptions.HTTPError as err:
-             print(f"Discord Send Error: {err.response.text}")
-        except Exception as e:
-             print(f"Discord Send Error: {e}")
+        self.outbox.enqueue('discord', 'webhook', payload)
+        return self.flush_outbox() == 0
+
+    def flush_outbox(self, wait=60.0):
+        """Deliver queued webhook messages with backoff; returns how many are still pending"""
+        return asyncio.run(self.outbox.flush({'discord': self._post_discord}, wait=wait))
+
+    @staticmethod
+    async def _post_discord(dest, payload):
+        """POST one webhook message in a worker thread (keeps the outbox loop free); waits out 429 retry_after"""
+        for _ in range(DISCORD_MAX_RETRIES + 1):
+            try:
+                resp = await asyncio.to_thread(requests.post, DISCORD_WEBHOOK_URL, json=payload, timeout=15)
+            except requests.exceptions.RequestException as e:
+                print(f"Discord Send Error: {e}")
+                return False
+            if resp.status_code != 429:
+                if resp.ok:
+                    return True
+                print(f"Discord Send Error: {resp.status_code} {resp.text}")
+                return False
+            retry_after = discord_retry_after(resp)
+            if retry_after > DISCORD_MAX_RETRY_AFTER:
+                print(f"Discord rate limited for {retry_after:.0f}s, leaving the message in the outbox")
+                return False
+            print(f"Discord rate limited, retrying in {retry_after:.1f}s")
+            await asyncio.sleep(retry_after)
+        return False
 
     def start(self):
         print("Starting BTC Monitor Loop (Every 12 hours)...")
@@ -0,0 +1,121 @@
+"""
+Local daily-candle store with incremental moving averages (BTC daily report).
+
+Only closed daily candles are kept. Each run asks Binance for candles newer than the
+last stored one (usually a single row), and pushes them into rolling sums. Every
+moving average therefore costs O(1) per new candle, however long its lookback:
+- daily SMAs (MA111, MA200, MA350 for the Pi Cycle top indicator)
+- weekly SMAs built from the Sunday close of each week (200-week MA)
+The ring buffers and sums are persisted in .cache/ so nothing is recomputed on start.
+"""
+import time
+
+from local_cache import cache_path, read_json, atomic_write_json
+
+DAY_MS = 86400 * 1000
+KLINES_PAGE = 1000   # rows per request (weight 5 on /fapi/v1/klines)
+
+
+class RollingMeans:
+    """Rolling sums over the last N values for several N at once (ring buffer, O(#windows) per push)"""
+
+    def __init__(self, windows):
+        self.windows = sorted(set(windows))
+        self.size = self.windows[-1] + 1
+        self.ring = [0.0] * self.size
+        self.count = 0      # values pushed so far; the ring holds the newest `size` of them
+        self.sums = {w: 0.0 for w in self.windows}
+
+    def push(self, v):
+        self.ring[self.count % self.size] = v
+        self.count += 1
+        for w in self.windows:
+            self.sums[w] += v
+            if self.count > w:
+                self.sums[w] -= self.ring[(self.count - 1 - w) % self.size]
+
+    def mean(self, window):
+        """Mean of the last `window` values, None until that many values exist"""
+        if self.count < window:
+            return None
+        return self.sums[window] / window
+
+    def to_state(self):
+        n = min(self.count, self.size)
+        recent = [self.ring[(self.count - n + k) % self.size] for k in range(n)]
+        return {'values': recent, 'sums': self.sums, 'count': self.count}
+
+    @classmethod
+    def from_state(cls, windows, state):
+        m = cls(windows)
+        if not state or sorted(int(w) for w in state.get('sums', {})) != m.windows:
+            return m
+        values = state['values']
+        m.count = state['count']
+        for k, v in enumerate(values):
+            m.ring[(m.count - len(values) + k) % m.size] = v
+        m.sums = {int(w): s for w, s in state['sums'].items()}
+        return m
+
+
+class DailyCandleStore:
+    def __init__(self, symbol="BTCUSDT", path=None, daily_windows=(111, 200, 350), weekly_windows=(200,)):
+        self.symbol = symbol
+        self.path = path or cache_path('candles', f"{symbol}_1d.json")
+        state = read_json(self.path, {}) or {}
+        self.last_open = state.get('last_open')   # open time (ms) of the newest stored closed candle
+        self.daily = RollingMeans.from_state(daily_windows, state.get('daily'))
+        self.weekly = RollingMeans.from_state(weekly_windows, state.get('weekly'))
+        if self.daily.count == 0 or self.weekly.count == 0:
+            self.last_open = None    # windows changed or first run: backfill
+            self.daily = RollingMeans(daily_windows)
+            self.weekly = RollingMeans(weekly_windows)
+        self.backfill_days = max(max(daily_windows), max(weekly_windows) * 7 + 7)
+
+    def _push(self, open_time, close):
+        self.daily.push(close)
+        # Binance weeks run Monday-Sunday (UTC); the Sunday candle closes the week
+        if time.gmtime(open_time / 1000).tm_wday == 6:
+            self.weekly.push(close)
+        self.last_open = open_time
+
+    def update(self, fetch_klines, now_ms=None):
+        """
+        Append closed candles newer than the last stored one.
+        fetch_klines(start_ms, limit) -> Binance kline rows [open_time, o, h, l, close, v, close_time, ...]
+        Returns the number of candles added.
+        """
+        now_ms = now_ms or int(time.time() * 1000)
+        start = self.last_open + DAY_MS if self.last_open else now_ms - self.backfill_days * DAY_MS
+        added = 0
+        while start < now_ms - DAY_MS + 1:
+            # ask only for what is missing: a one-candle catch-up costs weight 1, not 5
+            limit = min(KLINES_PAGE, (now_ms - start) // DAY_MS + 1)
+            rows = fetch_klines(start, limit)
+            if not rows:
+                break
+            for r in rows:
+                open_time, close_time = int(r[0]), int(r[6])
+                if close_time >= now_ms:
+                    break              # still-forming candle
+                if self.last_open is not None and open_time <= self.last_open:
+                    continue
+                self._push(open_time, float(r[4]))
+                added += 1
+            if len(rows) < limit:
+                break
+            start = int(rows[-1][0]) + DAY_MS
+        return added
+
+    def ma(self, window):
+        return self.daily.mean(window)
+
+    def weekly_ma(self, window):
+        return self.weekly.mean(window)
+
+    def save(self):
+        atomic_write_json(self.path, {
+            'last_open': self.last_open,
+            'daily': self.daily.to_state(),
+            'weekly': self.weekly.to_state(),
+        })
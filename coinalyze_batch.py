@@ -0,0 +1,105 @@
+"""
+Batch planning for Coinalyze multi-symbol endpoints (open-interest, funding-rate, ...).
+
+- Symbols are packed into as few requests as the URL budget allows, measured on the
+  URL-encoded `symbols=` parameter rather than a fixed count per batch.
+- If the API rejects a batch as too large (413/414), the batch is split in half and
+  the smaller size is remembered for later runs. The learned cap expires after
+  MAX_COUNT_TTL, so a limit hit once (or a limit the API later raises) does not shrink
+  batches forever. A plain 400 is a bad request, not a size signal, and teaches nothing.
+- Several lookups are planned together: each endpoint's symbol list is de-duplicated and
+  packed in one pass, so overlapping sets (e.g. BTC perps needed for both OI and funding)
+  are fetched once per endpoint.
+- Markets that repeatedly come back without data from an endpoint are skipped for that
+  endpoint on later runs (re-checked after a week), so they stop costing part of the
+  40 requests/minute budget. Misses are counted per endpoint: a market may have OI but
+  no funding data.
+"""
+import time
+from urllib.parse import quote
+
+from local_cache import cache_path, read_json, atomic_write_json
+
+MAX_QUERY_LEN = 3800        # encoded length of symbols=..., keeps the whole URL under 4 KB
+EMPTY_AFTER = 3             # consecutive misses before a market is skipped
+EMPTY_RECHECK = 7 * 86400   # seconds before a skipped market is tried again
+MAX_COUNT_TTL = 3 * 86400   # seconds a learned per-request symbol cap is kept before probing larger batches again
+TOO_LARGE = (413, 414)
+
+
+def pack_symbols(symbols, max_len=MAX_QUERY_LEN, max_count=None):
+    """Greedily pack symbols into batches whose comma-joined, URL-encoded length fits max_len"""
+    batches, cur, size = [], [], 0
+    for s in symbols:
+        cost = len(quote(s, safe=''))
+        sep = 3 if cur else 0   # ',' is sent as %2C
+        if cur and (size + sep + cost > max_len or (max_count and len(cur) >= max_count)):
+            batches.append(cur)
+            cur, size, sep = [], 0, 0
+        cur.append(s)
+        size += sep + cost
+    if cur:
+        batches.append(cur)
+    return batches
+
+
+class CoinalyzeBatcher:
+    def __init__(self, fetcher, path=None, max_len=MAX_QUERY_LEN):
+        self.fetcher = fetcher   # DataFetcher: coinalyze_get() + last_status
+        self.path = path or cache_path("coinalyze_markets.json")
+        state = read_json(self.path, {}) or {}
+        # endpoint -> symbol -> {'misses': n, 'last': ts}; the old per-symbol layout is dropped
+        self.empty = {k: v for k, v in (state.get('empty') or {}).items() if 'misses' not in v}
+        # learned per-request symbol cap, None = URL budget only; caps without a timestamp predate the TTL
+        self.max_count = state.get('max_count')
+        self.max_count_at = state.get('max_count_at')
+        if not self.max_count_at or time.time() - self.max_count_at > MAX_COUNT_TTL:
+            self.max_count = self.max_count_at = None
+        self.max_len = max_len
+        self.requests = 0
+
+    def is_skipped(self, endpoint, symbol, now=None):
+        e = self.empty.get(endpoint, {}).get(symbol)
+        now = now or time.time()
+        return bool(e) and e['misses'] >= EMPTY_AFTER and now - e['last'] < EMPTY_RECHECK
+
+    def _record(self, endpoint, batch, data, now):
+        returned = {item.get('symbol') for item in data}
+        empty = self.empty.setdefault(endpoint, {})
+        for s in batch:
+            if s in returned:
+                empty.pop(s, None)
+            else:
+                e = empty.setdefault(s, {'misses': 0, 'last': now})
+                e['misses'] += 1
+                e['last'] = now
+
+    def fetch(self, lookups):
+        """lookups: {endpoint: [symbols]} -> {endpoint: {symbol: item}}"""
+        now = time.time()
+        out = {}
+        for endpoint, symbols in lookups.items():
+            wanted = [s for s in dict.fromkeys(symbols) if not self.is_skipped(endpoint, s, now)]
+            results = out[endpoint] = {}
+            queue = pack_symbols(wanted, self.max_len, self.max_count)
+            while queue:
+                batch = queue.pop(0)
+                self.requests += 1
+                data = self.fetcher.coinalyze_get(endpoint, {"symbols": ",".join(batch)}, timeout=20)
+                if data is None:
+                    if len(batch) > 1 and self.fetcher.last_status in TOO_LARGE:
+                        half = len(batch) // 2
+                        self.max_count = min(self.max_count or half, half)
+                        self.max_count_at = now
+                        print(f"Coinalyze rejected {len(batch)} symbols per request, retrying with {half}")
+                        queue[:0] = [batch[:half], batch[half:]]
+                    continue
+                self._record(endpoint, batch, data, now)
+                for item in data:
+                    results[item['symbol']] = item
+        return out
+
+    def save(self):
+        empty = {endpoint: markets for endpoint, markets in self.empty.items() if markets}
+        atomic_write_json(self.path, {'empty': empty, 'max_count': self.max_count,
+                                      'max_count_at': self.max_count_at})
@@ -0,0 +1,148 @@
+"""
+币安合约数据的请求规划
+
+- 根据需要的指标, 选出能覆盖它们的最少接口 (例如 openInterestHist 的最新一根
+  已带有当前 sumOpenInterest, 不必再单独请求 /fapi/v1/openInterest)
+- 本地序列已是最新的接口直接跳过 (见 oi_store)
+- 同一次运行内相同 URL 只请求一次 (并发请求同一 URL 时共享结果)
+- 统计相对旧逻辑节省的请求数
+"""
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+FAPI = "https://fapi.binance.com"
+
+# 接口 -> 可提供的指标; 顺序即旧逻辑的取数优先级 (用于计算节省了多少请求)
+ENDPOINTS = {
+    'ticker_24hr': {
+        'url': FAPI + "/fapi/v1/ticker/24hr",
+        'provides': {'price_chg', 'quote_volume', 'last_price'},
+    },
+    'premium_index': {
+        'url': FAPI + "/fapi/v1/premiumIndex",
+        'provides': {'funding', 'mark_price'},
+    },
+    'exchange_info': {
+        'url': FAPI + "/fapi/v1/exchangeInfo",
+        'provides': {'contract_status'},
+    },
+    'open_interest': {
+        'url': FAPI + "/fapi/v1/openInterest?symbol={symbol}",
+        'provides': {'oi_now'},
+    },
+    'oi_hist': {
+        'url': FAPI + "/futures/data/openInterestHist?symbol={symbol}&period=5m&limit={limit}",
+        'limit': 7,
+        'provides': {'oi_now', 'oi_30m_ago'},
+    },
+    'ls_ratio': {
+        'url': FAPI + "/futures/data/topLongShortPositionRatio?symbol={symbol}&period=30m&limit={limit}",
+        'limit': 1,
+        'provides': {'ls'},
+    },
+}
+
+# OI 扫描每个币种需要的指标
+OI_METRICS = ('oi_now', 'oi_30m_ago', 'ls')
+
+
+def plan_endpoints(metrics):
+    """贪心集合覆盖: 每次选能覆盖最多剩余指标的接口"""
+    remaining = set(metrics)
+    chosen = []
+    while remaining:
+        name = max(ENDPOINTS, key=lambda n: len(ENDPOINTS[n]['provides'] & remaining))
+        covered = ENDPOINTS[name]['provides'] & remaining
+        if not covered:
+            raise ValueError(f"没有接口能提供指标: {sorted(remaining)}")
+        chosen.append(name)
+        remaining -= covered
+    return chosen
+
+
+def naive_endpoints(metrics):
+    """旧逻辑: 每个指标取第一个能提供它的接口"""
+    chosen = []
+    for m in metrics:
+        name = next(n for n in ENDPOINTS if m in ENDPOINTS[n]['provides'])
+        if name not in chosen:
+            chosen.append(name)
+    return chosen
+
+
+class FetchPlanner:
+    def __init__(self):
+        self._results = {}    # url -> 已成功的响应
+        self._inflight = {}   # url -> 进行中的 Future (异步)
+        self._plans = {}
+        self.requested = 0    # 调用方发起的请求数
+        self.issued = 0       # 实际发到网络的请求数
+        self.pruned = 0       # 规划阶段直接省掉的请求数
+
+    def symbol_urls(self, metrics, symbol, limits=None):
+        """
+        返回 {接口名: URL}, 只包含覆盖 metrics 所需的最少接口。
+        limits: {接口名: 根数} 覆盖默认 limit; 为 0 表示本地已有最新数据, 该接口跳过不请求
+        """
+        key = tuple(metrics)
+        if key not in self._plans:
+            self._plans[key] = (plan_endpoints(metrics), len(naive_endpoints(metrics)))
+        names, naive_n = self._plans[key]
+        self.pruned += naive_n - len(names)
+
+        urls = {}
+        for n in names:
+            ep = ENDPOINTS[n]
+            limit = (limits or {}).get(n, ep.get('limit'))
+            if limit == 0:
+                self.pruned += 1
+                continue
+            urls[n] = ep['url'].format(symbol=symbol, limit=limit)
+        return urls
+
+    def url(self, name):
+        return ENDPOINTS[name]['url']
+
+    def get(self, url, fetch):
+        """同步取数, fetch(url) 只在本次运行第一次遇到该 URL 时调用"""
+        self.requested += 1
+        if url in self._results:
+            return self._results[url]
+        self.issued += 1
+        data = fetch(url)
+        if data is not None:
+            self._results[url] = data
+        return data
+
+    async def get_async(self, url, fetch):
+        """异步取数, fetch 为返回协程的无参函数; 并发请求同一 URL 时共享同一次请求"""
+        self.requested += 1
+        if url in self._results:
+            return self._results[url]
+        if url in self._inflight:
+            return await asyncio.shield(self._inflight[url])
+
+        self.issued += 1
+        fut = asyncio.ensure_future(fetch())
+        self._inflight[url] = fut
+        # 结果由请求自己落地: 发起方被取消 (例如单币种超时) 不影响其他等待方, 也不会重复请求
+        fut.add_done_callback(lambda f: self._settle(url, f))
+        return await asyncio.shield(fut)
+
+    def _settle(self, url, fut):
+        self._inflight.pop(url, None)
+        if fut.cancelled() or fut.exception() is not None:
+            return
+        if fut.result() is not None:
+            self._results[url] = fut.result()
+
+    @property
+    def saved(self):
+        return self.pruned + (self.requested - self.issued)
+
+    def summary(self):
+        total = self.issued + self.saved
+        pct = self.saved / total * 100 if total else 0
+        return f"请求规划: 实际请求 {self.issued} 次, 节省 {self.saved} 次 ({pct:.0f}%)"
@@ -27,11 +27,11 @@ def find_robust_symbols():
     oi = f.get_coinalyze_oi(test_aggs)
     print(f"OI for Aggregates: {json.dumps(oi, indent=2)}")
     
-    # Check for funding on these
+    # Check for funding on these (one batched request instead of one per symbol)
     print("\n--- Testing Funding on Aggregates ---")
+    fund = {x['symbol']: x for x in f.get_coinalyze_funding(",".join(test_aggs)) or []}
     for s in test_aggs:
-        fund = f.get_coinalyze_funding(s)
-        print(f"Funding for {s}: {fund}")
+        print(f"Funding for {s}: {fund.get(s)}")
 
 if __name__ == "__main__":
     find_robust_symbols()
@@ -0,0 +1,57 @@
+"""
+对冲请求 (hedged requests)
+
+依次错开 delay 秒启动多条请求路径 (直连 / 代理), 取第一个有效结果, 其余全部取消。
+前一条路径提前失败时立即启动下一条, 不必等满 delay。
+单次调用的耗时约等于最快可用路径, 而不是所有失败路径的超时之和。
+"""
+import asyncio
+
+
+async def _run(factory):
+    try:
+        return await factory()
+    except asyncio.CancelledError:
+        raise
+    except Exception:
+        return None
+
+
+async def hedged_call(attempts, delay=0.3, max_in_flight=3):
+    """
+    attempts: 无参协程工厂列表, 按优先级排列; 每个返回有效数据或 None (无效/失败)
+    delay: 启动下一条路径前的等待秒数; None 表示严格串行 (上一条失败后才启动下一条)
+    max_in_flight: 同时在途的路径数上限
+    返回第一个非 None 结果, 全部失败返回 None
+    """
+    pending = set()
+    next_idx = 0
+    try:
+        while True:
+            # 没有在途请求时立即启动下一条
+            if not pending and next_idx < len(attempts):
+                pending.add(asyncio.ensure_future(_run(attempts[next_idx])))
+                next_idx += 1
+            if not pending:
+                return None
+
+            can_hedge = delay is not None and next_idx < len(attempts) and len(pending) < max_in_flight
+            done, pending = await asyncio.wait(
+                pending, timeout=delay if can_hedge else None, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                result = task.result()
+                if result is not None:
+                    return result
+
+            if not done and can_hedge:
+                # 等满 delay 仍无结果: 追加一条路径
+                pending.add(asyncio.ensure_future(_run(attempts[next_idx])))
+                next_idx += 1
+            elif done and next_idx < len(attempts) and len(pending) < max_in_flight and delay is not None:
+                # 有路径失败了: 立即补上下一条
+                pending.add(asyncio.ensure_future(_run(attempts[next_idx])))
+                next_idx += 1
+    finally:
+        for task in pending:
+            task.cancel()
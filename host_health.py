@@ -0,0 +1,108 @@
+"""
+按主机记录直连健康状态 (断路器)
+
+直连连续失败后, 在冷却期 (DIRECT_COOLDOWN 秒) 内直接走代理, 被地区限制时冷却期更长
+(DIRECT_RESTRICTED_COOLDOWN 秒, 地区限制不会很快解除), 不再每次都白等一个直连超时; 冷却期间只偶尔 (DIRECT_PROBE_INTERVAL 秒一次)
+在后台线程探测直连是否恢复。状态会写入本地缓存, 下一次定时运行可以直接沿用。
+"""
+import os
+import time
+import logging
+import threading
+from urllib.parse import urlparse
+
+from local_cache import cache_path, read_json, atomic_write_json
+
+logger = logging.getLogger(__name__)
+
+
+def host_of(url):
+    return urlparse(url).netloc
+
+
+def is_restricted(data):
+    """币安对受限地区返回 {'code': 0, 'msg': '... restricted location ...'}"""
+    return isinstance(data, dict) and "restricted" in str(data.get('msg', '')).lower()
+
+
+class HostHealth:
+    def __init__(self, cooldown=None, probe_interval=None, failure_threshold=3, state_file="host_health.json",
+                 restricted_cooldown=None, clock=time.time):
+        self.cooldown = cooldown if cooldown is not None else float(os.environ.get("DIRECT_COOLDOWN", "900"))
+        self.restricted_cooldown = (restricted_cooldown if restricted_cooldown is not None
+                                    else float(os.environ.get("DIRECT_RESTRICTED_COOLDOWN", "3600")))
+        self.clock = clock
+        self.probe_interval = probe_interval if probe_interval is not None else float(os.environ.get("DIRECT_PROBE_INTERVAL", "120"))
+        self.failure_threshold = failure_threshold  # 普通失败连续几次才熔断 (受限直接熔断)
+        self.state_path = cache_path(state_file) if state_file else None
+
+        self._lock = threading.Lock()
+        self._failures = {}       # host -> 连续失败次数
+        self._tripped_until = {}  # host -> 冷却结束时间戳
+        self._last_probe = {}     # host -> 上次探测时间
+        self._probing = set()
+
+        if self.state_path:
+            saved = read_json(self.state_path, {}) or {}
+            now = self.clock()
+            self._tripped_until = {h: t for h, t in saved.get('tripped_until', {}).items() if t > now}
+
+    def allow_direct(self, host):
+        """当前是否应该尝试直连"""
+        with self._lock:
+            return self._tripped_until.get(host, 0) <= self.clock()
+
+    def record_success(self, host):
+        with self._lock:
+            self._failures.pop(host, None)
+            changed = self._tripped_until.pop(host, None) is not None
+        if changed:
+            logger.info(f"{host} 直连已恢复")
+            self._save()
+
+    def record_failure(self, host, restricted=False):
+        with self._lock:
+            count = self._failures.get(host, 0) + 1
+            self._failures[host] = count
+            if not restricted and count < self.failure_threshold:
+                return
+            cooldown = self.restricted_cooldown if restricted else self.cooldown
+            self._tripped_until[host] = self.clock() + cooldown
+            self._last_probe[host] = self.clock()
+        reason = "IP 受限" if restricted else f"连续失败 {count} 次"
+        logger.warning(f"{host} 直连{reason}, {cooldown:.0f}s 内直接走代理")
+        self._save()
+
+    def maybe_probe(self, host, probe):
+        """
+        熔断期间偶尔在后台探测一次直连。
+        probe: 无参函数, 返回 True 表示直连可用
+        """
+        with self._lock:
+            now = self.clock()
+            if host in self._probing or now - self._last_probe.get(host, 0) < self.probe_interval:
+                return
+            self._probing.add(host)
+            self._last_probe[host] = now
+
+        def run():
+            try:
+                ok = probe()
+            except Exception:
+                ok = False
+            finally:
+                with self._lock:
+                    self._probing.discard(host)
+            if ok:
+                self.record_success(host)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def _save(self):
+        if not self.state_path: return
+        with self._lock:
+            state = {'tripped_until': dict(self._tripped_until)}
+        try:
+            atomic_write_json(self.state_path, state)
+        except OSError as e:
+            logger.debug(f"保存直连状态失败: {e}")
@@ -0,0 +1,120 @@
+"""
+Vectorized technical indicators over a 2-D [symbol, day] panel (see kline_cache.py).
+
+Every function takes arrays shaped (symbols, days) and returns the full series with
+the same shape, NaN where there is not enough history. Rolling windows are built from
+cumulative sums and the recursive averages (EMA, Wilder) loop over days only, so one
+pass over a few hundred symbols x 400 days costs a few milliseconds.
+The latest column of each series becomes a screens.MetricTable, and alts are flagged
+with the same declarative screens that main.py uses.
+"""
+import numpy as np
+
+from screens import MetricTable, Screen, evaluate
+
+COLUMNS = ('close', 'sma50', 'sma200', 'ema21', 'rsi', 'atr_pct', 'rvol', 'dist_ma200')
+
+# Overheated alt: momentum stretched (RSI) and price far above its bull/bear line
+OVERHEATED = Screen('overheated', where=(('rsi', '>=', 70), ('dist_ma200', '>=', 30)),
+                    sort_by='dist_ma200', top_k=10)
+
+
+def _window_sums(x, n):
+    """Sum and count of non-NaN values over the trailing n days, aligned to the last day of the window"""
+    valid = ~np.isnan(x)
+    cs = np.zeros((x.shape[0], x.shape[1] + 1))
+    cnt = np.zeros((x.shape[0], x.shape[1] + 1))
+    np.cumsum(np.where(valid, x, 0.0), axis=1, out=cs[:, 1:])
+    np.cumsum(valid, axis=1, out=cnt[:, 1:])
+    return cs[:, n:] - cs[:, :-n], cnt[:, n:] - cnt[:, :-n]
+
+
+def sma(x, n):
+    out = np.full(x.shape, np.nan)
+    if x.shape[1] >= n:
+        s, c = _window_sums(x, n)
+        out[:, n - 1:] = np.where(c == n, s / n, np.nan)
+    return out
+
+
+def ema(x, n=None, alpha=None):
+    """Exponential average (alpha = 2/(n+1), or given), seeded with each symbol's first value"""
+    alpha = alpha if alpha is not None else 2.0 / (n + 1)
+    out = np.full(x.shape, np.nan)
+    prev = np.full(x.shape[0], np.nan)
+    for t in range(x.shape[1]):
+        xt = x[:, t]
+        prev = np.where(np.isnan(prev), xt, np.where(np.isnan(xt), prev, prev + alpha * (xt - prev)))
+        out[:, t] = prev
+    return out
+
+
+def wilder(x, n):
+    return ema(x, alpha=1.0 / n)
+
+
+def _warmup(x, n):
+    """True until a symbol has more than n values (covers listings newer than the panel)"""
+    return np.cumsum(~np.isnan(x), axis=1) <= n
+
+
+def _prev(x):
+    out = np.full(x.shape, np.nan)
+    out[:, 1:] = x[:, :-1]
+    return out
+
+
+def rsi(close, n=14):
+    diff = close - _prev(close)
+    gain = wilder(np.maximum(diff, 0.0), n)     # NaN (no previous close) stays NaN
+    loss = wilder(np.maximum(-diff, 0.0), n)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out = 100.0 - 100.0 / (1.0 + gain / loss)
+    out = np.where((loss == 0) & (gain > 0), 100.0, out)
+    return np.where(_warmup(close, n), np.nan, out)   # too little history for a meaningful value
+
+
+def atr(high, low, close, n=14):
+    prev_close = _prev(close)
+    # fmax ignores the NaN previous close on each symbol's first day
+    tr = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+    return np.where(_warmup(close, n), np.nan, wilder(tr, n))
+
+
+def realized_vol(close, n=30, periods=365):
+    """Annualized standard deviation of daily log returns over n days, in %"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r = np.log(close / _prev(close))
+    out = np.full(close.shape, np.nan)
+    if close.shape[1] >= n:
+        s, c = _window_sums(r, n)
+        s2, _ = _window_sums(r * r, n)
+        var = np.where(c == n, (s2 - s * s / n) / (n - 1), np.nan)
+        out[:, n - 1:] = np.sqrt(np.maximum(var, 0.0) * periods) * 100
+    return out
+
+
+def compute(panel):
+    """All indicators for every symbol of a KlinePanel -> {name: 2-D series}"""
+    close, high, low = panel['close'], panel['high'], panel['low']
+    ma200 = sma(close, 200)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {
+            'close': close,
+            'sma50': sma(close, 50),
+            'sma200': ma200,
+            'ema21': ema(close, 21),
+            'rsi': rsi(close, 14),
+            'atr_pct': atr(high, low, close, 14) / close * 100,
+            'rvol': realized_vol(close, 30),
+            'dist_ma200': (close / ma200 - 1) * 100,
+        }
+
+
+def latest_table(symbols, series):
+    """Last day of every series as a MetricTable (one row per symbol)"""
+    return MetricTable(symbols, {k: series[k][:, -1] for k in COLUMNS})
+
+
+def overheated(table, screen=OVERHEATED):
+    return table.rows(evaluate(table, screen))
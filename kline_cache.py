@@ -0,0 +1,110 @@
+"""
+Local daily-kline panel for many symbols (input of indicators.py).
+
+All symbols share one grid of the last `days` closed UTC days, stored as a single
+array data[field, symbol, day] (NaN where a symbol has no candle, e.g. recent listings).
+The panel lives in .cache/klines/ as one .npz file:
+- when new days close, the grid is shifted left and only the missing tail is fetched
+  for each symbol (normally one candle per symbol: klines weight 1)
+- new symbols are backfilled once, symbols that left the universe are dropped
+"""
+import os
+import time
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from local_cache import cache_path
+
+DAY_MS = 86400 * 1000
+FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+
+class KlinePanel:
+    def __init__(self, days=400, path=None):
+        self.days = days
+        self.path = path or cache_path('klines', f"perp_1d_{days}.npz")
+        self.symbols = []
+        self.end_day = None     # UTC day number (days since epoch) of the last column
+        self.data = np.full((len(FIELDS), 0, days), np.nan)
+        self._load()
+
+    def _load(self):
+        try:
+            with np.load(self.path, allow_pickle=False) as f:
+                data, symbols, end_day = f['data'], f['symbols'], int(f['end_day'])
+        except (OSError, KeyError, ValueError):
+            return
+        if data.shape != (len(FIELDS), len(symbols), self.days):
+            return
+        self.data, self.symbols, self.end_day = data, [str(s) for s in symbols], end_day
+
+    def save(self):
+        directory = os.path.dirname(self.path) or '.'
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix='.npz')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, data=self.data, symbols=np.array(self.symbols, dtype=str),
+                         end_day=np.array(self.end_day if self.end_day is not None else -1))
+            os.replace(tmp, self.path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+
+    def __getitem__(self, field):
+        """2-D array [symbol, day] of one field"""
+        return self.data[FIELDS.index(field)]
+
+    def _align(self, symbols, last_day):
+        """Shift the grid to end at last_day and re-order rows to `symbols` (new rows are NaN)"""
+        data = self.data
+        if self.end_day is not None and last_day != self.end_day:
+            shift = last_day - self.end_day
+            shifted = np.full_like(data, np.nan)
+            if 0 < shift < self.days:
+                shifted[:, :, :-shift] = data[:, :, shift:]
+            data = shifted
+        rows = {s: i for i, s in enumerate(self.symbols)}
+        out = np.full((len(FIELDS), len(symbols), self.days), np.nan)
+        keep = [(j, rows[s]) for j, s in enumerate(symbols) if s in rows]
+        if keep:
+            dst, src = zip(*keep)
+            out[:, list(dst)] = data[:, list(src)]
+        self.data, self.symbols, self.end_day = out, list(symbols), last_day
+
+    def missing_tail(self):
+        """Per symbol: how many days at the end of the grid have no candle"""
+        valid = ~np.isnan(self['close'])
+        has_any = valid.any(axis=1)
+        last = self.days - 1 - np.argmax(valid[:, ::-1], axis=1)
+        return np.where(has_any, self.days - 1 - last, self.days)
+
+    def update(self, symbols, fetch_klines, now_ms=None, workers=8):
+        """
+        Bring the panel up to date for `symbols` (closed candles only).
+        fetch_klines(symbol, start_ms, limit) -> Binance kline rows [open_time, o, h, l, c, v, close_time, ...]
+        Returns the number of requests made.
+        """
+        now_ms = now_ms or int(time.time() * 1000)
+        last_day = now_ms // DAY_MS - 1        # newest day whose candle has closed
+        self._align(list(dict.fromkeys(symbols)), last_day)
+
+        first_day = last_day - self.days + 1
+        todo = [(i, int(m)) for i, m in enumerate(self.missing_tail()) if m > 0]
+
+        def fetch(item):
+            i, missing = item
+            start = (last_day - missing + 1) * DAY_MS
+            return i, fetch_klines(self.symbols[i], start, missing + 1)
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for i, rows in pool.map(fetch, todo):
+                for r in rows or []:
+                    col = int(r[0]) // DAY_MS - first_day
+                    if 0 <= col < self.days and int(r[6]) < now_ms:
+                        self.data[:, i, col] = [float(v) for v in r[1:6]]
+        return len(todo)
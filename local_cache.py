@@ -0,0 +1,46 @@
+"""
+本地缓存目录 + 原子化 JSON 读写
+
+GitHub Actions 每次运行都是全新环境, workflow 会用 actions/cache 在多次运行
+之间保留这个目录; 本地运行时就是仓库下的 .cache/。
+"""
+import os
+import json
+import tempfile
+
+CACHE_DIR = os.environ.get("MONITOR_CACHE_DIR") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), ".cache"
+)
+
+
+def cache_path(*parts):
+    """返回缓存目录下的文件路径 (自动创建父目录)"""
+    path = os.path.join(CACHE_DIR, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+
+def read_json(path, default=None):
+    """读取 JSON 文件, 不存在或已损坏时返回 default"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def atomic_write_json(path, data):
+    """先写临时文件再 os.replace, 进程中途退出也不会留下半个文件"""
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix='.json')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
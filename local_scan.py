@@ -1,6 +1,15 @@
+import os
 import requests
 import time
 from datetime import datetime, timedelta
+from host_health import HostHealth, host_of, is_restricted
+from proxy_pool import ProxyPool
+from fetch_plan import FetchPlanner, OI_METRICS
+from oi_store import OISeriesStore
+from screens import MetricTable, run_screens, ACCUMULATION, TOP_OI
+from rate_limit import BinanceWeightScheduler
+from market_stream import load_snapshot
+from meta_cache import MetaCache, perp_universe
 
 # ==================== Simplified Logic for Local Run ====================
 
@@ -8,32 +17,50 @@ class LocalMonitor:
     def __init__(self):
         self.proxies = []
         self.proxy_index = 0
+        self.health = HostHealth()
+        self.proxy_pool = ProxyPool(validate_url="https://fapi.binance.com/fapi/v1/time")
+        self.planner = FetchPlanner()
+        self.limiter = BinanceWeightScheduler()
+        self.series = OISeriesStore()
+        self.meta = MetaCache()
+        # Top N by volume; 0 scans every USDT perp (paced by the weight limiter)
+        self.top_n = int(os.environ.get("LOCAL_SCAN_TOP", "30"))
 
     def get_public_proxies(self):
-        """Fetch public proxies if needed"""
+        """Take the best-ranked proxies from the scored pool"""
         if self.proxies: return
         try:
-            print("正在获取公共代理列表 (Ref: monosans)...")
-            url = "https://raw.githubusercontent.com/monosans/proxy-list/main/proxies/http.txt"
-            resp = requests.get(url, timeout=5)
-            if resp.status_code == 200:
-                all_proxies = resp.text.splitlines()[:50]
-                self.proxies = [{"http": f"http://{p}", "https": f"http://{p}"} for p in all_proxies]
-                print(f"成功获取 {len(self.proxies)} 个代理")
+            best = self.proxy_pool.best(20)
+            self.proxies = [{"http": p, "https": p} for p in best]
+            print(f"代理池可用代理 {len(self.proxies)} 个")
         except Exception as e:
             print(f"获取代理失败: {e}")
 
+    def probe_direct(self, host):
+        resp = requests.get(f"https://{host}/fapi/v1/ping", timeout=5)
+        return resp.status_code == 200 and not is_restricted(resp.json())
+
     def request_with_retry(self, url):
-        # 1. Try Direct
-        try:
-            resp = requests.get(url, timeout=5)
-            if resp.status_code == 200:
-                data = resp.json()
-                if isinstance(data, dict) and "restricted" in str(data.get('msg', '')):
-                    raise ValueError("IP Restricted")
-                return data
-        except Exception:
-            pass
+        # 1. Try Direct (skipped while the direct path is cooling down)
+        host = host_of(url)
+        if self.health.allow_direct(host):
+            try:
+                self.limiter.acquire(url)
+                resp = requests.get(url, timeout=5)
+                self.limiter.observe(url, resp.status_code, resp.headers)
+                if resp.status_code == 200:
+                    data = resp.json()
+                    if is_restricted(data):
+                        self.health.record_failure(host, restricted=True)
+                    else:
+                        self.health.record_success(host)
+                        return data
+                else:
+                    self.health.record_failure(host, restricted=resp.status_code in (403, 451))
+            except Exception:
+                self.health.record_failure(host)
+        else:
+            self.health.maybe_probe(host, lambda: self.probe_direct(host))
 
         # 2. Try Proxies
         self.get_public_proxies()
@@ -42,43 +69,50 @@ class LocalMonitor:
         for _ in range(5):
             if self.proxy_index >= len(self.proxies): self.proxy_index = 0
             proxy = self.proxies[self.proxy_index]
+            start = time.time()
             try:
                 resp = requests.get(url, proxies=proxy, timeout=5)
+                self.limiter.observe(url, resp.status_code, resp.headers, direct=False)
                 if resp.status_code == 200:
-                    return resp.json()
+                    data = resp.json()
+                    self.proxy_pool.record(proxy['http'], True, time.time() - start)
+                    return data
             except:
                 pass
+            self.proxy_pool.record(proxy['http'], False)
             self.proxy_index += 1
         return None
 
+    def fetch(self, url):
+        return self.planner.get(url, self.request_with_retry)
+
     def get_real_oi_growth(self, symbol):
         try:
-            # OI Now
-            oi_resp = self.request_with_retry(f"https://fapi.binance.com/fapi/v1/openInterest?symbol={symbol}")
-            if not oi_resp or 'openInterest' not in oi_resp: return 0, 0, 1.0
-            oi_now = float(oi_resp['openInterest'])
-            
-            # OI History (30m ago)
-            hist_url = f"https://fapi.binance.com/futures/data/openInterestHist?symbol={symbol}&period=5m&limit=7"
-            hist_resp = self.request_with_retry(hist_url)
-            if not hist_resp or not isinstance(hist_resp, list): return oi_now, 0, 1.0
-
-            oi_30m_ago = float(hist_resp[0]['sumOpenInterest'])
-            oi_growth = ((oi_now - oi_30m_ago) / oi_30m_ago) * 100 if oi_30m_ago > 0 else 0
-
-            # LS Ratio
-            ls_url = f"https://fapi.binance.com/futures/data/topLongShortPositionRatio?symbol={symbol}&period=30m&limit=1"
-            ls_resp = self.request_with_retry(ls_url)
-            ls_ratio = float(ls_resp[0]['longShortRatio']) if ls_resp else 1.0
-
-            return oi_now, oi_growth, ls_ratio
+            # Only fetch bars newer than the local series; growth comes from local data
+            urls = self.planner.symbol_urls(OI_METRICS, symbol, limits=self.series.fetch_limits(symbol))
+            if 'oi_hist' in urls:
+                self.series.ingest(symbol, 'oi', self.fetch(urls['oi_hist']))
+            if 'ls_ratio' in urls:
+                self.series.ingest(symbol, 'ls', self.fetch(urls['ls_ratio']))
+
+            growth = self.series.oi_growth(symbol, minutes=30)
+            if growth is None: return 0, 0, 1.0
+            oi_now, oi_growth = growth
+
+            ls_ratio = self.series.latest(symbol, 'ls', max_age_ms=60 * 60 * 1000)
+            return oi_now, oi_growth, ls_ratio if ls_ratio is not None else 1.0
         except:
             return 0, 0, 1.0
 
     def scan(self):
         print("🔍 正在扫描币安市场数据，请稍候...", flush=True)
-        t_resp = self.request_with_retry("https://fapi.binance.com/fapi/v1/ticker/24hr")
-        p_resp = self.request_with_retry("https://fapi.binance.com/fapi/v1/premiumIndex")
+        # market_stream.py 在运行时直接读它的快照, 不消耗请求权重
+        snapshot = load_snapshot()
+        if snapshot:
+            t_resp, p_resp = snapshot
+        else:
+            t_resp = self.fetch(self.planner.url('ticker_24hr'))
+            p_resp = self.fetch(self.planner.url('premium_index'))
 
         if not t_resp or not isinstance(t_resp, list):
             print("⚠️ 无法连接币安 API (可能由于网络限制)")
@@ -86,12 +120,17 @@ class LocalMonitor:
 
         premiums = {p['symbol']: p for p in p_resp} if isinstance(p_resp, list) else {}
         
-        # Filter active USDT pairs
+        # Filter active USDT pairs (TRADING + PERPETUAL per exchangeInfo, cached on disk)
+        universe = self.meta.get('binance_perp_universe',
+                                 lambda: perp_universe(self.fetch(self.planner.url('exchange_info'))))
+        tradable = set(universe) if universe else None
         active_tickers = sorted(
-            [t for t in t_resp if t['symbol'].endswith("USDT")],
+            [t for t in t_resp if (t['symbol'] in tradable if tradable else t['symbol'].endswith("USDT"))],
             key=lambda x: float(x['quoteVolume']),
             reverse=True
-        )[:30] # Top 30 for speed
+        )
+        if self.top_n:
+            active_tickers = active_tickers[:self.top_n] # Top 30 by default for speed
 
         all_metrics = []
         for i, t in enumerate(active_tickers):
@@ -108,9 +147,10 @@ class LocalMonitor:
                 "funding": funding
             })
 
-        # Generate Report
-        accumulation = [d for d in all_metrics if -2 < d['price_chg'] < 5 and d['oi_chg'] > 1.5 and d['ls'] > 1.2]
-        top_oi = sorted(all_metrics, key=lambda x: x['oi_chg'], reverse=True)[:5]
+        # Generate Report (screens shared with main.py)
+        hits = run_screens(MetricTable.from_records(all_metrics), (ACCUMULATION, TOP_OI))
+        accumulation = hits['accumulation']
+        top_oi = hits['top_oi']
         
         print("\n" + "="*40)
         beijing_time = datetime.utcnow() + timedelta(hours=8)
@@ -126,7 +166,10 @@ class LocalMonitor:
             print(f"• {d['symbol']}: +{d['oi_chg']:.1f}% | LS:{d['ls']:.2f} | 费率:{d['funding']:.3f}%")
             
         print("="*40)
+        print(self.planner.summary())
 
 if __name__ == "__main__":
     monitor = LocalMonitor()
     monitor.scan()
+    monitor.proxy_pool.save()
+    monitor.series.save()
@@ -0,0 +1,133 @@
+"""
+增量式 LS (大户多空比) 趋势分析
+
+每个币种只保存固定大小的状态, 每次扫描 O(1) 更新, 不回放历史:
+- 最新值 / 时间、连续上升(负数为连续下降)次数、累计样本数
+- 每个窗口 (2h / 24h / 7d ...) 一组指数衰减的最小二乘累加量 [S0, St, Sy, Stt, Sty]
+  (时间常数 = 窗口长度, 时间原点始终是最新一个点)
+  由此直接得到窗口内的 EWMA (Sy/S0) 和加权回归斜率。
+任意时刻都可以出某个窗口的趋势报告, 不用等周期攒满;
+发送节奏按距上次报告的时间决定 (report_due / mark_reported), 与扫描次数无关。
+"""
+import math
+from typing import Dict, List
+
+from local_cache import cache_path, read_json, atomic_write_json
+from scan_store import to_ms
+
+HOUR_MS = 3600 * 1000
+WINDOWS = {'2h': 2, '24h': 24, '7d': 24 * 7}
+REPORT_SLACK_MS = 10 * 60 * 1000   # 定时任务启动时间有抖动, 差几分钟到点也算到期
+
+
+class LSTrendAnalyzer:
+    def __init__(self, windows=None, path=None):
+        self.windows = dict(windows or WINDOWS)
+        self.path = path or cache_path('ls_trend.json')
+        # symbol -> [last, last_ts, streak, n, [[S0, St, Sy, Stt, Sty] 每个窗口一组]]
+        self.state: Dict[str, list] = {}
+        self.last_report = None   # 上次发送趋势报告的时间 (毫秒)
+
+    @classmethod
+    def load(cls, windows=None, path=None) -> "LSTrendAnalyzer":
+        a = cls(windows, path)
+        data = read_json(a.path) or {}
+        # 窗口配置变了, 旧的累加量没有意义
+        if data.get('windows') == list(a.windows.values()):
+            a.state = data.get('state', {})
+        a.last_report = data.get('last_report')
+        return a
+
+    def save(self):
+        atomic_write_json(self.path, {'windows': list(self.windows.values()), 'state': self.state,
+                                      'last_report': self.last_report})
+
+    def report_due(self, now_ms: int, every_hours: float) -> bool:
+        """距上次趋势报告已满 every_hours 小时; 第一次运行只开始计时, 不发送"""
+        if self.last_report is None:
+            self.last_report = now_ms
+            return False
+        return now_ms - self.last_report >= every_hours * HOUR_MS - REPORT_SLACK_MS
+
+    def mark_reported(self, now_ms: int):
+        self.last_report = now_ms
+
+    def update(self, symbol: str, ts_ms: int, value: float):
+        st = self.state.get(symbol)
+        if st is None:
+            self.state[symbol] = [value, ts_ms, 0, 1, [[1.0, 0.0, value, 0.0, 0.0] for _ in self.windows]]
+            return
+        last, last_ts, streak, n, sums = st
+        if ts_ms <= last_ts:
+            return
+        dt = (ts_ms - last_ts) / HOUR_MS
+        for hours, s in zip(self.windows.values(), sums):
+            s0, st_, sy, stt, sty = s
+            # 时间原点移到新点 (旧点的 t 都减去 dt), 再整体衰减, 最后加入 t=0 的新点
+            stt = stt - 2 * dt * st_ + dt * dt * s0
+            sty = sty - dt * sy
+            st_ = st_ - dt * s0
+            decay = math.exp(-dt / hours)
+            s[:] = [s0 * decay + 1.0, st_ * decay, sy * decay + value, stt * decay, sty * decay]
+
+        if value > last:
+            streak = streak + 1 if streak > 0 else 1
+        elif value < last:
+            streak = streak - 1 if streak < 0 else -1
+        st[:4] = [value, ts_ms, streak, n + 1]
+
+    def update_scan(self, timestamp, metrics: List[Dict]):
+        """用一次扫描的完整指标表更新所有币种; 没有真实 LS 读数的 (ls_ok=False, 拉取失败时的占位值) 跳过"""
+        if not metrics:
+            return
+        ts = to_ms(timestamp)
+        for m in metrics:
+            if m.get('ls') is None or not m.get('ls_ok', True):
+                continue
+            self.update(m['symbol'], ts, m['ls'])
+
+    def trend(self, symbol: str, window: str):
+        """窗口内的趋势: ewma / 斜率(每小时) / 回归线上窗口起点到现在的涨幅 %; 数据不足返回 None"""
+        st = self.state.get(symbol)
+        if st is None or st[3] < 3:
+            return None
+        i = list(self.windows).index(window)
+        s0, st_, sy, stt, sty = st[4][i]
+        denom = s0 * stt - st_ * st_
+        if denom <= 1e-12:
+            return None
+        slope = (s0 * sty - st_ * sy) / denom
+        ewma = sy / s0
+        fit_now = ewma - slope * st_ / s0
+        fit_start = fit_now - slope * self.windows[window]
+        growth = (fit_now - fit_start) / fit_start * 100 if fit_start > 0 else 0.0
+        return {"symbol": symbol, "last": st[0], "ewma": ewma, "slope": slope,
+                "growth_pct": growth, "streak": st[2], "count": st[3]}
+
+    def rising(self, window: str, now_ms=None, min_growth=0.5) -> List[Dict]:
+        """窗口内 LS 趋势涨幅超过 min_growth% 的币种, 按涨幅排序; 超过一个窗口没更新的 (已下架等) 不计入"""
+        if now_ms is None:
+            now_ms = max((st[1] for st in self.state.values()), default=0)
+        horizon = self.windows[window] * HOUR_MS
+        results = []
+        for symbol, st in self.state.items():
+            if now_ms - st[1] > horizon:
+                continue
+            t = self.trend(symbol, window)
+            if t and t['growth_pct'] > min_growth:
+                results.append(t)
+        results.sort(key=lambda x: x['growth_pct'], reverse=True)
+        return results
+
+    def generate_report(self, window: str = '2h', top: int = 15) -> str:
+        results = self.rising(window)
+        if not results:
+            return f"🤖 **【LS趋势分析 ({window})】**\n该窗口内未发现LS持续增长的币种。"
+
+        msg = f"🤖 **【LS趋势分析 ({window})】**\n发现 {len(results)} 个LS增长币种:\n\n"
+        for i, r in enumerate(results[:top], 1):
+            msg += f"**{i}. {r['symbol']}**\n"
+            msg += f"   • LS: 均值 {r['ewma']:.2f} → 当前 {r['last']:.2f} (趋势 +{r['growth_pct']:.1f}%)\n"
+            if r['streak'] > 1:
+                msg += f"   • 连续上升: {r['streak']} 次\n"
+        return msg
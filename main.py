@@ -1,13 +1,33 @@
 import os
 import json
+import time
+import asyncio
 import logging
 import requests
+import aiohttp
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional
-import firebase_admin
-from firebase_admin import credentials
-from firebase_admin import firestore
+from urllib.parse import urlparse
+try:
+    import firebase_admin
+    from firebase_admin import credentials
+    from firebase_admin import firestore
+except ImportError:  # 只用本地存储时不需要 firebase-admin
+    firebase_admin = None
 from dataclasses import dataclass, asdict
+from host_health import HostHealth, host_of, is_restricted
+from proxy_pool import ProxyPool
+from hedge import hedged_call
+from fetch_plan import FetchPlanner, OI_METRICS
+from oi_store import OISeriesStore
+from screens import MetricTable, run_screens, OI_SCREENS
+from rate_limit import BinanceWeightScheduler
+from market_stream import load_snapshot
+from scan_store import ScanStore, SQLiteScanStore, to_ms
+from ls_trend import LSTrendAnalyzer
+from notifier import TelegramNotifier, split_message
+from outbox import Outbox, outbox_key
+from meta_cache import MetaCache, perp_universe
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -20,14 +40,27 @@ class Config:
         self.bot_token = os.environ.get("TELEGRAM_BOT_TOKEN")
         self.chat_id = os.environ.get("TELEGRAM_CHAT_ID")
         self.firebase_creds_json = os.environ.get("FIREBASE_CREDENTIALS")
-        
+        # 存储后端: sqlite (本地 .cache/) / firestore; 默认有 Firebase 密钥时用 firestore
+        self.store_backend = os.environ.get("SCAN_STORE") or ("firestore" if self.firebase_creds_json else "sqlite")
+
         # 验证配置
-        if not all([self.bot_token, self.chat_id, self.firebase_creds_json]):
-            raise ValueError("缺少必要的环境变量: TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID, FIREBASE_CREDENTIALS")
+        if not all([self.bot_token, self.chat_id]):
+            raise ValueError("缺少必要的环境变量: TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID")
+        if self.store_backend == "firestore" and not self.firebase_creds_json:
+            raise ValueError("SCAN_STORE=firestore 需要环境变量 FIREBASE_CREDENTIALS")
 
-        self.report_cycle = 4  # 4次报告(约2小时)为一个周期
+        self.trend_window = os.environ.get("LS_TREND_WINDOW", "2h")  # 趋势报告窗口: 2h / 24h / 7d
+        self.trend_every = float(os.environ.get("LS_TREND_EVERY_HOURS", "2"))  # 趋势报告间隔(小时), 与扫描次数无关
         self.collection_name = "binance_monitor"
 
+        # 扫描模式: async (并发, 默认) / sync (逐个串行, 旧逻辑)
+        self.scan_mode = os.environ.get("OI_SCAN_MODE", "async")
+        self.host_concurrency = int(os.environ.get("OI_HOST_CONCURRENCY", "10"))  # 每个主机的最大并发请求数
+        self.symbol_timeout = float(os.environ.get("OI_SYMBOL_TIMEOUT", "20"))    # 单个币种的超时时间(秒)
+        self.hedge_delay = float(os.environ.get("OI_HEDGE_DELAY", "0.3"))         # 对冲请求错开间隔(秒), 0 关闭
+        self.proxy_concurrency = int(os.environ.get("OI_PROXY_CONCURRENCY", "10"))  # 经代理的最大并发请求数
+        self.max_symbols = int(os.environ.get("OI_MAX_SYMBOLS", "0"))             # 扫描币种上限, 0 为全部USDT永续
+
 # ==================== 数据结构 ====================
 @dataclass
 class CoinData:
@@ -37,75 +70,129 @@ class CoinData:
     extra_info: str = ""
 
 # ==================== Firebase 管理 ====================
-class FirebaseManager:
-    def __init__(self, creds_json):
-        if not firebase_admin._apps:
-            cred_dict = json.loads(creds_json)
-            cred = credentials.Certificate(cred_dict)
-            firebase_admin.initialize_app(cred)
-        self.db = firestore.client()
+class FirebaseManager(ScanStore):
+    """
+    只保存周期计数器 state.cycle_len (原子自增, 一次写入, 不需要先读)。
+    报告正文不再写入 Firestore: 趋势分析用本地增量状态 (ls_trend.py),
+    没有读取方的逐份报告文档只会无限增长。
+    """
+    def __init__(self, creds_json=None, db=None):
+        if db is None:
+            if firebase_admin is None:
+                raise RuntimeError("未安装 firebase-admin, 请改用 SCAN_STORE=sqlite")
+            if not firebase_admin._apps:
+                cred_dict = json.loads(creds_json)
+                cred = credentials.Certificate(cred_dict)
+                firebase_admin.initialize_app(cred)
+            db = firestore.client()
+        self.db = db
         self.collection = self.db.collection('binance_monitor')
+        self.state = self.collection.document('state')
+
+    def add_report_to_cycle(self, report: Dict) -> int:
+        """周期计数加一并返回当前周期长度 (一次写入, 无读)"""
+        result = self.state.set({'cycle_len': firestore.Increment(1)}, merge=True)
+
+        # 自增后的值在 transform_results 里返回; 取不到时再读一次
+        transforms = getattr(result, 'transform_results', None)
+        if transforms:
+            return int(transforms[0].integer_value)
+        doc = self.state.get()
+        return int(doc.to_dict().get('cycle_len', 0)) if doc.exists else 0
 
-    def get_current_cycle(self) -> List[Dict]:
-        """获取当前周期的报告列表"""
-        doc = self.collection.document('state').get()
-        if doc.exists:
-            data = doc.to_dict()
-            return data.get('current_cycle', [])
-        return []
-
-    def add_report_to_cycle(self, report: Dict):
-        """添加报告到当前周期"""
-        doc_ref = self.collection.document('state')
-        # 使用 array_union 添加原子性 (或者直接读-改-写，这里读-改-写更可控)
-        current = self.get_current_cycle()
-        current.append(report)
-        doc_ref.set({'current_cycle': current}, merge=True)
-        return len(current)
-
-    def reset_cycle(self):
-        """重置周期"""
-        doc_ref = self.collection.document('state')
-        doc_ref.set({'current_cycle': []}, merge=True)
-        # 可选：归档历史数据
+    def reset_cycle(self, consumed: int):
+        """重置周期: 只减去已分析的份数, 与其间并发运行的计数互不覆盖"""
+        self.state.set({'cycle_len': firestore.Increment(-consumed)}, merge=True)
 
 # ==================== OI 监控核心逻辑 ====================
+class DirectSlot:
+    """一次直连请求占用的权重和主机名额; 请求没发出就释放时退还权重"""
+    def __init__(self, limiter, sem, url):
+        self.limiter, self.sem, self.url = limiter, sem, url
+        self.sent = False
+        self.held = True
+
+    def release(self):
+        if not self.held:
+            return
+        self.held = False
+        self.sem.release()
+        if not self.sent:
+            self.limiter.refund(self.url)
+
 class OIMonitor:
-    def __init__(self, bot_token, chat_id):
+    def __init__(self, bot_token, chat_id, host_concurrency=10, symbol_timeout=20.0, hedge_delay=0.3, hedge_width=2,
+                 max_symbols=0, proxy_concurrency=10):
         self.bot_token = bot_token
         self.chat_id = chat_id
         self.proxies = []
         self.proxy_index = 0
+        # 异步扫描参数
+        self.host_concurrency = host_concurrency
+        self.symbol_timeout = symbol_timeout
+        self.hedge_delay = hedge_delay  # 对冲请求的错开间隔 (秒), 0 为关闭
+        self.hedge_width = hedge_width  # 直连之外最多同时在途的代理数
+        self.max_symbols = max_symbols  # 最多扫描多少个币种, 0 为全部
+        self.proxy_concurrency = proxy_concurrency  # 经代理同时在途的请求数上限 (与直连名额分开)
+        self._host_sems = {}
+        self._proxy_sem = None
+        self._proxy_lock = None
+        # 直连断路器: 直连受限后冷却期内直接走代理
+        self.health = HostHealth()
+        # 评分代理池 (按延迟/成功率排序, 结果缓存到本地)
+        self.proxy_pool = ProxyPool(validate_url="https://fapi.binance.com/fapi/v1/time")
+        # 请求规划: 最少接口 + 同一 URL 去重
+        self.planner = FetchPlanner()
+        # 币安权重限速 (令牌桶, 按 /fapi 与 /futures/data 分开)
+        self.limiter = BinanceWeightScheduler()
+        # 本地 OI/LS 序列: 只拉比本地更新的 K 线
+        self.series = OISeriesStore()
+        # Telegram 推送: 超长自动分段; chat_id 可以用逗号分隔多个
+        self.notifier = TelegramNotifier(bot_token, chat_id)
+        # 发件箱: 推送失败的消息留到下次运行补发, 不用重新扫描
+        self.outbox = Outbox()
+        # 一次运行里的异步工作 (扫描 / 每次推送) 共用一个事件循环, Telegram 连接跨推送复用
+        self._loop = None
+        # 合约列表等元数据的磁盘缓存 (按资源 TTL)
+        self.meta = MetaCache()
 
     def get_public_proxies(self):
-        """从公共源获取最新代理列表"""
+        """从评分代理池取出当前最好的一批代理"""
         if self.proxies: return
         try:
-            logger.info("正在获取公共代理列表...")
-            # 使用 reliable 的 GitHub 代理列表源
-            url = "https://raw.githubusercontent.com/monosans/proxy-list/main/proxies/http.txt"
-            resp = requests.get(url, timeout=5)
-            if resp.status_code == 200:
-                # 只取前50个，避免太久
-                all_proxies = resp.text.splitlines()[:50]
-                self.proxies = [{"http": f"http://{p}", "https": f"http://{p}"} for p in all_proxies]
-                logger.info(f"成功获取 {len(self.proxies)} 个代理")
+            best = self.proxy_pool.best(20)
+            self.proxies = [{"http": p, "https": p} for p in best]
+            logger.info(f"代理池可用代理 {len(self.proxies)} 个")
         except Exception as e:
             logger.error(f"获取代理失败: {e}")
 
+    def _probe_direct(self, host):
+        """后台探测直连是否恢复 (ping 接口, 权重 1)"""
+        resp = requests.get(f"https://{host}/fapi/v1/ping", timeout=3)
+        return resp.status_code == 200 and not is_restricted(resp.json())
+
     def request_with_retry(self, url):
         """带代理重试的请求封装 (优化版: 记住好用的代理)"""
-        # 1. 先尝试直连 (快速探测)
-        try:
-            resp = requests.get(url, timeout=3)
-            if resp.status_code == 200:
-                data = resp.json()
-                if isinstance(data, dict) and ('code' in data or 'msg' in data):
-                     if "restricted" in str(data.get('msg', '')):
-                         raise ValueError("IP Restricted")
-                return data
-        except Exception:
-            pass # 直连失败，静默转代理
+        # 1. 先尝试直连 (快速探测), 直连熔断期间跳过
+        host = host_of(url)
+        if self.health.allow_direct(host):
+            try:
+                self.limiter.acquire(url)
+                resp = requests.get(url, timeout=3)
+                self.limiter.observe(url, resp.status_code, resp.headers)
+                if resp.status_code == 200:
+                    data = resp.json()
+                    if is_restricted(data):
+                        self.health.record_failure(host, restricted=True)
+                    else:
+                        self.health.record_success(host)
+                        return data
+                else:
+                    self.health.record_failure(host, restricted=resp.status_code in (403, 451))
+            except Exception:
+                self.health.record_failure(host) # 直连失败，静默转代理
+        else:
+            self.health.maybe_probe(host, lambda: self._probe_direct(host))
 
         # 2. 准备代理
         self.get_public_proxies()
@@ -118,62 +205,260 @@ class OIMonitor:
                 self.proxy_index = 0
             
             proxy = self.proxies[self.proxy_index]
+            start = time.time()
             try:
                 # logger.info(f"使用代理[{self.proxy_index}]...") 
                 # 减少日志刷屏，只在出错时记录
                 resp = requests.get(url, proxies=proxy, timeout=5)
+                self.limiter.observe(url, resp.status_code, resp.headers, direct=False)
                 if resp.status_code == 200:
                     data = resp.json()
                     # 检查有效性
                     if isinstance(data, dict) and 'code' in data:
                         # 代理被墙，换下一个
+                        self.proxy_pool.record(proxy['http'], False)
                         self.proxy_index += 1
                         continue
+                    self.proxy_pool.record(proxy['http'], True, time.time() - start)
                     return data
             except Exception:
                 # 连接超时等，换下一个
                 pass
             
+            self.proxy_pool.record(proxy['http'], False)
             self.proxy_index += 1
         
         return None
 
+    # ---------- 异步版本 (并发扫描用) ----------
+    def _host_semaphore(self, url):
+        """每个目标主机一个信号量, 限制同时在途的请求数"""
+        host = urlparse(url).netloc
+        sem = self._host_sems.get(host)
+        if sem is None:
+            sem = asyncio.Semaphore(self.host_concurrency)
+            self._host_sems[host] = sem
+        return sem
+
+    def _proxy_semaphore(self):
+        """代理请求单独限流, 不占直连的主机名额"""
+        if self._proxy_sem is None:
+            self._proxy_sem = asyncio.Semaphore(self.proxy_concurrency)
+        return self._proxy_sem
+
+    async def _direct_slot(self, url):
+        """
+        直连名额: 预占权重并占住主机信号量后才返回。
+        对冲计时从拿到名额之后开始, 排队等名额的时间不会触发代理请求。
+        """
+        sem = self._host_semaphore(url)
+        await self.limiter.acquire_async(url)
+        try:
+            await sem.acquire()
+        except asyncio.CancelledError:
+            self.limiter.refund(url)
+            raise
+        return DirectSlot(self.limiter, sem, url)
+
+    async def _ensure_proxies_async(self):
+        """并发任务共用一次代理拉取, 避免每个任务都去请求代理源"""
+        if self.proxies: return
+        if self._proxy_lock is None:
+            self._proxy_lock = asyncio.Lock()
+        async with self._proxy_lock:
+            if not self.proxies:
+                await asyncio.to_thread(self.get_public_proxies)
+
+    def _advance_proxy(self, idx):
+        # 只有当前索引仍指向失败的代理时才前进, 防止多个任务同时失败时跳过好用的代理
+        if self.proxy_index == idx:
+            self.proxy_index = idx + 1
+
+    async def _get_json_async(self, session, url, timeout, proxy=None):
+        """返回 (状态码, JSON); 非 200 时 JSON 为 None (限速和并发名额由调用方负责)"""
+        async with session.get(url, proxy=proxy, timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+            self.limiter.observe(url, resp.status, resp.headers, direct=proxy is None)
+            if resp.status != 200:
+                return resp.status, None
+            return resp.status, await resp.json(content_type=None)
+
+    async def _direct_attempt(self, session, url, host, slot):
+        """直连一次 (名额已由 _direct_slot 占好, 结束即释放), 有效返回数据, 否则返回 None 并记入断路器"""
+        try:
+            slot.sent = True
+            status, data = await self._get_json_async(session, url, timeout=3)
+        except Exception:
+            self.health.record_failure(host) # 直连失败，静默转代理
+            return None
+        finally:
+            slot.release()
+        if data is not None and not is_restricted(data):
+            self.health.record_success(host)
+            return data
+        self.health.record_failure(host, restricted=status in (403, 451) or is_restricted(data))
+        return None
+
+    async def _proxy_attempt(self, session, url, picker):
+        """用下一个代理请求一次, 有效返回数据, 否则返回 None"""
+        await self._ensure_proxies_async()
+        if not self.proxies: return None
+        # 代理 IP 的请求不占本机的权重额度
+        async with self._proxy_semaphore():
+            idx = picker()
+            proxy = self.proxies[idx]
+            start = time.time()
+            try:
+                _, data = await self._get_json_async(session, url, timeout=5, proxy=proxy['http'])
+                # 检查有效性: 带 code 的响应说明代理被墙
+                if data is not None and not (isinstance(data, dict) and 'code' in data):
+                    self.proxy_pool.record(proxy['http'], True, time.time() - start)
+                    self.proxy_index = idx  # 记住好用的代理
+                    return data
+            except Exception:
+                pass
+        self.proxy_pool.record(proxy['http'], False)
+        self._advance_proxy(idx)
+        return None
+
+    def _proxy_picker(self):
+        """同一次调用内按顺序依次取代理 (起点为当前 proxy_index)"""
+        state = {'base': None, 'n': 0}
+        def pick():
+            if state['base'] is None:
+                state['base'] = self.proxy_index if self.proxy_index < len(self.proxies) else 0
+            idx = (state['base'] + state['n']) % len(self.proxies)
+            state['n'] += 1
+            return idx
+        return pick
+
+    async def request_with_retry_async(self, session, url):
+        """
+        request_with_retry 的异步版本: 直连 (熔断期间跳过) + 最多 5 个代理。
+        hedge_delay > 0 时为对冲模式: 各路径错开 hedge_delay 秒并行发出, 取第一个有效结果,
+        其余取消; 否则与同步版一样严格串行。
+        """
+        host = host_of(url)
+        attempts, slot = [], None
+        if self.health.allow_direct(host):
+            # 先拿到直连名额再开始对冲计时
+            slot = await self._direct_slot(url)
+            attempts.append(lambda: self._direct_attempt(session, url, host, slot))
+        else:
+            self.health.maybe_probe(host, lambda: self._probe_direct(host))
+
+        picker = self._proxy_picker()
+        attempts += [lambda: self._proxy_attempt(session, url, picker)] * 5
+
+        try:
+            if self.hedge_delay > 0:
+                return await hedged_call(attempts, delay=self.hedge_delay, max_in_flight=1 + self.hedge_width)
+            return await hedged_call(attempts, delay=None, max_in_flight=1)
+        finally:
+            if slot:
+                slot.release()   # 直连任务还没启动就被取消时也要归还名额 (并退还权重)
+
+    def _fetch(self, url):
+        """经过请求规划器的同步请求 (本次运行内相同 URL 只请求一次)"""
+        return self.planner.get(url, self.request_with_retry)
+
+    async def _fetch_async(self, session, url):
+        return await self.planner.get_async(url, lambda: self.request_with_retry_async(session, url))
+
+    def _oi_result(self, symbol):
+        """用本地序列计算 (当前OI, 30分钟OI增长%, LS); 没有可用 LS 时为 None"""
+        # LS 超过两个周期 (1 小时) 没更新就视为无数据
+        ls = self.series.latest(symbol, 'ls', max_age_ms=60 * 60 * 1000)
+        growth = self.series.oi_growth(symbol, minutes=30)
+        if growth is None:
+            return 0, 0, ls
+        oi_now, oi_growth = growth
+        return oi_now, oi_growth, ls
+
     def get_real_oi_growth(self, symbol: str):
         try:
-            # 获取当前OI
-            oi_resp = self.request_with_retry(f"https://fapi.binance.com/fapi/v1/openInterest?symbol={symbol}")
-            if not oi_resp or 'openInterest' not in oi_resp:
-                return 0, 0, 1.0
-            oi_now = float(oi_resp['openInterest'])
-            
-            # 获取历史OI
-            hist_url = f"https://fapi.binance.com/futures/data/openInterestHist?symbol={symbol}&period=5m&limit=7"
-            hist_resp = self.request_with_retry(hist_url)
-            
-            if not hist_resp or not isinstance(hist_resp, list):
-                return oi_now, 0, 1.0
+            # 只请求比本地序列更新的 K 线; 本地已是最新的接口直接跳过
+            urls = self.planner.symbol_urls(OI_METRICS, symbol, limits=self.series.fetch_limits(symbol))
+            if 'oi_hist' in urls:
+                self.series.ingest(symbol, 'oi', self._fetch(urls['oi_hist']))
+            if 'ls_ratio' in urls:
+                self.series.ingest(symbol, 'ls', self._fetch(urls['ls_ratio']))
+            return self._oi_result(symbol)
+        except Exception as e:
+            logger.error(f"Error fetching {symbol}: {e}")
+            return 0, 0, None
 
-            oi_30m_ago = float(hist_resp[0]['sumOpenInterest'])
-            oi_growth = ((oi_now - oi_30m_ago) / oi_30m_ago) * 100 if oi_30m_ago > 0 else 0
+    async def get_real_oi_growth_async(self, session, symbol: str):
+        """get_real_oi_growth 的异步版本, 两个接口并发请求"""
+        try:
+            urls = self.planner.symbol_urls(OI_METRICS, symbol, limits=self.series.fetch_limits(symbol))
 
-            # LS Ratio
-            ls_url = f"https://fapi.binance.com/futures/data/topLongShortPositionRatio?symbol={symbol}&period=30m&limit=1"
-            ls_resp = self.request_with_retry(ls_url)
-            ls_ratio = float(ls_resp[0]['longShortRatio']) if ls_resp else 1.0
+            async def fetch(name):
+                return await self._fetch_async(session, urls[name]) if name in urls else None
 
-            return oi_now, oi_growth, ls_ratio
+            hist_resp, ls_resp = await asyncio.gather(fetch('oi_hist'), fetch('ls_ratio'))
+            self.series.ingest(symbol, 'oi', hist_resp)
+            self.series.ingest(symbol, 'ls', ls_resp)
+            return self._oi_result(symbol)
         except Exception as e:
             logger.error(f"Error fetching {symbol}: {e}")
-            return 0, 0, 1.0
+            return 0, 0, None
 
-    def scan_and_collect(self) -> Dict:
-        """扫描市场并返回结构化数据和报告文本"""
-        logger.info("开始币安OI扫描...")
-        # 获取Ticker和Funding
-        # 获取Ticker和Funding
-        t_resp = self.request_with_retry("https://fapi.binance.com/fapi/v1/ticker/24hr")
-        p_resp = self.request_with_retry("https://fapi.binance.com/fapi/v1/premiumIndex")
-        
+    async def _collect_symbol_async(self, session, t, premiums, symbol_sem):
+        s = t['symbol']
+        try:
+            # 先排队再计时: 全市场扫描时排队/限速等待不计入单币种超时
+            async with symbol_sem:
+                oi_val, oi_chg, ls = await asyncio.wait_for(
+                    self.get_real_oi_growth_async(session, s), timeout=self.symbol_timeout
+                )
+        except asyncio.TimeoutError:
+            logger.warning(f"{s} 超时 ({self.symbol_timeout:.0f}s)，按无数据处理")
+            oi_val, oi_chg, ls = 0, 0, None
+        return self._metric_point(t, premiums, oi_chg, ls)
+
+    async def scan_and_collect_async(self) -> Dict:
+        """scan_and_collect 的并发版本, 返回结构完全相同"""
+        logger.info("开始币安OI扫描 (并发模式)...")
+        # 信号量/锁必须在当前事件循环内创建
+        self._host_sems = {}
+        self._proxy_sem = None
+        self._proxy_lock = None
+
+        connector = aiohttp.TCPConnector(limit=self.host_concurrency * 4)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            snapshot = self._stream_snapshot()
+            if snapshot:
+                t_resp, p_resp = snapshot
+            else:
+                t_resp, p_resp = await asyncio.gather(
+                    self._fetch_async(session, self.planner.url('ticker_24hr')),
+                    self._fetch_async(session, self.planner.url('premium_index')),
+                )
+            failure = self._check_market_responses(t_resp, p_resp)
+            if failure: return failure
+
+            premiums = {p['symbol']: p for p in p_resp}
+            tradable = await asyncio.to_thread(self._tradable_symbols)
+            active_tickers = self._select_active_tickers(t_resp, tradable)
+
+            logger.info(f"待扫描 {len(active_tickers)} 个USDT永续")
+            symbol_sem = asyncio.Semaphore(self.host_concurrency)
+            # gather 保持输入顺序, all_metrics 顺序与串行版一致
+            all_metrics = await asyncio.gather(
+                *[self._collect_symbol_async(session, t, premiums, symbol_sem) for t in active_tickers]
+            )
+
+        return self._build_scan_result(list(all_metrics))
+
+    def _stream_snapshot(self):
+        """market_stream.py 在运行时直接用它的快照 (0 请求权重), 否则返回 None 走 REST"""
+        snapshot = load_snapshot()
+        if snapshot:
+            logger.info(f"使用行情流快照: {len(snapshot[0])} tickers")
+        return snapshot
+
+    def _check_market_responses(self, t_resp, p_resp) -> Optional[Dict]:
+        """校验 Ticker/Funding 响应, 失败时返回错误报告, 成功返回 None"""
         if not t_resp or not isinstance(t_resp, list):
             msg = f"⚠️ 扫描失败: 币安API连接错误 (已重试)\n(所有代理尝试均失败或IP仍受限)"
             if isinstance(t_resp, dict): msg += f"\n`{str(t_resp)[:100]}...`"
@@ -189,38 +474,73 @@ class OIMonitor:
                 "coins": {},
                 "timestamp": datetime.now().isoformat()
             }
+        return None
 
-        premiums = {p['symbol']: p for p in p_resp}
-
-        # 筛选USDT活跃交易对
-        active_tickers = sorted(
-            [t for t in t_resp if t['symbol'].endswith("USDT")],
+    def _tradable_symbols(self):
+        """交易中的 USDT 永续合约 (exchangeInfo, 磁盘缓存); 取不到时返回 None, 不做过滤"""
+        universe = self.meta.get('binance_perp_universe',
+                                 lambda: perp_universe(self._fetch(self.planner.url('exchange_info'))))
+        return set(universe) if universe else None
+
+    def _select_active_tickers(self, t_resp, tradable=None) -> List[Dict]:
+        # 筛选USDT活跃交易对 (按成交额排序; max_symbols 为 0 时扫描全部)
+        # tradable 来自 exchangeInfo: 排除已下架 / 结算中 / 交割合约
+        active = sorted(
+            [t for t in t_resp if (t['symbol'] in tradable if tradable else t['symbol'].endswith("USDT"))],
             key=lambda x: float(x['quoteVolume']),
             reverse=True
-        )[:50]
+        )
+        return active[:self.max_symbols] if self.max_symbols else active
 
-        all_metrics = []
-        structured_coins = {} # 用于存入数据库
+    def _metric_point(self, t, premiums, oi_chg, ls) -> Dict:
+        s = t['symbol']
+        funding = float(premiums[s]['lastFundingRate']) * 100 if s in premiums else 0
+        return {
+            "symbol": s,
+            "price_chg": float(t['priceChangePercent']),
+            "oi_chg": oi_chg,
+            # 拉取失败/超时/过期时 LS 按 1.0 参与筛选和报告, ls_ok=False 标明不是真实读数
+            "ls": ls if ls is not None else 1.0,
+            "ls_ok": ls is not None,
+            "funding": funding
+        }
 
+    def scan_and_collect(self) -> Dict:
+        """扫描市场并返回结构化数据和报告文本"""
+        logger.info("开始币安OI扫描...")
+        # 获取Ticker和Funding (行情流快照优先)
+        snapshot = self._stream_snapshot()
+        if snapshot:
+            t_resp, p_resp = snapshot
+        else:
+            t_resp = self._fetch(self.planner.url('ticker_24hr'))
+            p_resp = self._fetch(self.planner.url('premium_index'))
+        
+        failure = self._check_market_responses(t_resp, p_resp)
+        if failure: return failure
+
+        premiums = {p['symbol']: p for p in p_resp}
+        active_tickers = self._select_active_tickers(t_resp, self._tradable_symbols())
+
+        all_metrics = []
         for t in active_tickers:
-            s = t['symbol']
-            oi_val, oi_chg, ls = self.get_real_oi_growth(s)
-            funding = float(premiums[s]['lastFundingRate']) * 100 if s in premiums else 0
-            
-            data_point = {
-                "symbol": s,
-                "price_chg": float(t['priceChangePercent']),
-                "oi_chg": oi_chg,
-                "ls": ls,
-                "funding": funding
-            }
-            all_metrics.append(data_point)
+            oi_val, oi_chg, ls = self.get_real_oi_growth(t['symbol'])
+            all_metrics.append(self._metric_point(t, premiums, oi_chg, ls))
+
+        return self._build_scan_result(all_metrics)
 
-        # 筛选逻辑
-        accumulation = [d for d in all_metrics if -2 < d['price_chg'] < 5 and d['oi_chg'] > 1.5 and d['ls'] > 1.2]
-        top_oi = sorted(all_metrics, key=lambda x: x['oi_chg'], reverse=True)[:5]
-        ext_neg = sorted([d for d in all_metrics if d['funding'] < 0], key=lambda x: x['funding'])[:3]
-        ext_pos = sorted([d for d in all_metrics if d['funding'] > 0], key=lambda x: x['funding'], reverse=True)[:3]
+    def _build_scan_result(self, all_metrics: List[Dict]) -> Dict:
+        """根据全部指标筛选并构造报告文本和结构化数据"""
+        logger.info(self.planner.summary())
+        structured_coins = {} # 用于存入数据库
+
+        # 筛选逻辑 (列式表 + 声明式规则, 定义见 screens.py)
+        table = MetricTable.from_records(all_metrics)
+        hits = run_screens(table, OI_SCREENS)
+        accumulation = hits['accumulation']
+        top_oi = hits['top_oi']
+        ext_neg = hits['ext_neg']
+        ext_pos = hits['ext_pos']
 
         # 构造报告文本
         beijing_time = datetime.utcnow() + timedelta(hours=8)
@@ -248,107 +568,120 @@ class OIMonitor:
         return {
             "message": msg,
             "coins": structured_coins,
+            "metrics": all_metrics,
             "timestamp": datetime.now().isoformat()
         }
 
-    def send_telegram(self, text):
-        url = f"https://api.telegram.org/bot{self.bot_token}/sendMessage"
-        requests.post(url, json={"chat_id": self.chat_id, "text": text, "parse_mode": "Markdown"})
-
-# ==================== LS 分析逻辑 ====================
-class LSAnalyzer:
-    @staticmethod
-    def analyze(reports: List[Dict]) -> List[Dict]:
-        """分析报告列表中的LS变化"""
-        # 整理每个币种的历史
-        coin_history = {}
-        for r in reports:
-            # 兼容旧数据结构，确保coins存在
-            coins = r.get('coins', {})
-            for symbol, data in coins.items():
-                if symbol not in coin_history:
-                    coin_history[symbol] = []
-                coin_history[symbol].append(data['ls_value'])
-
-        results = []
-        for symbol, history in coin_history.items():
-            if len(history) < 2: continue
-            
-            first = history[0]
-            last = history[-1]
-            
-            # 简单的增长判定
-            if last > first:
-                results.append({
-                    "symbol": symbol,
-                    "first": first,
-                    "last": last,
-                    "growth_pct": (last - first)/first * 100,
-                    "count": len(history)
-                })
-        
-        results.sort(key=lambda x: x['growth_pct'], reverse=True)
-        return results
-
-    @staticmethod
-    def generate_report(results: List[Dict]) -> str:
-        if not results:
-            return "🤖 **【LS趋势分析】**\n本周期未发现LS持续增长的币种。"
-            
-        msg = f"🤖 **【LS趋势分析 (最近4轮)】**\n发现 {len(results)} 个LS增长币种:\n\n"
-        for i, r in enumerate(results[:15], 1): # 只显示前15个
-            msg += f"**{i}. {r['symbol']}**\n"
-            msg += f"   • LS: {r['first']:.2f} → {r['last']:.2f} (+{r['growth_pct']:.1f}%)\n"
-            msg += f"   • 出现次数: {r['count']}\n"
-        return msg
+    def send_telegram(self, text, key=None):
+        """先按分段写入发件箱再投递; key 为幂等键, 同一个键只会推送一次"""
+        key = key or outbox_key('telegram', text)
+        for chat_id in self.notifier.chat_ids:
+            for i, chunk in enumerate(split_message(text)):
+                self.outbox.enqueue('telegram', chat_id, {'text': chunk}, key=f"{key}:{chat_id}:{i}")
+        return self.flush_outbox() == 0
+
+    def flush_outbox(self, wait=60.0):
+        """投递发件箱里所有待发消息 (包括之前运行遗留的), 返回剩余条数"""
+        async def deliver(chat_id, payload):
+            return await self.notifier.send_chunk(chat_id, payload['text'])
+
+        return self.run(self.outbox.flush({'telegram': deliver}, wait=wait))
+
+    def run(self, coro):
+        """在本次运行共用的事件循环上执行 coro (同步入口)"""
+        if self._loop is None or self._loop.is_closed():
+            self._loop = asyncio.new_event_loop()
+        return self._loop.run_until_complete(coro)
+
+    def close(self):
+        """运行结束时关闭 Telegram 连接和事件循环"""
+        if self._loop is None or self._loop.is_closed():
+            return
+        try:
+            self._loop.run_until_complete(self.notifier.close())
+            self._loop.run_until_complete(self._loop.shutdown_asyncgens())
+        finally:
+            self._loop.close()
+            self._loop = None
 
 # ==================== 主入口 ====================
+def open_store(config) -> ScanStore:
+    if config.store_backend == "firestore":
+        return FirebaseManager(config.firebase_creds_json)
+    return SQLiteScanStore()
+
 def main():
+    monitor = None
     try:
         config = Config()
-        fb = FirebaseManager(config.firebase_creds_json)
-        monitor = OIMonitor(config.bot_token, config.chat_id)
+        store = open_store(config)
+        # 完整指标表始终记在本地; Firestore 只保存周期报告
+        history = store if isinstance(store, SQLiteScanStore) else SQLiteScanStore()
+        monitor = OIMonitor(config.bot_token, config.chat_id,
+                            host_concurrency=config.host_concurrency,
+                            symbol_timeout=config.symbol_timeout,
+                            hedge_delay=config.hedge_delay,
+                            proxy_concurrency=config.proxy_concurrency,
+                            max_symbols=config.max_symbols)
+
+        # 0. 先补发上次运行没送达的消息
+        if monitor.outbox.pending():
+            monitor.flush_outbox(wait=10)
 
         # 1. 扫描并发送 OI 报告
-        scan_result = monitor.scan_and_collect()
-        monitor.send_telegram(scan_result['message'])
-        logger.info("OI 报告发送成功")
-
-        # 2. 保存数据到 Firebase
+        if config.scan_mode == "sync":
+            scan_result = monitor.scan_and_collect()
+        else:
+            scan_result = monitor.run(monitor.scan_and_collect_async())
+        monitor.proxy_pool.save()
+        monitor.series.save()
+        if monitor.send_telegram(scan_result['message'], key=f"oi:{scan_result['timestamp']}"):
+            logger.info("OI 报告发送成功")
+        else:
+            logger.warning("OI 报告未全部送达, 已留在发件箱")
+
+        # 2. 保存数据 (完整指标表 + 周期报告)
+        history.record_scan(scan_result['timestamp'], scan_result.get('metrics'))
         report_record = {
             "timestamp": scan_result['timestamp'],
             "coins": scan_result['coins']
         }
-        cycle_len = fb.add_report_to_cycle(report_record)
-        logger.info(f"数据已保存，当前周期进度: {cycle_len}/{config.report_cycle}")
+        cycle_len = store.add_report_to_cycle(report_record)
+        logger.info(f"数据已保存，距上次趋势报告已扫描 {cycle_len} 次")
+
+        # 增量更新每个币种的 LS 趋势状态 (全部币种, 不只是上榜的)
+        trend = LSTrendAnalyzer.load()
+        trend.update_scan(scan_result['timestamp'], scan_result.get('metrics'))
+
+        # 3. 趋势报告按自己的时间间隔发送, 不等扫描次数攒满 (漏跑几次也照常发)
+        now_ms = to_ms(scan_result['timestamp'])
+        if trend.report_due(now_ms, config.trend_every):
+            logger.info("到达趋势报告时间，发送LS趋势分析...")
+            analysis_msg = trend.generate_report(config.trend_window)
 
-        # 3. 检查是否需要分析
-        if cycle_len >= config.report_cycle:
-            logger.info("达到周期，开始LS分析...")
-            previous_reports = fb.get_current_cycle()
-            
-            # 分析
-            analysis_results = LSAnalyzer.analyze(previous_reports)
-            analysis_msg = LSAnalyzer.generate_report(analysis_results)
-            
             # 发送分析报告
-            monitor.send_telegram(analysis_msg)
-            
-            # 重置周期
-            fb.reset_cycle()
+            monitor.send_telegram(analysis_msg, key=f"trend:{scan_result['timestamp']}")
+            trend.mark_reported(now_ms)
+
+            # 重置周期计数
+            store.reset_cycle(cycle_len)
             logger.info("周期已重置")
+        trend.save()
 
     except Exception as e:
         logger.error(f"执行出错: {e}", exc_info=True)
         # 发送错误日志到 TG 通知
         try:
-             url = f"https://api.telegram.org/bot{config.bot_token}/sendMessage"
-             requests.post(url, json={"chat_id": config.chat_id, "text": f"⚠️ Monitor Bot Critical Error:\n{str(e)}", "parse_mode": "HTML"})
+             TelegramNotifier(config.bot_token, config.chat_id, parse_mode=None).send_blocking(
+                 f"⚠️ Monitor Bot Critical Error:\n{str(e)}")
         except:
              pass
         # 让 GitHub Action 标记为失败
         import sys
         sys.exit(1)
+    finally:
+        if monitor is not None:
+            monitor.close()
 
 if __name__ == "__main__":
     main()
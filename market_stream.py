@@ -0,0 +1,175 @@
+"""
+币安合约全市场行情流 (长驻进程)
+
+订阅 !ticker@arr (24hr ticker) 和 !markPrice@arr@1s (标记价格/资金费率),
+在内存里维护最新快照, 并每秒原子写入本地快照文件。
+main.py / local_scan.py / btc_monitor.py 扫描时优先读这个快照 (0 请求权重、秒级新鲜度),
+快照不存在或过期时才回退到 REST 轮询。
+
+运行: python market_stream.py
+"""
+import os
+import json
+import time
+import asyncio
+import logging
+import requests
+
+try:
+    import aiohttp
+except ImportError:  # 只读快照 (load_snapshot) 时不需要 aiohttp
+    aiohttp = None
+
+from local_cache import cache_path, read_json, atomic_write_json
+
+logger = logging.getLogger(__name__)
+
+STREAM_URL = "wss://fstream.binance.com/stream?streams=!ticker@arr/!markPrice@arr@1s"
+SNAPSHOT_FILE = "market_snapshot.json"
+DEFAULT_MAX_AGE = float(os.environ.get("MARKET_STREAM_MAX_AGE", "5"))
+
+
+def ticker_from_event(e):
+    """24hrTicker 事件 -> 与 REST /fapi/v1/ticker/24hr 相同的字段"""
+    return {
+        "symbol": e['s'],
+        "priceChangePercent": e['P'],
+        "lastPrice": e['c'],
+        "openPrice": e.get('o'),
+        "highPrice": e.get('h'),
+        "lowPrice": e.get('l'),
+        "volume": e.get('v'),
+        "quoteVolume": e['q'],
+        "closeTime": e.get('C'),
+    }
+
+
+def premium_from_event(e):
+    """markPriceUpdate 事件 -> 与 REST /fapi/v1/premiumIndex 相同的字段"""
+    return {
+        "symbol": e['s'],
+        "markPrice": e['p'],
+        "indexPrice": e.get('i'),
+        "lastFundingRate": e['r'],
+        "nextFundingTime": e.get('T'),
+        "time": e.get('E'),
+    }
+
+
+class MarketSnapshot:
+    def __init__(self):
+        self.tickers = {}
+        self.premiums = {}
+        self.updated_at = 0.0
+
+    def apply(self, msg):
+        """处理一条组合流消息 {'stream': ..., 'data': [...]}"""
+        data = msg.get('data', msg) if isinstance(msg, dict) else msg
+        events = data if isinstance(data, list) else [data]
+        for e in events:
+            kind = e.get('e') if isinstance(e, dict) else None
+            if kind == '24hrTicker':
+                self.tickers[e['s']] = ticker_from_event(e)
+            elif kind == 'markPriceUpdate':
+                self.premiums[e['s']] = premium_from_event(e)
+        self.updated_at = time.time()
+
+    def seed(self, tickers, premiums):
+        """用一次 REST 全量数据打底 (ticker 流只推送有变动的币种)"""
+        for t in tickers or []:
+            self.tickers.setdefault(t['symbol'], t)
+        for p in premiums or []:
+            self.premiums.setdefault(p['symbol'], p)
+
+    def to_dict(self):
+        return {'updated_at': self.updated_at, 'tickers': self.tickers, 'premiums': self.premiums}
+
+
+def load_snapshot(max_age=DEFAULT_MAX_AGE, path=None):
+    """读取快照, 返回 (tickers 列表, premiums 列表); 不存在或超过 max_age 秒返回 None"""
+    data = read_json(path or cache_path(SNAPSHOT_FILE))
+    if not data or time.time() - data.get('updated_at', 0) > max_age:
+        return None
+    tickers = list(data.get('tickers', {}).values())
+    premiums = list(data.get('premiums', {}).values())
+    if not tickers or not premiums:
+        return None
+    return tickers, premiums
+
+
+class MarketStream:
+    def __init__(self, url=STREAM_URL, snapshot_path=None, flush_interval=1.0,
+                 seed_urls=("https://fapi.binance.com/fapi/v1/ticker/24hr",
+                            "https://fapi.binance.com/fapi/v1/premiumIndex")):
+        self.url = url
+        self.snapshot_path = snapshot_path or cache_path(SNAPSHOT_FILE)
+        self.flush_interval = flush_interval
+        self.seed_urls = seed_urls
+        self.snapshot = MarketSnapshot()
+        self._last_flush = 0.0
+
+    def _seed_from_rest(self):
+        try:
+            t_url, p_url = self.seed_urls
+            tickers = requests.get(t_url, timeout=10).json()
+            premiums = requests.get(p_url, timeout=10).json()
+            if isinstance(tickers, list) and isinstance(premiums, list):
+                self.snapshot.seed(tickers, premiums)
+                logger.info(f"快照初始化: {len(tickers)} tickers, {len(premiums)} premiums")
+        except Exception as e:
+            logger.warning(f"REST 初始化快照失败, 仅使用行情流: {e}")
+
+    def flush(self):
+        if not self.snapshot.updated_at: return
+        atomic_write_json(self.snapshot_path, self.snapshot.to_dict())
+        self._last_flush = time.monotonic()
+
+    def _maybe_flush(self):
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    async def _consume(self, ws, deadline):
+        while True:
+            timeout = self.flush_interval
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                timeout = min(timeout, remaining)
+            try:
+                msg = await ws.receive(timeout=timeout)
+            except asyncio.TimeoutError:
+                self._maybe_flush()
+                continue
+            if msg.type == aiohttp.WSMsgType.TEXT:
+                self.snapshot.apply(json.loads(msg.data))
+                self._maybe_flush()
+            elif msg.type in (aiohttp.WSMsgType.CLOSE, aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                return
+
+    async def run(self, duration=None):
+        """持续接收行情并刷新快照; duration 秒后退出 (None 为一直运行), 断线自动重连"""
+        deadline = time.monotonic() + duration if duration else None
+        if self.seed_urls:
+            await asyncio.to_thread(self._seed_from_rest)
+
+        backoff = 1
+        async with aiohttp.ClientSession() as session:
+            while deadline is None or time.monotonic() < deadline:
+                try:
+                    async with session.ws_connect(self.url, heartbeat=30) as ws:
+                        logger.info("行情流已连接")
+                        backoff = 1
+                        await self._consume(ws, deadline)
+                except Exception as e:
+                    logger.warning(f"行情流断开: {e}")
+                if deadline is not None and time.monotonic() >= deadline:
+                    break
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 60)
+        self.flush()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    asyncio.run(MarketStream().run())
@@ -0,0 +1,85 @@
+"""
+元数据 TTL 缓存 (磁盘)
+
+交易所合约列表这类很少变化的数据按资源分别设置有效期, 存在 .cache/meta/<名称>.json:
+- 未过期: 直接用磁盘上的数据, 不发请求
+- 超过有效期的 refresh_at 比例 (默认 80%): 先返回缓存, 同时后台线程刷新
+- 已过期: 同步重新拉取; 拉取失败时退回使用过期数据
+写入用临时文件 + os.replace, 中途退出不会留下半个文件。
+"""
+import time
+import logging
+import threading
+
+from local_cache import cache_path, read_json, atomic_write_json
+
+logger = logging.getLogger(__name__)
+
+# 资源 -> 有效期 (秒)
+TTL = {
+    'binance_perp_universe': 6 * 3600,
+    'coinalyze_future_markets': 24 * 3600,
+    'ccxt_markets': 24 * 3600,          # portfolio_bot/exchange_pool.py
+}
+
+
+class MetaCache:
+    def __init__(self, directory='meta', refresh_at=0.8):
+        self.directory = directory
+        self.refresh_at = refresh_at
+        self._refreshing = {}
+        self._lock = threading.Lock()
+
+    def _path(self, name):
+        return cache_path(self.directory, f"{name}.json")
+
+    def _load(self, name, loader):
+        try:
+            data = loader()
+        except Exception as e:
+            logger.warning(f"元数据 {name} 拉取失败: {e}")
+            return None
+        if data:
+            atomic_write_json(self._path(name), {'fetched_at': time.time(), 'data': data})
+            return data
+        return None
+
+    def _refresh_in_background(self, name, loader):
+        with self._lock:
+            if name in self._refreshing and self._refreshing[name].is_alive():
+                return
+            # 非守护线程: 进程退出前会等刷新完成 (loader 自带超时)
+            t = threading.Thread(target=self._load, args=(name, loader), name=f"meta-{name}")
+            self._refreshing[name] = t
+            t.start()
+
+    def get(self, name, loader, ttl=None):
+        """返回资源数据; loader() 负责实际拉取, 失败返回 None/空"""
+        ttl = ttl if ttl is not None else TTL[name]
+        entry = read_json(self._path(name))
+        if entry:
+            age = time.time() - entry.get('fetched_at', 0)
+            if age < ttl:
+                if age > ttl * self.refresh_at:
+                    self._refresh_in_background(name, loader)
+                return entry['data']
+
+        data = self._load(name, loader)
+        if data is None and entry:
+            logger.warning(f"元数据 {name} 使用过期缓存")
+            return entry['data']
+        return data
+
+    def join(self, timeout=None):
+        for t in list(self._refreshing.values()):
+            t.join(timeout)
+
+
+def perp_universe(exchange_info):
+    """exchangeInfo -> 可交易的 USDT 永续合约 (status TRADING, contractType PERPETUAL)"""
+    if not isinstance(exchange_info, dict):
+        return None
+    return sorted(
+        s['symbol'] for s in exchange_info.get('symbols', [])
+        if s.get('status') == 'TRADING' and s.get('contractType') == 'PERPETUAL' and s.get('quoteAsset') == 'USDT'
+    )
@@ -0,0 +1,187 @@
+"""
+Telegram 推送 (异步, 连接复用)
+
+- 超过 4096 字符的消息按行切分; 切点落在 ``` 代码块内时自动闭合并在下一段重新打开
+- 多个 chat_id 并发发送, 同一个 chat 内按顺序发送
+- 全局与单个 chat 各一个令牌桶限速 (Telegram: 全局约 30 条/秒, 单个 chat 约 1 条/秒)
+- 429 按响应里的 retry_after 暂停该 chat 后重试; Markdown 解析失败时改为纯文本重发
+main.py 与 portfolio_bot/cloud_portfolio.py 共用。
+"""
+import asyncio
+import logging
+from typing import List
+
+import aiohttp
+
+from rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+TG_API = "https://api.telegram.org"
+TG_MAX_LEN = 4096
+FENCE = "```"
+
+
+def parse_chat_ids(value) -> List[str]:
+    """'id1,id2' / 列表 -> ['id1', 'id2']"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(',')
+    return [str(v).strip() for v in value if str(v).strip()]
+
+
+def split_message(text: str, limit: int = TG_MAX_LEN) -> List[str]:
+    """按行切分成不超过 limit 字符的若干段, 不把 ``` 代码块切成未闭合的两半"""
+    if len(text) <= limit:
+        return [text]
+
+    budget = limit - len(FENCE) - 1   # 给可能补上的闭合 ``` 留位置
+    chunks, lines, size, in_fence = [], [], 0, False
+
+    def flush():
+        nonlocal lines, size
+        if not lines:
+            return
+        body = "\n".join(lines)
+        if in_fence:
+            body += "\n" + FENCE
+        chunks.append(body)
+        lines = [FENCE] if in_fence else []
+        size = len(FENCE) + 1 if in_fence else 0
+
+    for line in text.split("\n"):
+        # 单行超长只能硬切
+        while len(line) > budget:
+            flush()
+            cut = budget - size
+            lines.append(line[:cut])
+            size += cut
+            line = line[cut:]
+            flush()
+        if size + len(line) + 1 > budget:
+            flush()
+        lines.append(line)
+        size += len(line) + 1
+        if line.strip().startswith(FENCE):
+            in_fence = not in_fence
+
+    in_fence = False
+    flush()
+    return chunks
+
+
+class TelegramNotifier:
+    def __init__(self, token, chat_ids, parse_mode="Markdown", per_chat_rate=1.0, global_rate=30.0,
+                 max_retries=4, timeout=15, api_base=TG_API):
+        self.token = token
+        self.chat_ids = parse_chat_ids(chat_ids)
+        self.parse_mode = parse_mode
+        self.per_chat_rate = per_chat_rate
+        self.max_retries = max_retries
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.api_base = api_base
+        self.global_bucket = TokenBucket(capacity=global_rate, rate=global_rate)
+        self._chat_buckets = {}
+        self._session = None
+
+    @property
+    def configured(self):
+        return bool(self.token and self.chat_ids)
+
+    def _chat_bucket(self, chat_id):
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._chat_buckets[chat_id] = TokenBucket(capacity=1, rate=self.per_chat_rate)
+        return bucket
+
+    async def _session_get(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=self.timeout,
+                                                  connector=aiohttp.TCPConnector(limit=10))
+        return self._session
+
+    async def close(self):
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def _acquire(self, chat_id):
+        wait = max(self._chat_bucket(chat_id).reserve(1), self.global_bucket.reserve(1))
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    async def send_chunk(self, chat_id, text) -> bool:
+        """发送一段 (不超过 4096 字符), 成功返回 True"""
+        session = await self._session_get()
+        url = f"{self.api_base}/bot{self.token}/sendMessage"
+        parse_mode = self.parse_mode
+        for attempt in range(self.max_retries + 1):
+            await self._acquire(chat_id)
+            payload = {"chat_id": chat_id, "text": text}
+            if parse_mode:
+                payload["parse_mode"] = parse_mode
+            try:
+                async with session.post(url, json=payload) as resp:
+                    data = await resp.json(content_type=None)
+                    status = resp.status
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                logger.warning(f"Telegram 发送异常 ({chat_id}): {e}")
+                await asyncio.sleep(2 ** attempt)
+                continue
+            if not isinstance(data, dict):
+                # 空响应 / 非 JSON 对象 (例如代理返回的空 body), 按可重试失败处理
+                logger.warning(f"Telegram 响应无效 ({chat_id}): {status} {str(data)[:100]}")
+                await asyncio.sleep(2 ** attempt)
+                continue
+
+            if status == 200 and data.get('ok'):
+                return True
+            desc = str(data.get('description', ''))
+            if status == 429:
+                retry_after = (data.get('parameters') or {}).get('retry_after', 2 ** attempt)
+                logger.warning(f"Telegram 限频 ({chat_id}), {retry_after}s 后重试")
+                self._chat_bucket(chat_id).pause(float(retry_after))
+                continue
+            if status == 400 and parse_mode and "parse entities" in desc:
+                # Markdown 不合法 (例如硬切断的超长行), 改成纯文本
+                parse_mode = None
+                continue
+            if status >= 500:
+                await asyncio.sleep(2 ** attempt)
+                continue
+            logger.error(f"Telegram 发送失败 ({chat_id}): {status} {desc}")
+            return False
+        logger.error(f"Telegram 发送失败 ({chat_id}): 重试 {self.max_retries} 次仍未成功")
+        return False
+
+    async def _send_to_chat(self, chat_id, chunks) -> bool:
+        for chunk in chunks:
+            if not await self.send_chunk(chat_id, chunk):
+                return False
+        return True
+
+    async def send(self, text, chat_ids=None) -> bool:
+        """发给所有 chat (并发), 全部成功返回 True"""
+        chat_ids = parse_chat_ids(chat_ids) if chat_ids else self.chat_ids
+        if not self.token or not chat_ids:
+            logger.warning("未配置 Telegram, 跳过发送")
+            return False
+        chunks = split_message(text)
+        results = await asyncio.gather(*[self._send_to_chat(c, chunks) for c in chat_ids])
+        return all(results)
+
+    def send_blocking(self, text, chat_ids=None) -> bool:
+        """同步调用入口 (在没有事件循环的代码里使用), 发送完关闭连接"""
+        async def run():
+            try:
+                return await self.send(text, chat_ids)
+            finally:
+                await self.close()
+        return asyncio.run(run())
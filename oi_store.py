@@ -0,0 +1,184 @@
+"""
+本地 OI / 大户多空比 时间序列存储
+
+每个币种每种序列一个小的二进制文件 (时间戳 int64 + 数值 float64 两个数组),
+超过容量丢弃最旧的数据 (环形缓冲)。扫描时只请求比本地最新一根更新的 K 线,
+OI 增长等指标直接用本地数据计算, 更长的回看窗口不再需要额外请求。
+"""
+import os
+import time
+import struct
+import logging
+from array import array
+from bisect import bisect_right
+
+from local_cache import cache_path
+
+logger = logging.getLogger(__name__)
+
+MINUTE_MS = 60 * 1000
+
+# 序列类型 -> (周期毫秒, 响应中的数值字段, 首次拉取根数)
+SERIES = {
+    'oi': (5 * MINUTE_MS, 'sumOpenInterest', 7),
+    'ls': (30 * MINUTE_MS, 'longShortRatio', 1),
+}
+
+_MAGIC = b'OIS1'
+_API_MAX_LIMIT = 500
+
+
+class BarSeries:
+    """按时间递增的 (时间戳, 数值) 序列"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.ts = array('q')
+        self.val = array('d')
+        self.dirty = False
+
+    def __len__(self):
+        return len(self.ts)
+
+    def last_ts(self):
+        return self.ts[-1] if self.ts else None
+
+    def merge(self, bars):
+        """合并 [(ts, value)], 只追加更新的 K 线; 与最后一根同一时间的视为修订。返回新增根数"""
+        added = 0
+        for t, v in sorted(bars):
+            if self.ts and t < self.ts[-1]:
+                continue
+            if self.ts and t == self.ts[-1]:
+                if self.val[-1] != v:
+                    self.val[-1] = v
+                    self.dirty = True
+                continue
+            self.ts.append(t)
+            self.val.append(v)
+            added += 1
+        if added:
+            self.dirty = True
+            overflow = len(self.ts) - self.capacity
+            if overflow > 0:
+                del self.ts[:overflow]
+                del self.val[:overflow]
+        return added
+
+    def value_at(self, t, tolerance):
+        """t 时刻 (或之前 tolerance 毫秒内) 的值, 没有则返回 None"""
+        i = bisect_right(self.ts, t) - 1
+        if i < 0 or t - self.ts[i] > tolerance:
+            return None
+        return self.val[i]
+
+    def to_bytes(self):
+        return _MAGIC + struct.pack('<I', len(self.ts)) + self.ts.tobytes() + self.val.tobytes()
+
+    @classmethod
+    def from_bytes(cls, raw, capacity):
+        s = cls(capacity)
+        if raw[:4] != _MAGIC:
+            return s
+        (n,) = struct.unpack('<I', raw[4:8])
+        ts_end = 8 + n * 8
+        s.ts.frombytes(raw[8:ts_end])
+        s.val.frombytes(raw[ts_end:ts_end + n * 8])
+        if len(s.ts) != len(s.val):
+            return cls(capacity)
+        return s
+
+
+class OISeriesStore:
+    def __init__(self, directory=None, capacity=2016):
+        # 默认容量 2016 根 = 5 分钟线 7 天
+        self.directory = directory or os.path.dirname(cache_path('series', 'x'))
+        self.capacity = capacity
+        self._series = {}
+
+    def series(self, symbol, kind):
+        key = (symbol, kind)
+        s = self._series.get(key)
+        if s is None:
+            path = os.path.join(self.directory, f"{symbol}.{kind}")
+            try:
+                with open(path, 'rb') as f:
+                    s = BarSeries.from_bytes(f.read(), self.capacity)
+            except OSError:
+                s = BarSeries(self.capacity)
+            self._series[key] = s
+        return s
+
+    def fetch_limit(self, symbol, kind, now_ms=None):
+        """本次需要请求多少根; 0 表示本地已是最新, 不用请求"""
+        period, _, initial = SERIES[kind]
+        last = self.series(symbol, kind).last_ts()
+        if last is None:
+            return initial
+        now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+        missing = (now_ms - last) // period
+        if missing <= 0:
+            return 0
+        # 多拉 1 根与本地重叠, 顺便校正最后一根
+        return int(min(max(missing + 1, 2), _API_MAX_LIMIT))
+
+    def fetch_limits(self, symbol, now_ms=None):
+        return {
+            'oi_hist': self.fetch_limit(symbol, 'oi', now_ms),
+            'ls_ratio': self.fetch_limit(symbol, 'ls', now_ms),
+        }
+
+    def ingest(self, symbol, kind, resp):
+        """把接口返回的 K 线列表合并进本地序列"""
+        if not resp or not isinstance(resp, list):
+            return 0
+        _, field, _ = SERIES[kind]
+        bars = []
+        for row in resp:
+            try:
+                bars.append((int(row['timestamp']), float(row[field])))
+            except (KeyError, TypeError, ValueError):
+                continue
+        return self.series(symbol, kind).merge(bars)
+
+    def oi_growth(self, symbol, minutes=30, now_ms=None):
+        """(当前 OI, minutes 分钟 OI 增长 %); 本地没有数据, 或最新一根超过两个周期 (拉取失败) 返回 None"""
+        s = self.series(symbol, 'oi')
+        if not len(s):
+            return None
+        period = SERIES['oi'][0]
+        now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+        if now_ms - s.ts[-1] > 2 * period:
+            return None
+        oi_now = s.val[-1]
+        past = s.value_at(s.ts[-1] - minutes * MINUTE_MS, tolerance=period)
+        if not past or past <= 0:
+            return oi_now, 0
+        return oi_now, (oi_now - past) / past * 100
+
+    def latest(self, symbol, kind, max_age_ms, now_ms=None):
+        """最新值 (超过 max_age_ms 视为过期返回 None)"""
+        s = self.series(symbol, kind)
+        if not len(s):
+            return None
+        now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+        return s.val[-1] if now_ms - s.ts[-1] <= max_age_ms else None
+
+    def save(self):
+        """写回有改动的序列 (先写临时文件再替换)"""
+        os.makedirs(self.directory, exist_ok=True)
+        saved = 0
+        for (symbol, kind), s in self._series.items():
+            if not s.dirty:
+                continue
+            path = os.path.join(self.directory, f"{symbol}.{kind}")
+            tmp = path + '.tmp'
+            try:
+                with open(tmp, 'wb') as f:
+                    f.write(s.to_bytes())
+                os.replace(tmp, path)
+                s.dirty = False
+                saved += 1
+            except OSError as e:
+                logger.debug(f"保存序列 {symbol}.{kind} 失败: {e}")
+        return saved
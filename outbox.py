@@ -0,0 +1,157 @@
+"""
+本地发件箱 (只追加的 JSONL)
+
+消息先写入发件箱再投递, 投递失败不会丢:
+- 每条消息带幂等键, 相同的键只会入队一次 (重跑不会重复推送)
+- 失败按指数退避重试; 本次运行内没投递成功的留在文件里, 下次启动时先补发
+- 同一个目的地 (chat / webhook) 按入队顺序投递, 前一条没成功时后面的等待, 不会乱序
+文件在 .cache/ 下, GitHub Actions 上随 actions/cache 保留。
+"""
+import json
+import time
+import asyncio
+import hashlib
+import inspect
+import logging
+import os
+
+from local_cache import cache_path
+
+logger = logging.getLogger(__name__)
+
+
+def outbox_key(*parts) -> str:
+    """按内容生成幂等键"""
+    h = hashlib.sha256()
+    for p in parts:
+        h.update(json.dumps(p, sort_keys=True, ensure_ascii=False).encode('utf-8'))
+    return h.hexdigest()[:24]
+
+
+class Outbox:
+    def __init__(self, path=None, base_delay=5.0, max_delay=3600.0, max_attempts=12, keep_done=500):
+        self.path = path or cache_path('outbox.jsonl')
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        self.keep_done = keep_done     # 压缩时保留多少条已完成的键用于去重
+        self.entries = {}              # key -> entry (dict 保持入队顺序)
+        self._load()
+
+    # ---------- 持久化 ----------
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                lines = f.readlines()
+        except OSError:
+            return
+        for line in lines:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue   # 进程中途退出留下的半行
+            op, key = rec.pop('op', None), rec.get('key')
+            if op == 'add':
+                self.entries.setdefault(key, rec)
+            elif key in self.entries:
+                self.entries[key].update(rec)
+        # 新的一次运行: 遗留的待发消息立即可以重试
+        for e in self.pending():
+            e['next_at'] = 0.0
+
+    def _append(self, record):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def compact(self):
+        """重写文件: 未完成的全部保留, 已完成的只保留最近 keep_done 条的键"""
+        pending = [e for e in self.entries.values() if e['status'] == 'pending']
+        finished = [e for e in self.entries.values() if e['status'] != 'pending'][-self.keep_done:]
+        keep = {e['key'] for e in pending} | {e['key'] for e in finished}
+        self.entries = {k: e for k, e in self.entries.items() if k in keep}
+
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            for e in self.entries.values():
+                rec = dict(e, op='add')
+                if e['status'] != 'pending':
+                    rec['payload'] = None   # 已完成的只需要键
+                f.write(json.dumps(rec, ensure_ascii=False, separators=(',', ':')) + '\n')
+        os.replace(tmp, self.path)
+
+    # ---------- 入队 / 投递 ----------
+    def enqueue(self, channel, dest, payload, key=None) -> bool:
+        """入队; 键已存在 (待发或已发) 时忽略并返回 False"""
+        key = key or outbox_key(channel, dest, payload)
+        if key in self.entries:
+            return False
+        entry = {'key': key, 'channel': channel, 'dest': str(dest), 'payload': payload,
+                 'status': 'pending', 'attempts': 0, 'next_at': 0.0, 'created': time.time()}
+        self._append(dict(entry, op='add'))
+        self.entries[key] = entry
+        return True
+
+    def pending(self):
+        return [e for e in self.entries.values() if e['status'] == 'pending']
+
+    def _mark(self, entry, **changes):
+        entry.update(changes)
+        self._append(dict(changes, op='update', key=entry['key']))
+
+    async def _flush_dest(self, entries, senders):
+        """按顺序投递一个目的地的消息; 返回下一次可以重试的时间 (全部完成返回 None)"""
+        for e in entries:
+            now = time.time()
+            if e['next_at'] > now:
+                return e['next_at']
+            sender = senders.get(e['channel'])
+            if sender is None:
+                return None
+            try:
+                ok = sender(e['dest'], e['payload'])
+                if inspect.isawaitable(ok):
+                    ok = await ok
+            except Exception as ex:
+                logger.warning(f"发件箱投递异常 ({e['channel']}): {ex}")
+                ok = False
+
+            if ok:
+                self._mark(e, status='done', attempts=e['attempts'] + 1)
+                continue
+            attempts = e['attempts'] + 1
+            if attempts >= self.max_attempts:
+                logger.error(f"发件箱放弃投递 {e['key']} ({e['channel']} → {e['dest']}), 已重试 {attempts} 次")
+                self._mark(e, status='dead', attempts=attempts)
+                continue
+            delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+            self._mark(e, attempts=attempts, next_at=now + delay)
+            return e['next_at']
+        return None
+
+    async def flush(self, senders, wait=60.0) -> int:
+        """
+        投递所有待发消息 (不同目的地并发), 在 wait 秒内按退避时间重试。
+        senders: {channel: fn(dest, payload) -> bool}, fn 可以是普通函数或协程函数。
+        返回这些 channel 仍未投递的条数。
+        """
+        deadline = time.time() + wait
+        while True:
+            by_dest = {}
+            for e in self.pending():
+                if e['channel'] in senders:
+                    by_dest.setdefault((e['channel'], e['dest']), []).append(e)
+            if not by_dest:
+                break
+            retry_at = [t for t in await asyncio.gather(
+                *[self._flush_dest(es, senders) for es in by_dest.values()]) if t]
+            if not retry_at or min(retry_at) > deadline:
+                break
+            await asyncio.sleep(max(0.0, min(retry_at) - time.time()))
+
+        self.compact()
+        left = sum(1 for e in self.pending() if e['channel'] in senders)
+        if left:
+            logger.warning(f"发件箱还有 {left} 条待发, 下次运行时补发")
+        return left
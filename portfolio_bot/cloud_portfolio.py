@@ -5,7 +5,15 @@ import logging
 import asyncio
 import requests
 from datetime import datetime, timedelta
-import ccxt.async_support as ccxt
+
+# Shared helpers live in the repo root (host_health, proxy_pool, notifier, local_cache)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from host_health import HostHealth
+from proxy_pool import ProxyPool
+from notifier import TelegramNotifier
+from exchange_pool import ExchangePool
+from price_oracle import PriceOracle
+from hyperliquid import HyperliquidClient, HLAccount
 
 try:
     from dotenv import load_dotenv
@@ -33,97 +41,67 @@ CONFIG = {
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# ==================== Proxy Manager ====================
-class ProxyManager:
-    def __init__(self):
-        self.proxies = []
-        self.index = 0
-        
-    def get_public_proxies(self):
-        """Fetch public proxies from github lists"""
-        try:
-            # Combined list source
-            sources = [
-                "https://raw.githubusercontent.com/monosans/proxy-list/main/proxies/http.txt",
-                "https://raw.githubusercontent.com/TheSpeedX/PROXY-List/master/http.txt",
-                "https://raw.githubusercontent.com/prxchk/proxy-list/main/http.txt",
-                "https://raw.githubusercontent.com/zloi-user/hideip.me/main/http.txt"
-            ]
-            
-            found = set()
-            for url in sources:
-                try:
-                    resp = requests.get(url, timeout=2) # Reduced timeout
-                    if resp.status_code == 200:
-                        lines = resp.text.splitlines()
-                        for line in lines[:100]: # Increase to top 100
-                            parts = line.strip().split(':')
-                            if len(parts) >= 2:
-                                ip = parts[0].strip()
-                                # Clean port part (remove extra suffix/country info)
-                                port_part = parts[1].strip().split()[0]
-                                port = ''.join([c for c in port_part if c.isdigit()])
-                                if ip and port:
-                                    found.add(f"http://{ip}:{port}")
-                except: continue
-                    
-            self.proxies = list(found)
-            logger.info(f"Fetched {len(self.proxies)} public proxies")
-        except Exception as e:
-            logger.error(f"Proxy fetch error: {e}")
+# One pooled Telegram client for the whole run; TELEGRAM_CHAT_ID may list several chats (comma separated)
+tg = TelegramNotifier(CONFIG['TG_TOKEN'], CONFIG['TG_CHAT_ID'])
 
-    def get_next(self):
-        if not self.proxies:
-            self.get_public_proxies()
-        
-        if not self.proxies: return None
-        
-        # Simple rotation
-        if self.index >= len(self.proxies):
-            self.index = 0
-            
-        p = self.proxies[self.index]
-        self.index += 1
-        return p
+# One ccxt instance per venue (and proxy) for the whole run, shared by spot, futures and pricing;
+# market catalogues come from the disk cache instead of being downloaded every run
+exchange_pool = ExchangePool({'binance': CONFIG['BINANCE'], 'gate': CONFIG['GATE']})
 
-proxy_mgr = ProxyManager()
+# Pooled async Hyperliquid info client (closed at the end of the run)
+hl_client = HyperliquidClient(proxy=CONFIG['PROXY_URL'])
+
+# ==================== Proxy Pool ====================
+# Scored public proxies, validated against Binance and cached between runs
+# (get_next_async loads/refreshes the pool in a thread, so the event loop never blocks on it)
+proxy_mgr = ProxyPool(validate_url='https://api.binance.com/api/v3/time', cache_file='portfolio_proxies.json')
+
+# Current prices from one bulk call per venue; 30m highs from persisted price samples
+price_oracle = PriceOracle(exchange_pool, default_proxy=CONFIG['PROXY_URL'], next_proxy=proxy_mgr.get_next_async)
+
+# Remembers when the default (direct / private proxy) path to a venue is restricted
+direct_health = HostHealth(state_file="portfolio_health.json")
+DIRECT_PING_URLS = {
+    'binance': 'https://api.binance.com/api/v3/ping',
+    'gate': 'https://api.gateio.ws/api/v4/spot/time',
+}
+
+def probe_direct(exchange_id):
+    """Cheap background check whether the default path to a venue works again"""
+    url = DIRECT_PING_URLS.get(exchange_id)
+    if not url: return False
+    proxies = {'http': CONFIG['PROXY_URL'], 'https': CONFIG['PROXY_URL']} if CONFIG['PROXY_URL'] else None
+    resp = requests.get(url, proxies=proxies, timeout=3)
+    return resp.status_code == 200
 
 FETCH_ERRORS = {}
 
+# Balance collection: every (venue, account type) is fetched concurrently under one overall deadline
+BALANCE_DEADLINE = float(os.environ.get('BALANCE_DEADLINE', '60'))
+ACCOUNT_TYPES = {
+    'binance': (None, 'future'),   # None = spot
+    'gate': (None, 'swap'),
+}
+
 # ==================== Data Fetching (Stateless) ====================
 def get_beijing_time():
     return datetime.utcnow() + timedelta(hours=8)
 
-async def fetch_ccxt_balance(exchange_id, credentials):
-    """Fetch held assets from CCXT exchange (Spot + Futures)"""
+async def fetch_ccxt_balance(exchange_id, credentials, account_type=None):
+    """Fetch held assets of one account type (None = spot, 'future' / 'swap') from a CCXT exchange"""
     # Skip if no keys
     if not credentials['apiKey']: return {}
     
     holdings = {}
     
-    async def get_bal(options={}, use_proxy=None):
-        exchange = None
-        key = f"{exchange_id}_{options.get('defaultType', 'spot')}"
+    async def get_bal(account_type=None, use_proxy=None):
+        key = f"{exchange_id}_{account_type or 'spot'}"
         try:
-            exchange_class = getattr(ccxt, exchange_id)
-            
-            # Prepare config
-            ex_config = credentials.copy()
-            ex_config['timeout'] = 3000 # 3s timeout (was 10s)
-            
-            # 1. Private Proxy / Explicit Proxy
-            if use_proxy:
-                ex_config['aiohttp_proxy'] = use_proxy
-            elif CONFIG['PROXY_URL']:
-                 ex_config['aiohttp_proxy'] = CONFIG['PROXY_URL']
-
-            # Create new instance for each type to avoid state issues
-            exchange = exchange_class(ex_config)
-            if options:
-                exchange.options.update(options)
+            # Shared instance; the account type (spot / future / swap) is a per-call parameter
+            exchange = await exchange_pool.get(exchange_id, use_proxy or CONFIG['PROXY_URL'])
             
             # Fetch Balance
-            balance = await exchange.fetch_balance()
+            balance = await exchange.fetch_balance({'type': account_type} if account_type else {})
             
             # Standardize 'total'
             items = balance.get('total', {})
@@ -146,204 +124,59 @@ async def fetch_ccxt_balance(exchange_id, credentials):
                 logger.error(f"Error fetching {exchange_id} (proxy={use_proxy}): {e}")
                 FETCH_ERRORS[key] = f"proxy={use_proxy or CONFIG['PROXY_URL']}: {err_msg}"
             return False
-        finally:
-            if exchange:
-                try:
-                    await exchange.close()
-                except Exception as e_close:
-                    logger.debug(f"Failed to close exchange connection: {e_close}")
 
-    async def attempt_fetch(type_opts):
-        # 1. Try Default (Direct or Private Proxy)
-        success = await get_bal(type_opts)
-        if success: return
+    async def attempt_fetch(account_type=None):
+        # 1. Try Default (Direct or Private Proxy), unless it is known to be failing
+        if direct_health.allow_direct(exchange_id):
+            success = await get_bal(account_type)
+            if success:
+                direct_health.record_success(exchange_id)
+                return
+            err = FETCH_ERRORS.get(f"{exchange_id}_{account_type or 'spot'}", '')
+            direct_health.record_failure(exchange_id, restricted='restricted' in err.lower() or '451' in err)
+        else:
+            logger.info(f"{exchange_id} default path cooling down, going straight to public proxies")
+            direct_health.maybe_probe(exchange_id, lambda: probe_direct(exchange_id))
 
         # 2. Try Public Proxies rotation fallback (both Binance and Gate)
         logger.info(f"{exchange_id} direct/private connection failed, trying public proxies...")
         for _ in range(10): # Try up to 10 proxies
-            pub_proxy = proxy_mgr.get_next()
+            pub_proxy = await proxy_mgr.get_next_async()
             if not pub_proxy: break
             
-            success = await get_bal(type_opts, use_proxy=pub_proxy)
+            start = time.time()
+            success = await get_bal(account_type, use_proxy=pub_proxy)
+            proxy_mgr.record(pub_proxy, success, time.time() - start if success else None)
             if success: 
                 logger.info(f"Success with public proxy")
                 return
 
-    # 1. Fetch Spot
-    await attempt_fetch({})
-    
-    # 2. Fetch Futures
-    if exchange_id == 'binance':
-        await attempt_fetch({'defaultType': 'future'})
-    elif exchange_id == 'gate':
-        await attempt_fetch({'defaultType': 'swap'})
-        
+    await attempt_fetch(account_type)
     return holdings
 
-def fetch_hyperliquid_balance(wallet):
-    """Fetch Hyperliquid account value via REST (Spot + Perps)"""
-    if not wallet: return {}
-    
-    holdings = {}
-    proxies = None
-    if CONFIG['PROXY_URL']:
-        proxies = {
-            'http': CONFIG['PROXY_URL'],
-            'https': CONFIG['PROXY_URL']
-        }
-        
-    url = 'https://api.hyperliquid.xyz/info'
-    
-    # 1. Fetch Perp clearinghouse state
-    try:
-        resp = requests.post(url, json={'type': 'clearinghouseState', 'user': wallet}, proxies=proxies, timeout=10)
-        if resp.status_code == 200:
-            data = resp.json()
-            margin_summary = data.get('marginSummary', {})
-            account_val = float(margin_summary.get('accountValue', 0))
-            if account_val > 0:
-                holdings['USDC (HL)'] = account_val
-                
-            positions = data.get('assetPositions', [])
-            for pos in positions:
-                p = pos.get('position', {})
-                coin = p.get('coin')
-                sze = float(p.get('sze', 0))
-                if sze != 0:
-                    holdings[coin] = holdings.get(coin, 0) + sze
-            if 'hyperliquid_perps' in FETCH_ERRORS:
-                del FETCH_ERRORS['hyperliquid_perps']
-        else:
-            err_msg = f"API returned status {resp.status_code}"
-            logger.error(f"Hyperliquid perps API returned status {resp.status_code}")
-            FETCH_ERRORS['hyperliquid_perps'] = err_msg
-    except Exception as e:
-        err_msg = str(e)
-        logger.error(f"Error fetching Hyperliquid perps: {e}")
-        FETCH_ERRORS['hyperliquid_perps'] = err_msg
-
-    # 2. Fetch Spot clearinghouse state
-    try:
-        resp = requests.post(url, json={'type': 'spotClearinghouseState', 'user': wallet}, proxies=proxies, timeout=10)
-        if resp.status_code == 200:
-            data = resp.json()
-            balances = data.get('balances', [])
-            for b in balances:
-                coin = b.get('coin')
-                total_amt = float(b.get('total', 0))
-                if total_amt > 0:
-                    holdings[coin] = holdings.get(coin, 0) + total_amt
-            if 'hyperliquid_spot' in FETCH_ERRORS:
-                del FETCH_ERRORS['hyperliquid_spot']
-        else:
-            err_msg = f"API returned status {resp.status_code}"
-            logger.error(f"Hyperliquid spot API returned status {resp.status_code}")
-            FETCH_ERRORS['hyperliquid_spot'] = err_msg
-    except Exception as e:
-        err_msg = str(e)
-        logger.error(f"Error fetching Hyperliquid spot: {e}")
-        FETCH_ERRORS['hyperliquid_spot'] = err_msg
-        
-    return holdings
+async def fetch_hyperliquid_balance(wallet):
+    """Hyperliquid perps + spot, priced from HL's own mids (all info calls in one concurrent round trip)"""
+    if not wallet: return None
+    account = await hl_client.account(wallet)
+    for key in ('hyperliquid_perps', 'hyperliquid_spot', 'hyperliquid_mids', 'hyperliquid_spot_meta'):
+        if key in account.errors:
+            FETCH_ERRORS[key] = account.errors[key]
+        elif key in FETCH_ERRORS:
+            del FETCH_ERRORS[key]
+    return account
 
 async def get_prices_with_history(symbols):
     """
     Get Current Price AND 30m High for Alerting.
-    We use Binance for generic pricing.
+    One bulk ticker call per venue (Binance first, Gate for the rest); the 30m high comes
+    from locally stored price samples plus 15m klines whenever the newest sample is older
+    than a few minutes (see price_oracle.py).
     """
-    results = {} # { 'BTC': {'current': 50000, 'max_30m': 51000} }
-    
     # Clean symbols (remove duplicates and stables)
-    targets = [s for s in symbols if s not in ['USDT', 'USDC', 'USD']]
-    
-    # We'll stick to a simple strategy:
-    # Fetch Ticker (24h) is too broad.
-    # Fetch kline (15m) -> take last 3 candles -> max(high)
-    
-    async def fetch_prices_from_exchange(ex_name, symbols_to_fetch, use_proxy=None):
-        if not symbols_to_fetch: return
-        
-        ex_config = {}
-        ex_config['timeout'] = 3000 # 3s timeout
-        if use_proxy: ex_config['aiohttp_proxy'] = use_proxy
-        elif CONFIG['PROXY_URL']: ex_config['aiohttp_proxy'] = CONFIG['PROXY_URL']
-        
-        exchange = None
-        try:
-            exchange_class = getattr(ccxt, ex_name)
-            exchange = exchange_class(ex_config)
-            
-            # Use a semaphore to limit concurrency and avoid hitting rate limits
-            sem = asyncio.Semaphore(10)
-            
-            async def fetch_single(symbol):
-                if symbol in results: return
-                async with sem:
-                    pair = f"{symbol}/USDT"
-                    # We prefer OHLV for the "Drop Alert" feature
-                    try:
-                        ohlcv = await exchange.fetch_ohlcv(pair, timeframe='15m', limit=3)
-                        if ohlcv:
-                            current_price = ohlcv[-1][4]
-                            highs = [c[2] for c in ohlcv]
-                            results[symbol] = {
-                                'current': current_price,
-                                'max_30m': max(highs)
-                            }
-                            return
-                    except Exception:
-                        pass
-
-                    # Fallback to Ticker if OHLV failed (maybe not supported or restricted)
-                    try:
-                        ticker = await exchange.fetch_ticker(pair)
-                        if ticker and ticker['last']:
-                            results[symbol] = {
-                                'current': float(ticker['last']),
-                                'max_30m': float(ticker['last']) # No history data
-                            }
-                    except Exception:
-                        pass
-            
-            tasks = [fetch_single(s) for s in symbols_to_fetch]
-            await asyncio.gather(*tasks)
-            return True
-        except Exception as e:
-            logger.error(f"Exchange {ex_name} error: {e}")
-            return False
-        finally:
-            if exchange:
-                try:
-                    await exchange.close()
-                except Exception as e_close:
-                    logger.debug(f"Failed to close exchange connection: {e_close}")
-                    
-        # 1. Try Binance
-    targets = list(set(targets)) # Unique
+    targets = list({s for s in symbols if s not in ['USDT', 'USDC', 'USD']})
     
-    # Try with defaults then proxies
-    if not await fetch_prices_from_exchange('binance', targets):
-        logger.warning("Binance price fetch direct failed, trying proxy rules...")
-        # (Retry logic could be complex, for now we assume single shot attempt per exchange 
-        # or simplified proxy retry logic if critical)
-        pass
-
-    # Retry missing on Binance with public proxy?
-    missing = [s for s in targets if s not in results]
-    if missing:
-        logger.info(f"Retrying {len(missing)} missing coins on Binance with Proxy...")
-        for _ in range(1): # Reduced to 1
-            pub = proxy_mgr.get_next()
-            if not pub: break
-            await fetch_prices_from_exchange('binance', missing, use_proxy=pub)
-            missing = [s for s in targets if s not in results]
-            if not missing: break
-            
-    # 2. Try Gate for whatever is still missing
-    missing = [s for s in targets if s not in results]
-    if missing:
-        logger.info(f"Checking Gate.io for {len(missing)} missing coins: {missing}")
-        await fetch_prices_from_exchange('gate', missing)
+    results = await price_oracle.prices(targets) # { 'BTC': {'current': 50000, 'max_30m': 51000} }
+    price_oracle.save()
         
     # Add Stables
     results['USDT'] = {'current': 1.0, 'max_30m': 1.0}
@@ -353,17 +186,61 @@ async def get_prices_with_history(symbols):
     logger.info(f"Got prices for {len(results)}/{len(targets)} coins")
     return results
 
+async def gather_within(jobs, timeout):
+    """
+    Run {FETCH_ERRORS key: coroutine} concurrently and wait at most `timeout` seconds overall.
+    Returns the results that arrived; timeouts and exceptions are recorded in FETCH_ERRORS.
+    """
+    tasks = {key: asyncio.ensure_future(job) for key, job in jobs.items()}
+    if not tasks:
+        return {}
+    _, pending = await asyncio.wait(tasks.values(), timeout=timeout)
+    results = {}
+    for key, task in tasks.items():
+        if task in pending:
+            task.cancel()
+            logger.error(f"{key} did not finish within {timeout:g}s")
+            FETCH_ERRORS[key] = f"timeout after {timeout:g}s"
+        elif task.exception():
+            logger.error(f"Error fetching {key}: {task.exception()}")
+            FETCH_ERRORS[key] = str(task.exception())
+        else:
+            results[key] = task.result()
+    return results
+
+def merge_holdings(*parts):
+    merged = {}
+    for part in parts:
+        for coin, amt in (part or {}).items():
+            merged[coin] = merged.get(coin, 0) + amt
+    return merged
+
 # ==================== Core Logic ====================
 
 async def run_scan(force_report=False):
     logger.info("Starting Auto-Scan...")
     
-    # 1. Fetch ALL Holdings
-    binance = await fetch_ccxt_balance('binance', CONFIG['BINANCE'])
-    gate = await fetch_ccxt_balance('gate', CONFIG['GATE'])
-    hl = await asyncio.to_thread(fetch_hyperliquid_balance, CONFIG['HYPERLIQUID_WALLET'])
+    # 1. Fetch ALL Holdings (venues x account types in parallel; scan time = slowest source)
+    jobs = {}
+    for exchange_id, account_types in ACCOUNT_TYPES.items():
+        credentials = CONFIG[exchange_id.upper()]
+        for account_type in account_types:
+            jobs[f"{exchange_id}_{account_type or 'spot'}"] = fetch_ccxt_balance(exchange_id, credentials, account_type)
+    jobs['hyperliquid'] = fetch_hyperliquid_balance(CONFIG['HYPERLIQUID_WALLET'])
+    started = time.time()
+    balances = await gather_within(jobs, BALANCE_DEADLINE)
+    logger.info(f"Balances collected in {time.time() - started:.1f}s ({len(balances)}/{len(jobs)} sources)")
+
+    binance = merge_holdings(balances.get('binance_spot'), balances.get('binance_future'))
+    gate = merge_holdings(balances.get('gate_spot'), balances.get('gate_swap'))
+    # HL is valued from its own mids: perp equity (incl. position PnL) + spot tokens
+    hl_account = balances.get('hyperliquid') or HLAccount()
+    hl = {'USDC (HL)': hl_account.equity, **hl_account.spot} if hl_account.equity > 0 else dict(hl_account.spot)
+    hl_held = dict(hl_account.spot)
+    for coin, size in hl_account.positions.items():
+        hl_held[coin] = hl_held.get(coin, 0) + abs(size)
     
-    all_coins = set(binance.keys()) | set(gate.keys()) | set(hl.keys())
+    all_coins = set(binance.keys()) | set(gate.keys()) | set(hl_held.keys())
     
     # 2. Get Pricing & Drops
     price_data = await get_prices_with_history(list(all_coins))
@@ -389,7 +266,8 @@ async def run_scan(force_report=False):
 
     portfolio_total += calc_val(binance, 'Binance')
     portfolio_total += calc_val(gate, 'Gate')
-    portfolio_total += calc_val(hl, 'Hyperliquid')
+    exchange_totals['Hyperliquid'] = hl_account.value
+    portfolio_total += hl_account.value
     
     # 4. Check Alerts (Drop > 2%)
     alerts = []
@@ -399,7 +277,7 @@ async def run_scan(force_report=False):
         
         # Check if we actually hold a significant amount of this coin (> $10 value)
         # to avoid spamming alerts for dust
-        held_amt = binance.get(coin, 0) + gate.get(coin, 0) + hl.get(coin, 0)
+        held_amt = binance.get(coin, 0) + gate.get(coin, 0) + hl_held.get(coin, 0)
         if held_amt * data['current'] < 10: continue
 
         # Calc Drop
@@ -416,7 +294,7 @@ async def run_scan(force_report=False):
     # Condition A: Always send Alerts if any
     if alerts:
         alert_msg = "\n\n".join(alerts)
-        send_tg(alert_msg)
+        await send_tg(alert_msg)
         
     # Condition B: Send Periodic Report (Every 4 hours)
     now = get_beijing_time()
@@ -434,11 +312,14 @@ async def run_scan(force_report=False):
         # Aggregate all holdings for display
         all_holdings_list = []
         
-        def collect_details(holdings, source_icon):
+        def collect_details(holdings, source_icon, price_of=None):
             for coin, amt in holdings.items():
-                p_key = 'USDC' if coin == 'USDC (HL)' else coin
-                data = price_data.get(p_key)
-                price = data['current'] if data else 0
+                if price_of:
+                    price = price_of(coin)
+                else:
+                    p_key = 'USDC' if coin == 'USDC (HL)' else coin
+                    data = price_data.get(p_key)
+                    price = data['current'] if data else 0
                 val = amt * price
                 if val > 1.0: # Show only > $1
                     all_holdings_list.append({
@@ -452,7 +333,10 @@ async def run_scan(force_report=False):
 
         collect_details(binance, '🔶')
         collect_details(gate, '🚪')
-        collect_details(hl, '💧')
+        collect_details(hl, '💧', lambda c: 1.0 if c == 'USDC (HL)' else hl_account.spot_price(c))
+        # Perp positions: notional at HL mid, for information (their PnL is already in USDC (HL))
+        for coin, size in hl_account.positions.items():
+            all_holdings_list.append({'coin': f"{coin} (perp)", 'amt': size, 'val': hl_account.notional(coin), 'icon': '💧'})
 
         # Sort by value DESC
         all_holdings_list.sort(key=lambda x: x['val'], reverse=True)
@@ -474,37 +358,42 @@ async def run_scan(force_report=False):
         report_msg += f"\n_扫描时间: {now.strftime('%H:%M')} (Beijing)_"
         
         # Avoid duplicate report if alert already sent? No, user wants report.
-        send_tg(report_msg)
+        await send_tg(report_msg)
 
-def send_tg(text):
-    if not CONFIG['TG_TOKEN'] or not CONFIG['TG_CHAT_ID']:
+async def send_tg(text):
+    if not tg.configured:
         enc = sys.stdout.encoding or 'utf-8'
         safe_text = text.encode(enc, errors='replace').decode(enc)
         print("Skipping TG Send (No Config):", safe_text)
         return
-    url = f"https://api.telegram.org/bot{CONFIG['TG_TOKEN']}/sendMessage"
-    try:
-        resp = requests.post(url, json={"chat_id": CONFIG['TG_CHAT_ID'], "text": text, "parse_mode": "Markdown"}, timeout=10)
-        if resp.status_code != 200:
-            enc = sys.stdout.encoding or 'utf-8'
-            err_msg = f"⚠️ Telegram Send Error: {resp.status_code} - {resp.text}"
-            print(err_msg.encode(enc, errors='replace').decode(enc))
-        else:
-            print("✅ Telegram Message Sent Successfully")
-    except Exception as e:
-        print(f"Failed to send TG: {e}")
+    # Long reports are split into several messages; 429s are retried after retry_after
+    if await tg.send(text):
+        print("✅ Telegram Message Sent Successfully")
+    else:
+        print("⚠️ Telegram Send Error (see log)")
 
 if __name__ == "__main__":
     # Check for manual trigger flag from args
     is_manual = len(sys.argv) > 1 and sys.argv[1] == '--report'
     
     # Run!
+    async def main():
+        try:
+            await run_scan(force_report=is_manual)
+        except Exception as e:
+            enc = sys.stdout.encoding or 'utf-8'
+            err_msg = f"CRITICAL ERROR: {e}"
+            print(err_msg.encode(enc, errors='replace').decode(enc))
+            # Send error to TG if possible
+            await send_tg(f"⚠️ Bot Critical Error: {e}")
+        finally:
+            await exchange_pool.close()
+            await hl_client.close()
+            await tg.close()
+
     try:
-        asyncio.run(run_scan(force_report=is_manual))
-    except Exception as e:
-        enc = sys.stdout.encoding or 'utf-8'
-        err_msg = f"CRITICAL ERROR: {e}"
-        print(err_msg.encode(enc, errors='replace').decode(enc))
-        # Send error to TG if possible
-        send_tg(f"⚠️ Bot Critical Error: {e}")
+        asyncio.run(main())
+    finally:
+        # Persist proxy scores so the next cron run starts with known-good proxies
+        proxy_mgr.save()
 
@@ -0,0 +1,87 @@
+"""
+Per-venue ccxt instance pool for cloud_portfolio.py.
+
+One async ccxt instance per (venue, proxy) is created per run and shared by spot
+balances, futures balances and pricing (the account type is passed per call).
+The market catalogue - the slowest part of the first ccxt call - is cached on disk
+(.cache/meta/ccxt_markets_<venue>.json) and restored with set_markets(), so cron runs
+within the TTL never download it; every instance of a venue shares the same copy.
+"""
+import os
+import time
+import asyncio
+import logging
+
+import ccxt.async_support as ccxt
+
+from local_cache import cache_path, read_json, atomic_write_json
+from meta_cache import TTL
+
+logger = logging.getLogger(__name__)
+
+
+class ExchangePool:
+    def __init__(self, credentials=None, timeout=3000, ttl=None, directory=None, ccxt_module=ccxt):
+        self.credentials = credentials or {}   # venue -> {'apiKey', 'secret'}
+        self.timeout = timeout
+        self.ttl = ttl if ttl is not None else TTL['ccxt_markets']
+        self.directory = directory     # None = .cache/meta
+        self.ccxt = ccxt_module
+        self.instances = {}    # (venue, proxy) -> exchange
+        self.catalogue = {}    # venue -> (markets, currencies) loaded during this run
+        self._locks = {}
+
+    def _path(self, exchange_id):
+        name = f"ccxt_markets_{exchange_id}.json"
+        return os.path.join(self.directory, name) if self.directory else cache_path('meta', name)
+
+    async def get(self, exchange_id, proxy=None):
+        """Shared instance for a venue (through `proxy` when given), with markets loaded"""
+        key = (exchange_id, proxy)
+        exchange = self.instances.get(key)
+        if exchange is None:
+            config = dict(self.credentials.get(exchange_id) or {})
+            config['timeout'] = self.timeout
+            if proxy:
+                config['aiohttp_proxy'] = proxy
+            exchange = getattr(self.ccxt, exchange_id)(config)
+            self.instances[key] = exchange
+        if not exchange.markets:
+            await self._load_markets(exchange_id, exchange)
+        return exchange
+
+    async def _load_markets(self, exchange_id, exchange):
+        async with self._locks.setdefault(exchange_id, asyncio.Lock()):
+            entry = None
+            if exchange_id not in self.catalogue:
+                entry = read_json(self._path(exchange_id))
+                if entry and time.time() - entry.get('fetched_at', 0) < self.ttl:
+                    self.catalogue[exchange_id] = (entry['markets'], entry.get('currencies'))
+
+            if exchange_id not in self.catalogue:
+                try:
+                    await exchange.load_markets()
+                except Exception as e:
+                    if not entry:
+                        raise
+                    logger.warning(f"{exchange_id} load_markets failed ({e}), using expired catalogue")
+                    self.catalogue[exchange_id] = (entry['markets'], entry.get('currencies'))
+                else:
+                    markets, currencies = list(exchange.markets.values()), dict(exchange.currencies or {})
+                    self.catalogue[exchange_id] = (markets, currencies)
+                    atomic_write_json(self._path(exchange_id), {
+                        'fetched_at': time.time(), 'markets': markets, 'currencies': currencies,
+                    })
+                    logger.info(f"{exchange_id} market catalogue refreshed ({len(markets)} markets)")
+                    return
+
+            markets, currencies = self.catalogue[exchange_id]
+            exchange.set_markets(markets, currencies or None)
+
+    async def close(self):
+        for exchange in self.instances.values():
+            try:
+                await exchange.close()
+            except Exception as e:
+                logger.debug(f"Failed to close exchange connection: {e}")
+        self.instances.clear()
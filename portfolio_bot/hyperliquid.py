@@ -0,0 +1,121 @@
+"""
+Async Hyperliquid info client (cloud_portfolio.py and portfolio_bot.py).
+
+Everything needed to value an account is requested concurrently on one pooled aiohttp
+session: perp state (clearinghouseState), spot balances (spotClearinghouseState), mid
+prices (allMids) and the spot pair catalogue (spotMeta, maps tokens to their
+"@<index>" mids). Positions and spot tokens are priced from those mids, so the
+valuation takes a single round trip and does not depend on any other venue.
+"""
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Dict
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+HL_INFO_URL = 'https://api.hyperliquid.xyz/info'
+USDC = 'USDC'
+
+
+class HyperliquidError(Exception):
+    pass
+
+
+@dataclass
+class HLAccount:
+    equity: float = 0.0                                          # perp account value (margin + unrealized PnL)
+    positions: Dict[str, float] = field(default_factory=dict)   # perp coin -> signed size
+    spot: Dict[str, float] = field(default_factory=dict)        # spot token -> total amount
+    perp_mids: Dict[str, float] = field(default_factory=dict)
+    spot_prices: Dict[str, float] = field(default_factory=dict)  # spot token -> USDC price
+    errors: Dict[str, str] = field(default_factory=dict)        # FETCH_ERRORS key -> message
+
+    def spot_price(self, token):
+        if token == USDC:
+            return 1.0
+        return self.spot_prices.get(token) or self.perp_mids.get(token, 0.0)
+
+    def notional(self, coin):
+        return abs(self.positions.get(coin, 0.0)) * self.perp_mids.get(coin, 0.0)
+
+    @property
+    def value(self):
+        """Total account value: perp equity (already includes position PnL) + spot tokens at mid"""
+        return self.equity + sum(amt * self.spot_price(t) for t, amt in self.spot.items())
+
+    @classmethod
+    def from_responses(cls, perp, spot, mids, meta):
+        """Build from the four info responses; an exception in place of a response is recorded as an error"""
+        account = cls()
+        if isinstance(perp, Exception):
+            account.errors['hyperliquid_perps'] = str(perp)
+        else:
+            perp = perp or {}
+            account.equity = float(perp.get('marginSummary', {}).get('accountValue', 0))
+            for pos in perp.get('assetPositions', []):
+                p = pos.get('position', {})
+                size = float(p.get('szi', p.get('sze', 0)))
+                if size != 0:
+                    account.positions[p.get('coin')] = size
+
+        if isinstance(spot, Exception):
+            account.errors['hyperliquid_spot'] = str(spot)
+        else:
+            for b in (spot or {}).get('balances', []):
+                total = float(b.get('total', 0))
+                if total > 0:
+                    account.spot[b.get('coin')] = total
+
+        if isinstance(mids, Exception):
+            account.errors['hyperliquid_mids'] = str(mids)
+            return account
+        # Perp mids are keyed by coin; spot pairs by "PURR/USDC" or "@<pair index>"
+        mids = mids or {}
+        account.perp_mids = {k: float(v) for k, v in mids.items() if '/' not in k and not k.startswith('@')}
+        if isinstance(meta, Exception):
+            account.errors['hyperliquid_spot_meta'] = str(meta)
+            return account
+        meta = meta or {}
+        tokens = {t['index']: t['name'] for t in meta.get('tokens', [])}
+        for pair in meta.get('universe', []):
+            base, quote = pair.get('tokens', [None, None])[:2]
+            if tokens.get(quote) == USDC and pair.get('name') in mids:
+                account.spot_prices[tokens.get(base)] = float(mids[pair['name']])
+        return account
+
+
+class HyperliquidClient:
+    def __init__(self, proxy=None, timeout=10, url=HL_INFO_URL):
+        self.proxy = proxy
+        self.url = url
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self._session = None
+
+    async def info(self, payload):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=self.timeout)
+        async with self._session.post(self.url, json=payload, proxy=self.proxy) as resp:
+            if resp.status != 200:
+                raise HyperliquidError(f"API returned status {resp.status}")
+            return await resp.json(content_type=None)
+
+    async def account(self, wallet):
+        """Perp state, spot balances, mids and spot metadata in one concurrent round trip"""
+        responses = await asyncio.gather(
+            self.info({'type': 'clearinghouseState', 'user': wallet}),
+            self.info({'type': 'spotClearinghouseState', 'user': wallet}),
+            self.info({'type': 'allMids'}),
+            self.info({'type': 'spotMeta'}),
+            return_exceptions=True,
+        )
+        account = HLAccount.from_responses(*responses)
+        for key, err in account.errors.items():
+            logger.error(f"Error fetching {key}: {err}")
+        return account
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
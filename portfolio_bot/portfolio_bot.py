@@ -9,6 +9,7 @@ import ccxt.async_support as ccxt  # Async CCXT
 from telegram import Update
 from telegram.ext import Application, CommandHandler, ContextTypes
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from hyperliquid import HyperliquidClient, HLAccount
 
 # Load Config
 load_dotenv()
@@ -42,6 +43,9 @@ PRICE_HISTORY = {}  # { 'SYMBOL': [(timestamp, price), ...] }
 LAST_ALERT = {}     # { 'SYMBOL': timestamp }
 PORTFOLIO_CACHE = {}
 
+# Pooled async Hyperliquid client (one aiohttp session for the bot's lifetime)
+hl_client = HyperliquidClient()
+
 # ==================== Data Fetching ====================
 
 async def fetch_ccxt_balance(exchange_id, credentials):
@@ -74,40 +78,10 @@ async def fetch_ccxt_balance(exchange_id, credentials):
         logger.error(f"Error fetching {exchange_id}: {e}")
         return {}
 
-def fetch_hyperliquid_balance(wallet):
-    """Fetch Hyperliquid account value and positions via REST"""
-    if not wallet: return {}
-    
-    try:
-        url = 'https://api.hyperliquid.xyz/info'
-        headers = {'Content-Type': 'application/json'}
-        
-        # 1. Get Spot/Margin State
-        resp = requests.post(url, json={'type': 'clearinghouseState', 'user': wallet}, timeout=10)
-        if resp.status_code != 200: return {}
-        
-        data = resp.json()
-        margin_summary = data.get('marginSummary', {})
-        account_value = float(margin_summary.get('accountValue', 0))
-        
-        positions = data.get('assetPositions', [])
-        holdings = {}
-        
-        # Add Cash (USDC)
-        holdings['USDC (Account Value)'] = account_value 
-        # Note: Hyperliquid positions are derivatives usually, but let's list net positions
-        
-        for pos in positions:
-            p = pos.get('position', {})
-            coin = p.get('coin')
-            sze = float(p.get('sze', 0))
-            if sze != 0:
-                holdings[coin] = sze
-                
-        return holdings
-    except Exception as e:
-        logger.error(f"Error fetching Hyperliquid: {e}")
-        return {}
+async def fetch_hyperliquid_balance(wallet):
+    """Fetch Hyperliquid perps + spot, priced from HL's own mids (one concurrent round trip)"""
+    if not wallet: return HLAccount()
+    return await hl_client.account(wallet)
 
 async def get_market_prices(symbols):
     """Get current prices for a list of symbols (from Binance primarily)"""
@@ -138,7 +112,7 @@ async def update_portfolio():
     # 1. Balances
     binance = await fetch_ccxt_balance('binance', CONFIG['BINANCE'])
     gate = await fetch_ccxt_balance('gateio', CONFIG['GATE'])
-    hl = await asyncio.to_thread(fetch_hyperliquid_balance, CONFIG['HYPERLIQUID_WALLET'])
+    hl = await fetch_hyperliquid_balance(CONFIG['HYPERLIQUID_WALLET'])
     
     # 2. Identify all unique coins
     all_coins = set()
@@ -153,7 +127,7 @@ async def update_portfolio():
     portfolio = {
         'Binance': {'total_usd': 0, 'assets': []},
         'Gate': {'total_usd': 0, 'assets': []},
-        'Hyperliquid': {'total_usd': hl.get('USDC (Account Value)', 0), 'assets': []},
+        'Hyperliquid': {'total_usd': hl.value, 'assets': []},
         'GrandTotal': 0
     }
     
@@ -175,15 +149,19 @@ async def update_portfolio():
     process_ex('Gate', gate, portfolio['Gate'])
     
     # Hyperliquid specific
-    # In this logic, HL returns Account Value directly. Positions are just for info.
-    # We will track price of Position coins if possible, but HL prices are best from HL API.
-    # For simplicity, we trust Account Value for HL total.
-    for coin, size in hl.items():
-        if coin == 'USDC (Account Value)': continue
-        # Track position prices if found in Binance map
-        if coin in market_prices:
-             track_price(coin, market_prices[coin])
-        portfolio['Hyperliquid']['assets'].append((coin, size, 0, 0)) # Value handled in total
+    # Total = perp account value (includes position PnL) + spot tokens, all priced from HL mids.
+    # Positions are listed with their notional for info; it is not added to the total.
+    hl_assets = portfolio['Hyperliquid']['assets']
+    for coin, amt in hl.spot.items():
+        price = hl.spot_price(coin)
+        if amt * price > 1:
+            hl_assets.append((coin, amt, amt * price, price))
+            track_price(coin, price)
+    for coin, size in hl.positions.items():
+        mid = hl.perp_mids.get(coin, 0)
+        track_price(coin, mid)
+        hl_assets.append((coin, size, hl.notional(coin), mid))
+    hl_assets.sort(key=lambda x: x[2], reverse=True)
 
     portfolio['GrandTotal'] = portfolio['Binance']['total_usd'] + \
                               portfolio['Gate']['total_usd'] + \
@@ -272,8 +250,7 @@ def format_report():
     if p['Hyperliquid']['total_usd'] > 0:
         msg += f"\n💧 **Hyperliquid: ${p['Hyperliquid']['total_usd']:.2f}**\n"
         for coin, amt, val, price in p['Hyperliquid']['assets']:
-             if coin == 'USDC (Account Value)': continue
-             msg += f"- {coin}: {amt:.3f}\n"
+             msg += f"- {coin}: {amt:.3f} (${val:.1f})\n"
 
     msg += f"\n_更新于: {datetime.now().strftime('%H:%M:%S')}_"
     return msg
@@ -0,0 +1,135 @@
+"""
+Bulk price oracle for cloud_portfolio.py.
+
+- Current prices for every holding come from one all-tickers call per venue (Binance
+  fetch_last_prices, Gate fetch_tickers) on the shared ExchangePool instances.
+- Each price is appended to a local sample set (.cache/price_samples.json, last 2 hours)
+  and the 30-minute high is taken from those samples.
+- Samples only see the market at run times, so a spike between two runs is invisible
+  to them. Coins whose newest sample is older than max_gap (5 minutes by default,
+  PRICE_SAMPLE_MAX_GAP) therefore also take the high of the last 15m klines, which keeps
+  drop alerts as sensitive as before. With the 20-minute cron this is still one kline
+  request per coin; only runs spaced closer than max_gap price everything from the
+  bulk calls (one request for Binance, plus one for Gate if a coin is only listed there).
+"""
+import os
+import time
+import asyncio
+import logging
+
+from local_cache import cache_path, read_json, atomic_write_json
+
+logger = logging.getLogger(__name__)
+
+WINDOW = 30 * 60         # seconds covered by max_30m
+KEEP = 2 * 3600          # seconds of samples kept on disk
+MAX_GAP = float(os.environ.get('PRICE_SAMPLE_MAX_GAP', '300'))   # older newest sample -> kline high too
+QUOTE = 'USDT'
+
+
+class PriceOracle:
+    def __init__(self, pool, venues=('binance', 'gate'), default_proxy=None, next_proxy=None,
+                 path=None, window=WINDOW, keep=KEEP, max_gap=MAX_GAP):
+        self.pool = pool                    # ExchangePool
+        self.venues = venues
+        self.default_proxy = default_proxy
+        self.next_proxy = next_proxy        # async () -> public proxy, used for one retry per venue
+        self.path = path or cache_path('price_samples.json')
+        self.window = window
+        self.keep = keep
+        self.max_gap = max_gap
+        self.samples = read_json(self.path, {}) or {}   # coin -> [[ts, price], ...]
+        self.requests = 0
+
+    async def _bulk(self, venue, proxy):
+        """All {coin: price} quoted in USDT on a venue, from a single request"""
+        exchange = await self.pool.get(venue, proxy)
+        self.requests += 1
+        if exchange.has.get('fetchLastPrices'):
+            data = await exchange.fetch_last_prices()
+            prices = {s: d.get('price') for s, d in data.items()}
+        else:
+            data = await exchange.fetch_tickers()
+            prices = {s: d.get('last') for s, d in data.items()}
+        out = {}
+        for symbol, price in prices.items():
+            base, _, quote = symbol.partition('/')
+            if quote == QUOTE and price:
+                out[base] = float(price)
+        return out
+
+    async def _bulk_with_retry(self, venue):
+        try:
+            return await self._bulk(venue, self.default_proxy)
+        except Exception as e:
+            logger.warning(f"{venue} bulk prices failed: {e}")
+        proxy = await self.next_proxy() if self.next_proxy else None
+        if proxy:
+            try:
+                return await self._bulk(venue, proxy)
+            except Exception as e:
+                logger.warning(f"{venue} bulk prices via public proxy failed: {e}")
+        return {}
+
+    async def _kline_high(self, venue, coin):
+        """30m high from the last 15m klines, for coins without a recent local sample"""
+        try:
+            exchange = await self.pool.get(venue, self.default_proxy)
+            self.requests += 1
+            ohlcv = await exchange.fetch_ohlcv(f"{coin}/{QUOTE}", timeframe='15m', limit=3)
+            return max(c[2] for c in ohlcv) if ohlcv else None
+        except Exception as e:
+            logger.debug(f"{coin} klines on {venue} failed: {e}")
+            return None
+
+    def _recent(self, coin, now):
+        return [p for t, p in self.samples.get(coin, []) if now - t <= self.window]
+
+    def _needs_klines(self, coin, now):
+        """True if the samples may have missed a high since the last one (or there are none)"""
+        pts = self.samples.get(coin)
+        return not pts or now - pts[-1][0] > self.max_gap
+
+    async def prices(self, coins, now=None):
+        """{coin: {'current': price, 'max_30m': high}} for every coin found on one of the venues"""
+        now = now or time.time()
+        current, venue_of = {}, {}
+        for venue in self.venues:
+            missing = [c for c in coins if c not in current]
+            if not missing:
+                break
+            listed = await self._bulk_with_retry(venue)
+            for c in missing:
+                if c in listed:
+                    current[c], venue_of[c] = listed[c], venue
+
+        no_history = [c for c in current if self._needs_klines(c, now)]
+        sem = asyncio.Semaphore(10)
+
+        async def kline_high(coin):
+            async with sem:
+                return await self._kline_high(venue_of[coin], coin)
+
+        highs = dict(zip(no_history, await asyncio.gather(*[kline_high(c) for c in no_history])))
+
+        results = {}
+        for coin, price in current.items():
+            high = max(self._recent(coin, now) + [price, highs.get(coin) or 0])
+            results[coin] = {'current': price, 'max_30m': high}
+            self.samples.setdefault(coin, []).append([now, price])
+
+        self._prune(now)
+        logger.info(f"Price oracle: {len(results)}/{len(coins)} coins in {self.requests} requests "
+                    f"({len(no_history)} with kline highs)")
+        return results
+
+    def _prune(self, now):
+        pruned = {}
+        for coin, pts in self.samples.items():
+            kept = [p for p in pts if now - p[0] <= self.keep]
+            if kept:
+                pruned[coin] = kept
+        self.samples = pruned
+
+    def save(self):
+        atomic_write_json(self.path, self.samples)
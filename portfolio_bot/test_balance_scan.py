@@ -0,0 +1,73 @@
+import os
+import sys
+import time
+import asyncio
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import cloud_portfolio as cp
+
+
+def test_sources_fetched_concurrently_under_deadline():
+    async def balance(amount, delay):
+        await asyncio.sleep(delay)
+        return {'BTC': amount}
+
+    async def broken():
+        raise RuntimeError("401 invalid key")
+
+    cp.FETCH_ERRORS.clear()
+    start = time.time()
+    res = asyncio.run(cp.gather_within({
+        'binance_spot': balance(1, 0.2),
+        'binance_future': balance(2, 0.2),
+        'gate_spot': balance(3, 5),
+        'gate_swap': broken(),
+    }, timeout=0.5))
+
+    assert time.time() - start < 1.0
+    assert res == {'binance_spot': {'BTC': 1}, 'binance_future': {'BTC': 2}}
+    assert cp.merge_holdings(res.get('binance_spot'), res.get('binance_future'), None) == {'BTC': 3}
+    assert 'timeout' in cp.FETCH_ERRORS['gate_spot']
+    assert '401' in cp.FETCH_ERRORS['gate_swap']
+
+
+def test_proxy_pool_refresh_does_not_block_the_loop():
+    refreshes = []
+
+    def slow_refresh():
+        # first use of the pool: blocking download + validation
+        refreshes.append(time.time())
+        time.sleep(0.5)
+
+    async def balance():
+        await asyncio.sleep(0.1)
+        return {'ETH': 1}
+
+    async def run():
+        start = time.time()
+        res = await cp.gather_within({
+            'binance_spot': balance(),
+            'gate_spot': cp.proxy_mgr.get_next_async(),
+            'gate_swap': cp.proxy_mgr.get_next_async(),
+        }, timeout=0.3)
+        return res, time.time() - start
+
+    pool = cp.proxy_mgr
+    saved = pool.load, pool.refresh, pool._loaded, pool.stats
+    pool.load, pool.refresh, pool._loaded, pool.stats = (lambda: None), slow_refresh, False, {}
+    try:
+        cp.FETCH_ERRORS.clear()
+        res, elapsed = asyncio.run(run())
+    finally:
+        pool.load, pool.refresh, pool._loaded, pool.stats = saved
+    # the venue that does not need a proxy finishes and the deadline still holds
+    assert res == {'binance_spot': {'ETH': 1}} and elapsed < 0.45
+    assert 'timeout' in cp.FETCH_ERRORS['gate_spot']
+    # concurrent callers share one pool refresh
+    assert len(refreshes) == 1
+
+
+if __name__ == "__main__":
+    test_sources_fetched_concurrently_under_deadline()
+    test_proxy_pool_refresh_does_not_block_the_loop()
+    print("[TEST] balance scan OK")
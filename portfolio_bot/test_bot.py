@@ -2,6 +2,7 @@ import asyncio
 import logging
 from unittest.mock import MagicMock, patch
 from portfolio_bot import update_portfolio, check_alerts, format_report, PRICE_HISTORY, CONFIG
+from hyperliquid import HLAccount
 
 # Mock Logging to console
 logging.basicConfig(level=logging.INFO)
@@ -12,7 +13,7 @@ async def test_logic():
     # 1. Mock Data
     mock_binance = {'BTC': 0.5, 'USDT': 100}
     mock_gate = {'GWEI': 5000}
-    mock_hl = {'USDC (Account Value)': 2000, 'ETH': 1.0} # Position just for display
+    mock_hl = HLAccount(equity=2000, positions={'ETH': 1.0}, perp_mids={'ETH': 3000.0}) # Position just for display
     
     mock_prices = {
         'BTC': 50000.0,
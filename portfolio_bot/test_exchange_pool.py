@@ -0,0 +1,57 @@
+import os
+import sys
+import asyncio
+import tempfile
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from exchange_pool import ExchangePool
+
+LOADS = []
+
+
+class FakeExchange:
+    def __init__(self, config):
+        self.config = config
+        self.markets = None
+        self.currencies = None
+        self.closed = False
+
+    async def load_markets(self):
+        LOADS.append(self.config.get('aiohttp_proxy'))
+        await asyncio.sleep(0.01)
+        self.set_markets([{'symbol': 'BTC/USDT', 'id': 'BTCUSDT'}], {'BTC': {'code': 'BTC'}})
+
+    def set_markets(self, markets, currencies=None):
+        self.markets = {m['symbol']: m for m in markets}
+        self.currencies = currencies or {}
+
+    async def close(self):
+        self.closed = True
+
+
+FAKE_CCXT = SimpleNamespace(binance=FakeExchange)
+
+
+async def run_pool(directory):
+    pool = ExchangePool({'binance': {'apiKey': 'k', 'secret': 's'}}, directory=directory, ccxt_module=FAKE_CCXT)
+    spot, futures, proxied = await asyncio.gather(
+        pool.get('binance'), pool.get('binance'), pool.get('binance', 'http://proxy:1'))
+    assert spot is futures and spot is not proxied
+    assert proxied.markets == spot.markets and spot.config['apiKey'] == 'k'
+    await pool.close()
+    assert spot.closed and proxied.closed
+
+
+def test_catalogue_loaded_once_and_persisted():
+    LOADS.clear()
+    with tempfile.TemporaryDirectory() as d:
+        asyncio.run(run_pool(d))
+        assert len(LOADS) == 1          # the proxied instance reused the same catalogue
+        asyncio.run(run_pool(d))
+        assert len(LOADS) == 1          # next run: restored from disk, no download
+
+
+if __name__ == "__main__":
+    test_catalogue_loaded_once_and_persisted()
+    print("[TEST] exchange pool OK")
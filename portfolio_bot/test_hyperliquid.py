@@ -0,0 +1,68 @@
+import os
+import sys
+import time
+import asyncio
+
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from hyperliquid import HyperliquidClient
+
+RESPONSES = {
+    'clearinghouseState': {
+        'marginSummary': {'accountValue': '1500.5'},
+        'assetPositions': [{'position': {'coin': 'ETH', 'szi': '-2.0'}}, {'position': {'coin': 'SOL', 'szi': '0.0'}}],
+    },
+    'spotClearinghouseState': {'balances': [
+        {'coin': 'USDC', 'total': '100.0'}, {'coin': 'HYPE', 'total': '10'}, {'coin': 'PURR', 'total': '1000'},
+    ]},
+    'allMids': {'ETH': '3000', 'BTC': '60000', 'HYPE': '24', '@107': '25', 'PURR/USDC': '0.2'},
+    'spotMeta': {
+        'tokens': [{'name': 'USDC', 'index': 0}, {'name': 'PURR', 'index': 1}, {'name': 'HYPE', 'index': 150}],
+        'universe': [{'name': 'PURR/USDC', 'tokens': [1, 0], 'index': 0},
+                     {'name': '@107', 'tokens': [150, 0], 'index': 107}],
+    },
+}
+
+
+async def info_server():
+    async def handler(request):
+        body = await request.json()
+        await asyncio.sleep(0.2)       # every call takes one "round trip"
+        return web.json_response(RESPONSES[body['type']])
+
+    app = web.Application()
+    app.router.add_post('/info', handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/info"
+
+
+async def fetch_account():
+    runner, url = await info_server()
+    client = HyperliquidClient(url=url)
+    try:
+        start = time.monotonic()
+        account = await client.account('0xabc')
+        return account, time.monotonic() - start
+    finally:
+        await client.close()
+        await runner.cleanup()
+
+
+def test_account_valued_from_mids_in_one_round_trip():
+    account, elapsed = asyncio.run(fetch_account())
+    assert elapsed < 0.5                       # 4 info calls, concurrently
+    assert account.errors == {}
+    assert account.positions == {'ETH': -2.0}
+    assert account.notional('ETH') == 6000.0
+    assert account.spot_price('HYPE') == 25.0  # spot pair mid, not the perp mid
+    assert account.value == 1500.5 + 100 + 10 * 25 + 1000 * 0.2
+
+
+if __name__ == "__main__":
+    test_account_valued_from_mids_in_one_round_trip()
+    print("[TEST] hyperliquid OK")
@@ -0,0 +1,72 @@
+import os
+import sys
+import asyncio
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from price_oracle import PriceOracle
+
+CALLS = []
+
+
+class FakeBinance:
+    has = {'fetchLastPrices': True}
+
+    def __init__(self, prices):
+        self.prices = prices
+
+    async def fetch_last_prices(self):
+        CALLS.append('binance:last_prices')
+        return {f"{c}/USDT": {'price': p} for c, p in self.prices.items()} | {'BTC/USDT:USDT': {'price': 1}}
+
+    async def fetch_ohlcv(self, pair, timeframe, limit):
+        CALLS.append(f'binance:ohlcv:{pair}')
+        return [[0, 0, 110.0, 0, 0, 0], [0, 0, 105.0, 0, 0, 0]]
+
+
+class FakeGate:
+    has = {}
+
+    async def fetch_tickers(self):
+        CALLS.append('gate:tickers')
+        return {'GWEI/USDT': {'last': 0.05}, 'GWEI/BTC': {'last': 1e-9}}
+
+
+class FakePool:
+    def __init__(self, binance_prices):
+        self.exchanges = {'binance': FakeBinance(binance_prices), 'gate': FakeGate()}
+
+    async def get(self, venue, proxy=None):
+        return self.exchanges[venue]
+
+
+def test_bulk_prices_and_sampled_high():
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, 'samples.json')
+        CALLS.clear()
+        oracle = PriceOracle(FakePool({'BTC': 100.0, 'ETH': 10.0}), path=path)
+        res = asyncio.run(oracle.prices(['BTC', 'ETH', 'GWEI', 'NOPE'], now=1000))
+        oracle.save()
+        assert res['BTC'] == {'current': 100.0, 'max_30m': 110.0}   # first sight: klines
+        assert res['GWEI']['current'] == 0.05 and 'NOPE' not in res
+        assert CALLS.count('binance:last_prices') == 1 and CALLS.count('gate:tickers') == 1
+
+        # 20 minutes later (cron spacing): a spike between runs is only in the klines
+        CALLS.clear()
+        oracle = PriceOracle(FakePool({'BTC': 97.0, 'ETH': 10.0}), path=path)
+        res = asyncio.run(oracle.prices(['BTC', 'ETH'], now=1000 + 1200))
+        oracle.save()
+        assert CALLS.count('binance:last_prices') == 1 and 'binance:ohlcv:BTC/USDT' in CALLS
+        assert res['BTC'] == {'current': 97.0, 'max_30m': 110.0}
+
+        # 2 minutes later: prices only from the bulk call, high from stored samples
+        CALLS.clear()
+        oracle = PriceOracle(FakePool({'BTC': 96.0, 'ETH': 10.0}), path=path, max_gap=300)
+        res = asyncio.run(oracle.prices(['BTC', 'ETH'], now=1000 + 1320))
+        assert CALLS == ['binance:last_prices']
+        assert res['BTC'] == {'current': 96.0, 'max_30m': 100.0}
+
+
+if __name__ == "__main__":
+    test_bulk_prices_and_sampled_high()
+    print("[TEST] price oracle OK")
@@ -0,0 +1,207 @@
+"""
+带评分、可持久化的公共代理池
+
+- 并发拉取多个 GitHub 代理列表
+- 并发用一个轻量接口验证候选代理, 记录延迟和成功/失败次数
+- 按 成功率 / 延迟 排序, 结果写入本地缓存 (PROXY_POOL_TTL 秒内有效),
+  下一次定时运行直接从已知可用的代理开始, 不用再挨个试死代理
+- 首次使用时的加载/刷新可能阻塞数十秒; 异步代码用 get_next_async / best_async,
+  刷新在线程里进行, 多个并发调用方共用一次刷新
+"""
+import os
+import time
+import asyncio
+import logging
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from host_health import is_restricted
+from local_cache import cache_path, read_json, atomic_write_json
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOURCES = [
+    "https://raw.githubusercontent.com/monosans/proxy-list/main/proxies/http.txt",
+    "https://raw.githubusercontent.com/TheSpeedX/PROXY-List/master/http.txt",
+    "https://raw.githubusercontent.com/prxchk/proxy-list/main/http.txt",
+    "https://raw.githubusercontent.com/zloi-user/hideip.me/main/http.txt",
+]
+
+
+def parse_proxy_line(line):
+    """'1.2.3.4:8080 US' -> 'http://1.2.3.4:8080', 无法解析返回 None"""
+    parts = line.strip().split(':')
+    if len(parts) < 2:
+        return None
+    ip = parts[0].strip()
+    port_part = parts[1].strip().split()
+    if not port_part:
+        return None
+    port = ''.join([c for c in port_part[0] if c.isdigit()])
+    if ip and port:
+        return f"http://{ip}:{port}"
+    return None
+
+
+class ProxyPool:
+    def __init__(self, validate_url="https://fapi.binance.com/fapi/v1/time", cache_file="proxy_pool.json",
+                 sources=None, ttl=None, per_source=100, validate_timeout=4, target_size=15, workers=50):
+        self.validate_url = validate_url
+        self.cache_path = cache_path(cache_file)
+        self.sources = sources or DEFAULT_SOURCES
+        self.ttl = ttl if ttl is not None else float(os.environ.get("PROXY_POOL_TTL", "3600"))
+        self.per_source = per_source              # 每个源最多取多少行
+        self.validate_timeout = validate_timeout
+        self.target_size = target_size            # 验证出这么多可用代理就提前结束
+        self.workers = workers
+
+        self.stats = {}       # proxy -> {'ok', 'fail', 'streak', 'latency'}
+        self.updated_at = 0
+        self._loaded = False
+        self._dirty = False
+        self._index = 0
+        self._ensure_lock = threading.Lock()
+
+    # ---------- 评分 ----------
+    @staticmethod
+    def score(st):
+        # 拉普拉斯平滑的成功率 / 延迟; 连续失败的代理直接沉底
+        rate = (st['ok'] + 1) / (st['ok'] + st['fail'] + 2)
+        return rate / (st.get('latency') or 5.0) / (1 + st.get('streak', 0))
+
+    def record(self, proxy, ok, latency=None):
+        """记录一次实际使用结果, 用于后续排序"""
+        st = self.stats.setdefault(proxy, {'ok': 0, 'fail': 0, 'streak': 0, 'latency': None})
+        if ok:
+            st['ok'] += 1
+            st['streak'] = 0
+            if latency is not None:
+                # 延迟用 EWMA, 避免单次抖动影响太大
+                st['latency'] = latency if st['latency'] is None else 0.7 * st['latency'] + 0.3 * latency
+        else:
+            st['fail'] += 1
+            st['streak'] += 1
+        self._dirty = True
+
+    def best(self, n=None):
+        """返回按评分排序的可用代理 (连续失败 3 次以上的不返回)"""
+        self.ensure()
+        alive = [p for p, st in self.stats.items() if st['ok'] > 0 and st.get('streak', 0) < 3]
+        alive.sort(key=lambda p: self.score(self.stats[p]), reverse=True)
+        return alive[:n] if n else alive
+
+    def get_next(self):
+        """按排名轮询 (兼容旧 ProxyManager.get_next 接口)"""
+        ranked = self.best()
+        if not ranked: return None
+        if self._index >= len(ranked):
+            self._index = 0
+        p = ranked[self._index]
+        self._index += 1
+        return p
+
+    async def best_async(self, n=None):
+        """best() 的异步版本: 首次加载/刷新放到线程里, 不阻塞事件循环"""
+        if not self._loaded:
+            await asyncio.to_thread(self.ensure)
+        return self.best(n)
+
+    async def get_next_async(self):
+        if not self._loaded:
+            await asyncio.to_thread(self.ensure)
+        return self.get_next()
+
+    # ---------- 加载 / 刷新 ----------
+    def ensure(self):
+        """首次使用时加载缓存; 缓存过期或可用代理太少则重新拉取验证 (并发调用方等同一次刷新)"""
+        if self._loaded: return
+        with self._ensure_lock:
+            if self._loaded: return
+            try:
+                self.load()
+                fresh = time.time() - self.updated_at < self.ttl
+                alive = [st for st in self.stats.values() if st['ok'] > 0 and st.get('streak', 0) < 3]
+                if fresh and len(alive) >= max(3, self.target_size // 3):
+                    logger.info(f"使用缓存代理池: {len(alive)} 个可用")
+                    return
+                self.refresh()
+            finally:
+                self._loaded = True
+
+    def load(self):
+        data = read_json(self.cache_path, {}) or {}
+        self.stats = data.get('proxies', {})
+        self.updated_at = data.get('updated_at', 0)
+
+    def save(self):
+        if not self._dirty: return
+        # 只保留有过成功记录的代理, 防止文件无限增长
+        keep = {p: st for p, st in self.stats.items() if st['ok'] > 0 and st.get('streak', 0) < 5}
+        try:
+            atomic_write_json(self.cache_path, {'updated_at': self.updated_at, 'proxies': keep})
+            self._dirty = False
+        except OSError as e:
+            logger.debug(f"保存代理池失败: {e}")
+
+    def _fetch_source(self, url):
+        try:
+            resp = requests.get(url, timeout=3)
+            if resp.status_code != 200:
+                return []
+            found = []
+            for line in resp.text.splitlines()[:self.per_source]:
+                p = parse_proxy_line(line)
+                if p: found.append(p)
+            return found
+        except Exception:
+            return []
+
+    def fetch_candidates(self):
+        """并发拉取所有代理源, 去重"""
+        found, seen = [], set()
+        with ThreadPoolExecutor(max_workers=len(self.sources)) as ex:
+            for proxies in ex.map(self._fetch_source, self.sources):
+                for p in proxies:
+                    if p not in seen:
+                        seen.add(p)
+                        found.append(p)
+        return found
+
+    def _validate(self, proxy):
+        start = time.time()
+        try:
+            resp = requests.get(self.validate_url, proxies={"http": proxy, "https": proxy}, timeout=self.validate_timeout)
+            ok = resp.status_code == 200 and not is_restricted(resp.json())
+        except Exception:
+            ok = False
+        return proxy, ok, time.time() - start
+
+    def refresh(self):
+        """拉取候选并并发验证, 验证出 target_size 个可用代理后提前结束"""
+        logger.info("正在刷新代理池...")
+        candidates = [p for p in self.fetch_candidates()
+                      if self.stats.get(p, {}).get('streak', 0) < 3]
+        if not candidates:
+            logger.error("获取代理失败: 所有代理源均无数据")
+            return
+
+        good = 0
+        ex = ThreadPoolExecutor(max_workers=self.workers)
+        try:
+            futures = [ex.submit(self._validate, p) for p in candidates]
+            for fut in as_completed(futures):
+                proxy, ok, latency = fut.result()
+                self.record(proxy, ok, latency if ok else None)
+                if ok:
+                    good += 1
+                    if good >= self.target_size:
+                        break
+        finally:
+            # 剩下的验证任务直接取消, 已在途的不等待
+            ex.shutdown(wait=False, cancel_futures=True)
+
+        self.updated_at = time.time()
+        self._dirty = True
+        logger.info(f"代理池刷新完成: {len(candidates)} 个候选, {good} 个可用")
+        self.save()
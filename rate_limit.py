@@ -0,0 +1,192 @@
+"""
+请求限速
+
+BinanceWeightScheduler: 按接口族 (/fapi 与 /futures/data) 各一个令牌桶。
+- /fapi:          权重 2400 / 1 分钟
+- /futures/data:  请求数 1000 / 5 分钟
+桶的补充速率 = 上限 * safety / 窗口, 容量 = 上限 * (1 - safety),
+这样任意一个完整窗口内的消耗都不会超过 上限。
+响应头 X-MBX-USED-WEIGHT-1M 用来校正本地估计; 遇到 418/429 按 Retry-After 暂停整个接口族。
+这两项都只看直连响应: 经代理的响应头描述的是代理 IP 的额度, 与本机无关,
+所以也只有直连请求才预占权重; 预占后没有发出 (等待中被取消) 的请求用 refund 退还。
+
+SlidingWindowLimiter: 按"任意 window 秒内最多 limit 次"限速 (Coinalyze: 40 次/分钟),
+额度够时请求可以连发, 不用每次固定睡眠; 429 的 Retry-After 对所有调用方生效。
+"""
+import time
+from collections import deque
+import asyncio
+import logging
+import threading
+from urllib.parse import urlparse, parse_qs
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    def __init__(self, capacity, rate):
+        self.capacity = capacity
+        self.rate = rate                # 每秒补充的令牌数
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, cost):
+        """预占 cost 个令牌 (可以透支), 返回调用方需要等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= cost
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(wait, self.paused_until - now)
+
+    def refund(self, cost):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.capacity, self.tokens + cost)
+
+    def clamp(self, available):
+        """服务端告知的剩余额度比本地估计少时, 以服务端为准"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.tokens, available)
+
+    def pause(self, seconds):
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.paused_until = max(self.paused_until, now + seconds)
+            self.tokens = min(self.tokens, 0)
+
+
+class BinanceWeightScheduler:
+    # 接口族 -> (上限, 窗口秒数)
+    LIMITS = {
+        'fapi': (2400, 60),
+        'futures_data': (1000, 300),
+    }
+    # 不带 symbol 时权重较高的接口
+    HEAVY = {
+        '/fapi/v1/ticker/24hr': 40,
+        '/fapi/v1/premiumIndex': 10,
+        '/fapi/v1/ticker/price': 2,
+        '/fapi/v1/exchangeInfo': 1,
+    }
+
+    def __init__(self, safety=0.9):
+        self.buckets = {}
+        for family, (limit, window) in self.LIMITS.items():
+            rate = limit * safety / window
+            self.buckets[family] = TokenBucket(capacity=limit * (1 - safety), rate=rate)
+        self.safety = safety
+
+    @staticmethod
+    def family(url):
+        path = urlparse(url).path
+        if path.startswith('/futures/data'):
+            return 'futures_data'
+        if path.startswith('/fapi'):
+            return 'fapi'
+        return None
+
+    def weight(self, url):
+        parsed = urlparse(url)
+        if parsed.path in self.HEAVY and 'symbol' not in parse_qs(parsed.query):
+            return self.HEAVY[parsed.path]
+        if parsed.path == '/fapi/v1/klines':
+            limit = int(parse_qs(parsed.query).get('limit', ['500'])[0])
+            return 1 if limit < 100 else 2 if limit < 500 else 5 if limit <= 1000 else 10
+        return 1
+
+    def reserve(self, url):
+        family = self.family(url)
+        if family is None:
+            return 0.0
+        return self.buckets[family].reserve(self.weight(url))
+
+    def acquire(self, url):
+        wait = self.reserve(url)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, url):
+        wait = self.reserve(url)
+        if wait > 0:
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                self.refund(url)
+                raise
+
+    def refund(self, url):
+        """退还预占了但没有发出的请求的权重"""
+        family = self.family(url)
+        if family is not None:
+            self.buckets[family].refund(self.weight(url))
+
+    def observe(self, url, status, headers, direct=True):
+        """根据直连响应校正令牌桶: 已用权重头 + 418/429 退避 (direct=False 的代理响应忽略)"""
+        family = self.family(url)
+        if family is None or not direct:
+            return
+        bucket = self.buckets[family]
+
+        used = headers.get('X-MBX-USED-WEIGHT-1M') if headers else None
+        if used and family == 'fapi':
+            try:
+                limit, _ = self.LIMITS['fapi']
+                bucket.clamp(limit * self.safety - float(used))
+            except ValueError:
+                pass
+
+        if status in (418, 429):
+            try:
+                retry_after = float(headers.get('Retry-After', 0)) if headers else 0
+            except ValueError:
+                retry_after = 0
+            # 418 表示已经被封 IP, 至少退避 2 分钟
+            backoff = retry_after or (120 if status == 418 else 30)
+            logger.warning(f"币安限频 {status} ({family}), 暂停 {backoff:.0f}s")
+            bucket.pause(backoff)
+
+
+class SlidingWindowLimiter:
+    def __init__(self, limit, window):
+        self.limit = limit
+        self.window = window
+        self.sent = deque()             # 最近 window 秒内请求的发出时间
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """占用一个请求名额, 返回需要等待的秒数 (等待后再发请求)"""
+        with self._lock:
+            now = time.monotonic()
+            while self.sent and self.sent[0] <= now - self.window:
+                self.sent.popleft()
+            start = max(now, self.paused_until)
+            if len(self.sent) >= self.limit:
+                # 第 limit 个之前的那次请求滑出窗口后才能发
+                start = max(start, self.sent[-self.limit] + self.window)
+            self.sent.append(start)
+            return start - now
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds):
+        """服务端要求退避 (429 Retry-After): 之后所有请求都等到期再发"""
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
@@ -0,0 +1,118 @@
+"""
+扫描历史存储
+
+ScanStore 定义 main.py 用到的存储接口 (抽象基类):
+- 周期报告: add_report_to_cycle / reset_cycle (按周期发送 LS 趋势报告), 每个后端都必须实现
+- 完整指标表: record_scan (每次扫描所有币种的 price_chg / oi_chg / ls / funding),
+  不保存完整历史的后端可以不实现; 按币种查询历史 (history) 只有 SQLite 后端提供
+
+SQLiteScanStore 是本地实现 (标准库 sqlite3, 文件放在 .cache/ 下随 actions/cache 保留),
+指标表以 (symbol, ts) 为聚簇主键, 按币种查多天历史只扫一段连续的 B 树。
+Firestore 实现见 main.py 的 FirebaseManager, 只在配置了 FIREBASE_CREDENTIALS 时使用。
+"""
+import os
+import json
+import time
+import sqlite3
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Dict, List
+
+from local_cache import cache_path
+
+METRIC_COLUMNS = ('price_chg', 'oi_chg', 'ls', 'funding')
+HISTORY_DAYS = int(os.environ.get("SCAN_HISTORY_DAYS", "14"))
+
+
+def to_ms(timestamp) -> int:
+    """ISO 时间字符串 / 秒 / 毫秒 -> 毫秒时间戳"""
+    if isinstance(timestamp, str):
+        return int(datetime.fromisoformat(timestamp).timestamp() * 1000)
+    return int(timestamp if timestamp > 1e12 else timestamp * 1000)
+
+
+class ScanStore(ABC):
+    @abstractmethod
+    def add_report_to_cycle(self, report: Dict) -> int:
+        """追加一份报告, 返回当前周期长度"""
+
+    @abstractmethod
+    def reset_cycle(self, consumed: int):
+        """分析完 consumed 份报告后开始新周期"""
+
+    def record_scan(self, timestamp, metrics: List[Dict]):
+        """记录一次扫描的完整指标表; 不保存完整历史的后端可以忽略"""
+        pass
+
+    def close(self):
+        pass
+
+
+class SQLiteScanStore(ScanStore):
+    def __init__(self, path=None, history_days=HISTORY_DAYS):
+        self.path = path or cache_path('scan_history.sqlite')
+        self.history_days = history_days
+        self.conn = sqlite3.connect(self.path)
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS metrics (
+                symbol TEXT NOT NULL,
+                ts INTEGER NOT NULL,
+                price_chg REAL, oi_chg REAL, ls REAL, funding REAL,
+                PRIMARY KEY (symbol, ts)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS metrics_ts ON metrics (ts);
+            CREATE TABLE IF NOT EXISTS reports (
+                ts TEXT PRIMARY KEY,
+                body TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS counters (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );
+        ''')
+
+    # ---------- 周期报告 ----------
+    def add_report_to_cycle(self, report: Dict) -> int:
+        with self.conn:
+            self.conn.execute('INSERT OR REPLACE INTO reports (ts, body) VALUES (?, ?)',
+                              (report['timestamp'], json.dumps(report, ensure_ascii=False)))
+            return self._increment('cycle_len', 1)
+
+    def reset_cycle(self, consumed: int):
+        with self.conn:
+            self._increment('cycle_len', -consumed)
+
+    def _increment(self, name, delta) -> int:
+        self.conn.execute(
+            'INSERT INTO counters (name, value) VALUES (?, ?) '
+            'ON CONFLICT(name) DO UPDATE SET value = value + excluded.value', (name, delta))
+        return self.conn.execute('SELECT value FROM counters WHERE name = ?', (name,)).fetchone()[0]
+
+    # ---------- 完整指标表 ----------
+    def record_scan(self, timestamp, metrics: List[Dict]):
+        if not metrics:
+            return
+        ts = to_ms(timestamp)
+        # 没有真实 LS 读数的 (ls_ok=False) 存为 NULL, 不把占位值当历史
+        rows = [(m['symbol'], ts, *(None if c == 'ls' and not m.get('ls_ok', True) else m[c]
+                                    for c in METRIC_COLUMNS)) for m in metrics]
+        with self.conn:
+            self.conn.executemany('INSERT OR REPLACE INTO metrics VALUES (?, ?, ?, ?, ?, ?)', rows)
+            if self.history_days:
+                cutoff = ts - self.history_days * 86400 * 1000
+                self.conn.execute('DELETE FROM metrics WHERE ts < ?', (cutoff,))
+                self.conn.execute('DELETE FROM reports WHERE ts < ?',
+                                  (datetime.fromtimestamp(cutoff / 1000).isoformat(),))
+
+    def history(self, symbol: str, since=None, until=None) -> Dict[str, list]:
+        """某个币种的指标历史, 按列返回 {'ts': [...], 'ls': [...], ...}"""
+        since = to_ms(since) if since is not None else 0
+        until = to_ms(until) if until is not None else int(time.time() * 1000) + 1
+        rows = self.conn.execute(
+            f'SELECT ts, {", ".join(METRIC_COLUMNS)} FROM metrics '
+            'WHERE symbol = ? AND ts >= ? AND ts < ? ORDER BY ts', (symbol, since, until)).fetchall()
+        columns = ('ts',) + METRIC_COLUMNS
+        return {c: [r[i] for r in rows] for i, c in enumerate(columns)}
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,85 @@
+"""
+Local cache for daily index series (Coinglass on-chain indicators: STH realized price, MVRV Z).
+
+The full history is downloaded once and kept in .cache/series/<name>.json. Later runs
+only ask for points after the last stored timestamp, and skip the request entirely
+while the newest point is less than a day old. Report statistics (percentile ranks)
+are computed from the cached history, so they cost no extra requests.
+"""
+import bisect
+import math
+import time
+
+from local_cache import cache_path, read_json, atomic_write_json
+
+DAY_MS = 86400 * 1000
+TIME_KEYS = ('t', 'time', 'timestamp', 'date')
+VALUE_KEYS = ('v', 'value')
+
+
+def parse_points(series, value_key=None):
+    """Coinglass series ([t, v] pairs or dicts) -> sorted [(ts_ms, value)]; timestamps in s or ms"""
+    points = {}
+    for p in series or []:
+        if isinstance(p, dict):
+            t = next((p[k] for k in TIME_KEYS if k in p), None)
+            v = p.get(value_key) if value_key else next((p[k] for k in VALUE_KEYS if k in p), None)
+        elif isinstance(p, (list, tuple)) and len(p) >= 2:
+            t, v = p[0], p[1]
+        else:
+            continue
+        try:
+            t, v = int(float(t)), float(v)
+        except (TypeError, ValueError):
+            continue
+        if math.isnan(v):
+            continue
+        points[t * 1000 if t < 10 ** 12 else t] = v
+    return sorted(points.items())
+
+
+class SeriesCache:
+    def __init__(self, name, path=None, refresh_after=DAY_MS):
+        self.name = name
+        self.path = path or cache_path('series', f"{name}.json")
+        self.refresh_after = refresh_after
+        self.points = [tuple(p) for p in (read_json(self.path, {}) or {}).get('points', [])]
+
+    @property
+    def last_ts(self):
+        return self.points[-1][0] if self.points else None
+
+    def update(self, fetch, now_ms=None):
+        """
+        fetch(start_ms or None) -> raw series (None on failure).
+        Returns the number of new points; 0 without a request while the cache is fresh.
+        """
+        now_ms = now_ms or int(time.time() * 1000)
+        if self.last_ts is not None and now_ms - self.last_ts < self.refresh_after:
+            return 0
+        raw = fetch(self.last_ts + 1 if self.last_ts is not None else None)
+        new = [p for p in parse_points(raw) if self.last_ts is None or p[0] > self.last_ts]
+        if new:
+            self.points.extend(new)
+            self.save()
+        return len(new)
+
+    def save(self):
+        atomic_write_json(self.path, {'name': self.name, 'points': self.points})
+
+    def values(self, since_ms=None):
+        if since_ms is None:
+            return [v for _, v in self.points]
+        return [v for t, v in self.points if t >= since_ms]
+
+    def latest(self):
+        return self.points[-1][1] if self.points else None
+
+
+def percentile_rank(values, x):
+    """Share of values <= x, in % (0-100); None for an empty history"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return bisect.bisect_right(ordered, x) / len(ordered) * 100
+
@@ -0,0 +1,42 @@
+import time
+from btc_monitor import gather_sources, rank_alts
+
+
+def test_sources_run_concurrently_with_deadlines():
+    def slow(v, delay):
+        def fn():
+            time.sleep(delay)
+            return v
+        return fn
+
+    def broken():
+        raise RuntimeError("boom")
+
+    start = time.monotonic()
+    res = gather_sources({
+        'a': slow(1, 0.3),
+        'b': slow(2, 0.3),
+        'late': slow(3, 2.0),
+        'broken': broken,
+    }, {'a': 1, 'b': 1, 'late': 0.5, 'broken': 1})
+    elapsed = time.monotonic() - start
+
+    assert res == {'a': 1, 'b': 2, 'late': None, 'broken': None}
+    # slowest on-time source (0.3s) / late deadline (0.5s), not the sum of all sources
+    assert elapsed < 1.0
+
+
+def test_alts_ranked_within_perp_universe():
+    tickers = [{'symbol': s, 'quoteVolume': str(v)} for s, v in [
+        ('BTCUSDT', 900), ('BTCUSDT_250627', 800), ('OLDUSDT', 700), ('SOLUSDT', 500), ('DOGEUSDT', 600)]]
+    universe = ['BTCUSDT', 'SOLUSDT', 'DOGEUSDT', 'XRPUSDT']
+    # quarterlies and delisted symbols never take a slot in the top-N
+    assert rank_alts(tickers, universe, limit=2) == ['DOGEUSDT', 'SOLUSDT']
+    # without the universe (exchangeInfo unavailable) the ticker list is used as is
+    assert rank_alts(tickers, None, limit=2) == ['BTCUSDT_250627', 'OLDUSDT']
+
+
+if __name__ == "__main__":
+    test_sources_run_concurrently_with_deadlines()
+    test_alts_ranked_within_perp_universe()
+    print("[TEST] btc gather OK")
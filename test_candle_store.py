@@ -0,0 +1,62 @@
+import os
+import tempfile
+from candle_store import DailyCandleStore, DAY_MS
+
+# 2021-01-04 00:00 UTC (Monday)
+T0 = 1609718400000
+
+
+def make_klines(days):
+    return [[T0 + i * DAY_MS, "0", "0", "0", str(100 + i % 37 + i * 0.5), "0", T0 + (i + 1) * DAY_MS - 1]
+            for i in range(days)]
+
+
+def fake_fetch(rows, calls):
+    def fetch(start, limit):
+        calls.append((start, limit))
+        return [r for r in rows if r[0] >= start][:limit]
+    return fetch
+
+
+def test_backfill_matches_naive_means():
+    rows = make_klines(1500)
+    now = T0 + 1500 * DAY_MS - 5   # last row still forming
+    with tempfile.TemporaryDirectory() as d:
+        calls = []
+        store = DailyCandleStore(path=os.path.join(d, 'c.json'))
+        store.update(fake_fetch(rows, calls), now_ms=now)
+
+        closes = [float(r[4]) for r in rows[:-1]]
+        for w in (111, 200, 350):
+            assert abs(store.ma(w) - sum(closes[-w:]) / w) < 1e-6
+        sundays = [float(r[4]) for r in rows[:-1] if (r[0] // DAY_MS + 3) % 7 == 6]
+        assert abs(store.weekly_ma(200) - sum(sundays[-200:]) / 200) < 1e-6
+        assert len(calls) == 2   # 1407-day backfill = 2 pages
+
+
+def test_incremental_update_and_restart():
+    rows = make_klines(1500)
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, 'c.json')
+        store = DailyCandleStore(path=path)
+        store.update(fake_fetch(rows, []), now_ms=T0 + 1490 * DAY_MS)
+        store.save()
+
+        # after a restart only the newly closed candle is fetched
+        calls = []
+        store = DailyCandleStore(path=path)
+        assert store.update(fake_fetch(rows, calls), now_ms=T0 + 1491 * DAY_MS) == 1
+        assert calls == [(T0 + 1490 * DAY_MS, 2)]
+        closes = [float(r[4]) for r in rows[:1491]]
+        assert abs(store.ma(350) - sum(closes[-350:]) / 350) < 1e-6
+
+        # no new closed candle yet: no request
+        calls = []
+        assert store.update(fake_fetch(rows, calls), now_ms=T0 + 1491 * DAY_MS + 3600_000) == 0
+        assert calls == []
+
+
+if __name__ == "__main__":
+    test_backfill_matches_naive_means()
+    test_incremental_update_and_restart()
+    print("[TEST] candle_store OK")
@@ -0,0 +1,119 @@
+import os
+import json
+import time
+import tempfile
+from urllib.parse import urlencode
+from coinalyze_batch import CoinalyzeBatcher, pack_symbols, MAX_QUERY_LEN, EMPTY_AFTER, MAX_COUNT_TTL
+
+
+class FakeFetcher:
+    """替身: 超过 cap 个币种返回 414; DEADUSDT 永远没有数据, missing 里的只在对应接口没有数据"""
+    def __init__(self, cap=None, missing=None, status=414):
+        self.cap = cap
+        self.status = status
+        self.missing = missing or {}
+        self.calls = []
+        self.last_status = None
+
+    def coinalyze_get(self, endpoint, params, timeout=15):
+        symbols = params['symbols'].split(',')
+        self.calls.append((endpoint, len(symbols)))
+        if self.cap and len(symbols) > self.cap:
+            self.last_status = self.status
+            return None
+        return [{'symbol': s, 'value': 1.0} for s in symbols
+                if s != 'DEADUSDT_PERP.A' and s not in self.missing.get(endpoint, ())]
+
+
+def symbols(n):
+    return [f"C{i}USDT_PERP.A" for i in range(n)]
+
+
+def test_pack_respects_encoded_length():
+    batches = pack_symbols(symbols(500))
+    assert sum(len(b) for b in batches) == 500
+    assert all(len(urlencode({'symbols': ','.join(b)})) - len('symbols=') <= MAX_QUERY_LEN for b in batches)
+    assert len(batches) == 3         # 旧逻辑固定 100 个一批需要 5 次
+
+
+def test_merge_split_and_skip_empty_markets():
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, 'markets.json')
+        syms = symbols(150) + ['DEADUSDT_PERP.A']
+        b = CoinalyzeBatcher(FakeFetcher(cap=60), path=path)
+        res = b.fetch({'open-interest': syms, 'funding-rate': syms[:10] + syms[:10]})
+        assert len(res['open-interest']) == 150 and len(res['funding-rate']) == 10
+        assert b.max_count <= 60
+        b.save()
+
+        # 之后的运行直接用学到的上限, 不再触发 414
+        for _ in range(EMPTY_AFTER - 1):
+            fetcher = FakeFetcher(cap=60)
+            b = CoinalyzeBatcher(fetcher, path=path)
+            b.fetch({'open-interest': syms})
+            assert all(n <= 60 for _, n in fetcher.calls)
+            b.save()
+        # 连续几次没有数据的市场被跳过
+        b = CoinalyzeBatcher(FakeFetcher(), path=path)
+        assert b.is_skipped('open-interest', 'DEADUSDT_PERP.A')
+        assert not b.is_skipped('open-interest', syms[0])
+
+
+def test_misses_are_counted_per_endpoint():
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, 'markets.json')
+        syms = ['DEADUSDT_PERP.A', 'NOFUNDUSDT_PERP.A', 'OKUSDT_PERP.A']
+        lookups = {'open-interest': syms, 'funding-rate': syms}
+        fetcher = FakeFetcher(missing={'funding-rate': {'NOFUNDUSDT_PERP.A'}})
+        # 两个接口都没有数据的市场: 每次运行每个接口只记一次, 满 EMPTY_AFTER 次才跳过
+        for run in range(EMPTY_AFTER):
+            b = CoinalyzeBatcher(fetcher, path=path)
+            assert not b.is_skipped('open-interest', 'DEADUSDT_PERP.A')
+            res = b.fetch(lookups)
+            # OI 有数据不会清掉 funding 的空记录
+            assert 'NOFUNDUSDT_PERP.A' in res['open-interest']
+            b.save()
+
+        b = CoinalyzeBatcher(fetcher, path=path)
+        assert b.is_skipped('open-interest', 'DEADUSDT_PERP.A') and b.is_skipped('funding-rate', 'DEADUSDT_PERP.A')
+        # 只在 funding 接口跳过, OI 照常请求
+        assert b.is_skipped('funding-rate', 'NOFUNDUSDT_PERP.A')
+        assert not b.is_skipped('open-interest', 'NOFUNDUSDT_PERP.A')
+        res = b.fetch(lookups)
+        assert set(res['open-interest']) == {'NOFUNDUSDT_PERP.A', 'OKUSDT_PERP.A'}
+        assert fetcher.calls[-2:] == [('open-interest', 2), ('funding-rate', 1)]
+
+
+def test_bad_request_and_stale_caps_do_not_shrink_batches():
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, 'markets.json')
+        syms = symbols(150)
+        # 400 是请求本身有问题, 不代表批次太大: 不拆分, 不记上限
+        fetcher = FakeFetcher(cap=60, status=400)
+        b = CoinalyzeBatcher(fetcher, path=path)
+        b.fetch({'open-interest': syms})
+        assert b.max_count is None and len(fetcher.calls) == 1
+        b.save()
+        assert CoinalyzeBatcher(FakeFetcher(), path=path).max_count is None
+
+        # 414 学到的上限在 TTL 内沿用, 过期后重新尝试大批次
+        b = CoinalyzeBatcher(FakeFetcher(cap=60), path=path)
+        b.fetch({'open-interest': syms})
+        b.save()
+        assert CoinalyzeBatcher(FakeFetcher(), path=path).max_count <= 60
+        with open(path) as f:
+            state = json.load(f)
+        state['max_count_at'] = time.time() - MAX_COUNT_TTL - 1
+        with open(path, 'w') as f:
+            json.dump(state, f)
+        fetcher = FakeFetcher()
+        CoinalyzeBatcher(fetcher, path=path).fetch({'open-interest': syms})
+        assert fetcher.calls == [('open-interest', 150)]
+
+
+if __name__ == "__main__":
+    test_pack_respects_encoded_length()
+    test_merge_split_and_skip_empty_markets()
+    test_misses_are_counted_per_endpoint()
+    test_bad_request_and_stale_caps_do_not_shrink_batches()
+    print("[TEST] coinalyze batch OK")
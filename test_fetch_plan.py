@@ -0,0 +1,108 @@
+import asyncio
+from fetch_plan import FetchPlanner, plan_endpoints, naive_endpoints, OI_METRICS
+
+
+def test_greedy_cover_drops_open_interest():
+    # openInterestHist 同时提供当前 OI 和 30 分钟前的 OI
+    assert plan_endpoints(OI_METRICS) == ['oi_hist', 'ls_ratio']
+    assert naive_endpoints(OI_METRICS) == ['open_interest', 'oi_hist', 'ls_ratio']
+    assert plan_endpoints(['funding', 'price_chg']) == ['ticker_24hr', 'premium_index']
+
+
+def test_limits_and_zero_skip():
+    p = FetchPlanner()
+    urls = p.symbol_urls(OI_METRICS, 'BTCUSDT')
+    assert set(urls) == {'oi_hist', 'ls_ratio'} and 'limit=7' in urls['oi_hist']
+    assert p.pruned == 1
+
+    # limit=0: 本地已是最新, 接口跳过
+    urls = p.symbol_urls(OI_METRICS, 'BTCUSDT', limits={'oi_hist': 3, 'ls_ratio': 0})
+    assert list(urls) == ['oi_hist'] and 'limit=3' in urls['oi_hist']
+    assert p.pruned == 3
+
+
+def test_sync_dedup_skips_failures():
+    p = FetchPlanner()
+    calls = []
+
+    def fetch(url):
+        calls.append(url)
+        return None if len(calls) == 1 else {'ok': True}
+
+    assert p.get('u', fetch) is None
+    assert p.get('u', fetch) == {'ok': True} and p.get('u', fetch) == {'ok': True}
+    # 失败的响应不缓存, 成功后不再请求
+    assert len(calls) == 2 and p.saved == 1
+
+
+def test_concurrent_callers_share_one_fetch():
+    p = FetchPlanner()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {'ok': True}
+
+    async def run():
+        return await asyncio.gather(*[p.get_async('u', fetch) for _ in range(5)])
+
+    assert asyncio.run(run()) == [{'ok': True}] * 5
+    assert calls == [1] and p.issued == 1 and p.requested == 5
+    assert 'u' not in p._inflight
+
+
+def test_cancelled_caller_does_not_poison_inflight():
+    p = FetchPlanner()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return {'ok': True}
+
+    async def run():
+        owner = asyncio.ensure_future(p.get_async('u', fetch))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.ensure_future(p.get_async('u', fetch))
+        # 发起请求的一方超时被取消
+        owner.cancel()
+        result = await waiter
+        await asyncio.sleep(0)
+        # 之后的调用直接用缓存, 不会重复请求, 也不会拿到被取消的 Future
+        again = await p.get_async('u', fetch)
+        return owner.cancelled(), result, again
+
+    cancelled, result, again = asyncio.run(run())
+    assert cancelled and result == {'ok': True} and again == {'ok': True}
+    assert calls == [1] and p._inflight == {}
+
+
+def test_failed_fetch_is_retried():
+    p = FetchPlanner()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("boom")
+        return {'ok': True}
+
+    async def run():
+        try:
+            await p.get_async('u', fetch)
+        except RuntimeError:
+            pass
+        return await p.get_async('u', fetch)
+
+    assert asyncio.run(run()) == {'ok': True} and len(calls) == 2
+
+
+if __name__ == "__main__":
+    test_greedy_cover_drops_open_interest()
+    test_limits_and_zero_skip()
+    test_sync_dedup_skips_failures()
+    test_concurrent_callers_share_one_fetch()
+    test_cancelled_caller_does_not_poison_inflight()
+    test_failed_fetch_is_retried()
+    print("[TEST] fetch plan OK")
@@ -0,0 +1,85 @@
+from types import SimpleNamespace
+from firebase_admin import firestore
+from main import FirebaseManager
+
+
+# ==================== 进程内 Firestore 替身 ====================
+class FakeDB:
+    def __init__(self):
+        self.docs = {}        # path -> dict
+        self.round_trips = 0
+        self.reads = 0
+
+    def collection(self, name):
+        return FakeCollection(self, name)
+
+    def apply(self, path, data, merge):
+        """返回 transform 结果 (Increment 后的值)"""
+        current = dict(self.docs.get(path, {})) if merge else {}
+        transforms = []
+        for k, v in data.items():
+            if isinstance(v, firestore.Increment):
+                current[k] = current.get(k, 0) + v.value
+                transforms.append(SimpleNamespace(integer_value=current[k]))
+            else:
+                current[k] = v
+        self.docs[path] = current
+        return transforms
+
+
+class FakeCollection:
+    def __init__(self, db, path):
+        self.db, self.path = db, path
+
+    def document(self, doc_id):
+        return FakeDocument(self.db, f"{self.path}/{doc_id}")
+
+
+class FakeDocument:
+    def __init__(self, db, path):
+        self.db, self.path = db, path
+
+    def get(self):
+        self.db.round_trips += 1
+        self.db.reads += 1
+        data = self.db.docs.get(self.path)
+        return SimpleNamespace(exists=data is not None, to_dict=lambda: dict(data or {}))
+
+    def set(self, data, merge=False):
+        self.db.round_trips += 1
+        return SimpleNamespace(transform_results=self.db.apply(self.path, data, merge))
+
+
+# ==================== 测试 ====================
+def report(i, ls):
+    return {"timestamp": f"2024-01-01T00:{i:02d}:00", "coins": {"BTCUSDT": {"ls_value": ls}}}
+
+
+def test_append_is_one_round_trip_without_reads():
+    db = FakeDB()
+    fb = FirebaseManager(db=db)
+    for i in range(3):
+        before = db.round_trips
+        assert fb.add_report_to_cycle(report(i, 1.0 + i / 10)) == i + 1
+        assert db.round_trips - before == 1
+    assert db.reads == 0
+
+
+def test_cycle_reset_counts_only():
+    db = FakeDB()
+    fb = FirebaseManager(db=db)
+    for i in range(4):
+        n = fb.add_report_to_cycle(report(i, 1.0 + i / 10))
+
+    # 分析期间另一次运行追加的报告属于下一个周期
+    fb.add_report_to_cycle(report(4, 2.0))
+    fb.reset_cycle(n)
+    assert fb.add_report_to_cycle(report(5, 2.1)) == 2
+    # 只有计数器, 不再逐份写报告文档
+    assert list(db.docs) == ['binance_monitor/state']
+
+
+if __name__ == "__main__":
+    test_append_is_one_round_trip_without_reads()
+    test_cycle_reset_counts_only()
+    print("[TEST] firebase cycle OK")
@@ -0,0 +1,133 @@
+import time
+import asyncio
+from hedge import hedged_call
+from host_health import HostHealth
+from main import OIMonitor
+
+
+def path(log, name, delay, result, t0):
+    """请求路径替身: 记录启动时间 / 是否被取消, delay 秒后返回 result"""
+    async def attempt():
+        log.append((name, 'start', time.monotonic() - t0))
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            log.append((name, 'cancelled', time.monotonic() - t0))
+            raise
+        log.append((name, 'done', time.monotonic() - t0))
+        return result
+    return attempt
+
+
+def started(log):
+    return {name: t for name, event, t in log if event == 'start'}
+
+
+def test_stagger_and_cancel_losers():
+    async def run():
+        log, t0 = [], time.monotonic()
+        attempts = [path(log, 'direct', 1.0, 'slow', t0), path(log, 'p1', 0.05, 'fast', t0),
+                    path(log, 'p2', 0.05, 'unused', t0)]
+        result = await hedged_call(attempts, delay=0.2, max_in_flight=3)
+        await asyncio.sleep(0)
+        return result, log, time.monotonic() - t0
+
+    result, log, elapsed = asyncio.run(run())
+    assert result == 'fast'
+    starts = started(log)
+    # 第二条路径在 delay 之后才发出, 第三条来不及发出
+    assert 0.18 < starts['p1'] < 0.3 and 'p2' not in starts
+    assert elapsed < 0.5
+    # 慢的直连被取消, 没有跑完
+    assert ('direct', 'done') not in [(n, e) for n, e, _ in log]
+    assert 'cancelled' in [e for n, e, _ in log if n == 'direct']
+
+
+def test_failed_path_frees_slot_early():
+    async def run():
+        log, t0 = [], time.monotonic()
+        attempts = [path(log, 'direct', 0.02, None, t0), path(log, 'p1', 0.02, 'ok', t0)]
+        return await hedged_call(attempts, delay=1.0, max_in_flight=2), log
+
+    result, log = asyncio.run(run())
+    assert result == 'ok'
+    # 直连失败后立即补上下一条, 不等满 delay
+    assert started(log)['p1'] < 0.2
+
+
+def test_serial_mode_waits_for_each_failure():
+    async def run():
+        log, t0 = [], time.monotonic()
+        attempts = [path(log, f"p{i}", 0.05, None, t0) for i in range(3)]
+        return await hedged_call(attempts, delay=None, max_in_flight=1), log
+
+    result, log = asyncio.run(run())
+    assert result is None
+    # 严格串行: 每条路径都在上一条结束之后才启动
+    events = [(n, e) for n, e, _ in log]
+    assert events == [('p0', 'start'), ('p0', 'done'), ('p1', 'start'), ('p1', 'done'),
+                      ('p2', 'start'), ('p2', 'done')]
+
+
+def test_unhealthy_host_skips_direct_path():
+    calls = []
+
+    async def direct(session, url, host, slot):
+        calls.append('direct')
+        slot.release()
+        return None
+
+    async def proxy(session, url, picker):
+        calls.append('proxy')
+        return {'ok': True} if calls.count('proxy') == 2 else None
+
+    monitor = OIMonitor("TOKEN", "1", hedge_delay=0)
+    monitor.health = HostHealth(failure_threshold=1, probe_interval=3600, state_file=None)
+    monitor._direct_attempt, monitor._proxy_attempt = direct, proxy
+    url = "https://fapi.binance.com/fapi/v1/ping"
+
+    assert asyncio.run(monitor.request_with_retry_async(None, url)) == {'ok': True}
+    assert calls == ['direct', 'proxy', 'proxy']
+
+    # 直连熔断后只走代理 (串行, 第一个失败才换下一个)
+    monitor.health.record_failure("fapi.binance.com", restricted=True)
+    monitor.health._last_probe["fapi.binance.com"] = time.time()
+    calls.clear()
+    assert asyncio.run(monitor.request_with_retry_async(None, url)) == {'ok': True}
+    assert calls == ['proxy', 'proxy']
+
+
+def test_queueing_for_direct_slot_does_not_hedge():
+    proxy_calls = []
+
+    async def get_json(session, url, timeout, proxy=None):
+        await asyncio.sleep(0.05)
+        return 200, {'ok': True}
+
+    async def proxy(session, url, picker):
+        proxy_calls.append(url)
+        return None
+
+    # 主机名额只有 1 个: 直连本身 0.05s 就返回, 但后面的请求要排队到 0.45s, 远超 hedge_delay
+    monitor = OIMonitor("TOKEN", "1", host_concurrency=1, hedge_delay=0.1)
+    monitor.health = HostHealth(state_file=None)
+    monitor._get_json_async, monitor._proxy_attempt = get_json, proxy
+    url = "https://fapi.binance.com/fapi/v1/ping"
+
+    async def run():
+        return await asyncio.gather(*[monitor.request_with_retry_async(None, url) for _ in range(10)])
+
+    start = time.monotonic()
+    assert asyncio.run(run()) == [{'ok': True}] * 10
+    assert 0.45 < time.monotonic() - start < 0.9
+    # 对冲计时从拿到名额后才开始, 排队不会发出代理请求
+    assert proxy_calls == []
+
+
+if __name__ == "__main__":
+    test_stagger_and_cancel_losers()
+    test_failed_path_frees_slot_early()
+    test_serial_mode_waits_for_each_failure()
+    test_unhealthy_host_skips_direct_path()
+    test_queueing_for_direct_slot_does_not_hedge()
+    print("[TEST] hedge OK")
@@ -0,0 +1,106 @@
+import os
+import tempfile
+import threading
+from host_health import HostHealth
+
+HOST = "fapi.binance.com"
+
+
+class Clock:
+    def __init__(self, now=1_700_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def make(clock, **kw):
+    kw.setdefault('state_file', None)
+    return HostHealth(cooldown=900, restricted_cooldown=3600, probe_interval=120, clock=clock, **kw)
+
+
+def test_trips_after_consecutive_failures():
+    clock = Clock()
+    h = make(clock)
+    h.record_failure(HOST)
+    h.record_failure(HOST)
+    assert h.allow_direct(HOST)
+    # 成功清零连续失败计数
+    h.record_success(HOST)
+    for _ in range(2):
+        h.record_failure(HOST)
+    assert h.allow_direct(HOST)
+    h.record_failure(HOST)
+    assert not h.allow_direct(HOST)
+    clock.now += 899
+    assert not h.allow_direct(HOST)
+    clock.now += 2
+    assert h.allow_direct(HOST)
+
+
+def test_restricted_trips_at_once_with_longer_cooldown():
+    clock = Clock()
+    h = make(clock)
+    h.record_failure(HOST, restricted=True)
+    assert not h.allow_direct(HOST)
+    clock.now += 901
+    assert not h.allow_direct(HOST)
+    clock.now += 2700
+    assert h.allow_direct(HOST)
+    # 其他主机不受影响
+    assert h.allow_direct("api.binance.com")
+
+
+def test_probe_reenables_direct():
+    clock = Clock()
+    h = make(clock)
+    h.record_failure(HOST, restricted=True)
+    probes = []
+
+    def probe(ok, done):
+        def run():
+            probes.append(ok)
+            done.set()
+            return ok
+        return run
+
+    # 刚熔断时不探测, 间隔到了才探测
+    h.maybe_probe(HOST, probe(True, threading.Event()))
+    assert probes == []
+    clock.now += 121
+    done = threading.Event()
+    h.maybe_probe(HOST, probe(False, done))
+    assert done.wait(2)
+    assert not h.allow_direct(HOST)
+
+    clock.now += 121
+    done = threading.Event()
+    h.maybe_probe(HOST, probe(True, done))
+    assert done.wait(2)
+    for _ in range(100):
+        if h.allow_direct(HOST):
+            break
+        threading.Event().wait(0.01)
+    assert h.allow_direct(HOST) and probes == [False, True]
+
+
+def test_tripped_state_persists():
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, 'health.json')   # 绝对路径, 不落到 .cache/
+        clock = Clock()
+        make(clock, state_file=path).record_failure(HOST, restricted=True)
+
+        # 下一次运行在冷却期内: 直接走代理
+        assert not make(clock, state_file=path).allow_direct(HOST)
+        # 过期的记录加载时丢弃
+        clock.now += 3601
+        reloaded = make(clock, state_file=path)
+        assert reloaded.allow_direct(HOST) and reloaded._tripped_until == {}
+
+
+if __name__ == "__main__":
+    test_trips_after_consecutive_failures()
+    test_restricted_trips_at_once_with_longer_cooldown()
+    test_probe_reenables_direct()
+    test_tripped_state_persists()
+    print("[TEST] host health OK")
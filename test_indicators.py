@@ -0,0 +1,79 @@
+import os
+import math
+import time
+import tempfile
+
+import numpy as np
+
+from kline_cache import KlinePanel, DAY_MS
+from indicators import sma, rsi, realized_vol, compute, latest_table, overheated
+
+DAY0 = 19000   # UTC day number of the first kline
+
+
+def make_rows(seed, days):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0.001, 0.03, days)))
+    return [[(DAY0 + i) * DAY_MS, c, c * 1.02, c * 0.98, c, 1000.0, (DAY0 + i + 1) * DAY_MS - 1]
+            for i, c in enumerate(close)]
+
+
+def naive_rsi(closes, n=14):
+    gain = loss = None
+    for a, b in zip(closes, closes[1:]):
+        g, l = max(b - a, 0), max(a - b, 0)
+        gain = g if gain is None else gain + (g - gain) / n
+        loss = l if loss is None else loss + (l - loss) / n
+    return 100 - 100 / (1 + gain / loss)
+
+
+def test_vectorized_matches_naive():
+    rows = make_rows(1, 400)
+    closes = [r[4] for r in rows]
+    x = np.array([closes, [math.nan] * 150 + closes[150:]])   # second symbol listed later
+
+    assert abs(sma(x, 200)[0, -1] - sum(closes[-200:]) / 200) < 1e-9
+    assert abs(sma(x, 200)[1, -1] - sum(closes[-200:]) / 200) < 1e-9
+    assert np.isnan(sma(x, 200)[1, 300])     # only 151 candles at that point
+    assert abs(rsi(x)[0, -1] - naive_rsi(closes)) < 1e-9
+
+    rets = [math.log(b / a) for a, b in zip(closes[-31:], closes[-30:])]
+    mean = sum(rets) / 30
+    rv = math.sqrt(sum((r - mean) ** 2 for r in rets) / 29 * 365) * 100
+    assert abs(realized_vol(x)[0, -1] - rv) < 1e-6
+
+
+def test_panel_incremental_and_fast():
+    symbols = [f"C{i}USDT" for i in range(300)]
+    data = {s: make_rows(i, 420) for i, s in enumerate(symbols)}
+    calls = []
+
+    def fetch(sym, start, limit):
+        calls.append((sym, limit))
+        return [r for r in data[sym] if r[0] >= start][:limit]
+
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, 'panel.npz')
+        panel = KlinePanel(days=400, path=path)
+        assert panel.update(symbols, fetch, now_ms=(DAY0 + 410) * DAY_MS + 5) == 300
+        panel.save()
+
+        # next day: one candle per symbol, after reloading from disk
+        calls.clear()
+        panel = KlinePanel(days=400, path=path)
+        assert panel.update(symbols, fetch, now_ms=(DAY0 + 411) * DAY_MS + 5) == 300
+        assert {limit for _, limit in calls} == {2}
+        assert panel['close'][7, -1] == data['C7USDT'][410][4]
+        assert panel.end_day == DAY0 + 410
+
+        cpu = time.process_time()
+        table = latest_table(panel.symbols, compute(panel))
+        overheated(table)
+        assert time.process_time() - cpu < 1.0
+        assert len(table) == 300 and not np.isnan(table['dist_ma200']).any()
+
+
+if __name__ == "__main__":
+    test_vectorized_matches_naive()
+    test_panel_incremental_and_fast()
+    print("[TEST] indicators OK")
@@ -0,0 +1,80 @@
+import os
+import tempfile
+from ls_trend import LSTrendAnalyzer, HOUR_MS
+
+T0 = 1_700_000_000_000
+STEP = HOUR_MS // 2   # 每 30 分钟一次扫描
+
+
+def feed(a, n, values):
+    for k in range(n):
+        a.update_scan(T0 + k * STEP, [{"symbol": s, "ls": f(k)} for s, f in values.items()])
+
+
+def test_slope_recovers_linear_trend():
+    a = LSTrendAnalyzer(path=os.devnull)
+    feed(a, 48, {"UPUSDT": lambda k: 1.0 + 0.05 * k, "FLATUSDT": lambda k: 1.3})
+    up = a.trend("UPUSDT", "24h")
+    assert abs(up['slope'] - 0.1) < 1e-9            # 每小时 +0.1
+    assert up['streak'] == 47 and up['last'] == 1.0 + 0.05 * 47
+    # 状态大小与历史长度无关
+    assert len(a.state["UPUSDT"][4]) == len(a.windows)
+    assert [r['symbol'] for r in a.rising('2h')] == ["UPUSDT"]
+
+
+def test_windows_see_different_horizons():
+    a = LSTrendAnalyzer(path=os.devnull)
+    # 前 24h 下跌, 最近 4h 回升
+    feed(a, 56, {"VUSDT": lambda k: 3.0 - 0.04 * k if k < 48 else 1.08 + 0.1 * (k - 47)})
+    assert a.trend("VUSDT", "2h")['slope'] > 0
+    assert a.trend("VUSDT", "24h")['slope'] < 0
+
+
+def test_state_roundtrip():
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, 'trend.json')
+        a = LSTrendAnalyzer(path=path)
+        feed(a, 10, {"UPUSDT": lambda k: 1.0 + 0.01 * k})
+        a.save()
+        b = LSTrendAnalyzer.load(path=path)
+        assert b.trend("UPUSDT", "7d") == a.trend("UPUSDT", "7d")
+        assert "UPUSDT" in b.generate_report('2h')
+        # 窗口配置变化时丢弃旧状态
+        assert LSTrendAnalyzer.load(windows={'1h': 1}, path=path).state == {}
+
+
+def test_fallback_ls_is_skipped():
+    a = LSTrendAnalyzer(path=os.devnull)
+    feed(a, 6, {"UPUSDT": lambda k: 1.5 + 0.01 * k})
+    before = [list(x) if isinstance(x, list) else x for x in a.state["UPUSDT"]]
+    # 拉取失败/超时的币种带着 ls=1.0 占位值, 不能当成一次暴跌
+    a.update_scan(T0 + 6 * STEP, [{"symbol": "UPUSDT", "ls": 1.0, "ls_ok": False},
+                                  {"symbol": "NEWUSDT", "ls": None, "ls_ok": False}])
+    assert a.state["UPUSDT"] == before and "NEWUSDT" not in a.state
+    a.update_scan(T0 + 7 * STEP, [{"symbol": "UPUSDT", "ls": 1.57, "ls_ok": True}])
+    assert a.trend("UPUSDT", "2h")['streak'] == 6 and a.trend("UPUSDT", "2h")['slope'] > 0
+
+
+def test_report_schedule_is_time_based():
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, 'trend.json')
+        a = LSTrendAnalyzer(path=path)
+        # 第一次运行只开始计时
+        assert not a.report_due(T0, 2)
+        a.save()
+        b = LSTrendAnalyzer.load(path=path)
+        assert not b.report_due(T0 + 3 * STEP, 2)
+        # 启动晚了几分钟的上一次运行不会把报告推迟到下一个 30 分钟
+        assert b.report_due(T0 + 4 * STEP - 5 * 60 * 1000, 2)
+        b.mark_reported(T0 + 4 * STEP)
+        assert not b.report_due(T0 + 5 * STEP, 2)
+        assert b.report_due(T0 + 52 * STEP, 24)
+
+
+if __name__ == "__main__":
+    test_slope_recovers_linear_trend()
+    test_windows_see_different_horizons()
+    test_state_roundtrip()
+    test_fallback_ls_is_skipped()
+    test_report_schedule_is_time_based()
+    print("[TEST] ls trend OK")
@@ -0,0 +1,82 @@
+import os
+import json
+import asyncio
+import tempfile
+from aiohttp import web
+from market_stream import MarketStream, load_snapshot
+
+# 录制的组合流消息 (已精简字段)
+RECORDED_FRAMES = [
+    {"stream": "!ticker@arr", "data": [
+        {"e": "24hrTicker", "E": 1700000000000, "s": "BTCUSDT", "P": "1.25", "c": "37000.1",
+         "o": "36543.2", "h": "37100.0", "l": "36400.0", "v": "120000", "q": "4400000000"},
+        {"e": "24hrTicker", "E": 1700000000000, "s": "ETHUSDT", "P": "-0.50", "c": "2000.5",
+         "o": "2010.5", "h": "2030.0", "l": "1990.0", "v": "900000", "q": "1800000000"},
+    ]},
+    {"stream": "!markPrice@arr@1s", "data": [
+        {"e": "markPriceUpdate", "E": 1700000000500, "s": "BTCUSDT", "p": "37001.0", "i": "36998.0",
+         "r": "0.00010000", "T": 1700006400000},
+        {"e": "markPriceUpdate", "E": 1700000000500, "s": "ETHUSDT", "p": "2000.6", "i": "2000.1",
+         "r": "-0.00020000", "T": 1700006400000},
+    ]},
+    # 只推送有变动的币种: BTC 更新, ETH 保持上一条
+    {"stream": "!ticker@arr", "data": [
+        {"e": "24hrTicker", "E": 1700000001000, "s": "BTCUSDT", "P": "1.30", "c": "37020.0",
+         "o": "36543.2", "h": "37100.0", "l": "36400.0", "v": "120010", "q": "4400400000"},
+    ]},
+]
+
+
+async def replay_server():
+    """本地 WS 服务, 每个连接按顺序回放录制的消息后保持连接"""
+    async def handler(request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        for frame in RECORDED_FRAMES:
+            await ws.send_str(json.dumps(frame))
+            await asyncio.sleep(0.05)
+        await ws.receive()
+        return ws
+
+    app = web.Application()
+    app.router.add_get('/stream', handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"ws://127.0.0.1:{port}/stream"
+
+
+async def run_replay(snapshot_path):
+    runner, url = await replay_server()
+    try:
+        stream = MarketStream(url=url, snapshot_path=snapshot_path, flush_interval=0.1, seed_urls=None)
+        await stream.run(duration=0.6)
+    finally:
+        await runner.cleanup()
+    return stream
+
+
+def test_replay_builds_snapshot():
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, 'snapshot.json')
+        stream = asyncio.run(run_replay(path))
+
+        assert stream.snapshot.tickers['BTCUSDT']['lastPrice'] == "37020.0"
+        assert stream.snapshot.tickers['ETHUSDT']['priceChangePercent'] == "-0.50"
+
+        tickers, premiums = load_snapshot(max_age=60, path=path)
+        by_symbol = {p['symbol']: p for p in premiums}
+        assert {t['symbol'] for t in tickers} == {'BTCUSDT', 'ETHUSDT'}
+        # 字段与 REST premiumIndex 一致, 扫描逻辑可以直接使用
+        assert float(by_symbol['ETHUSDT']['lastFundingRate']) == -0.0002
+        assert all(float(t['quoteVolume']) > 0 for t in tickers)
+
+        # 过期快照不使用
+        assert load_snapshot(max_age=-1, path=path) is None
+
+
+if __name__ == "__main__":
+    test_replay_builds_snapshot()
+    print("[TEST] market_stream replay OK")
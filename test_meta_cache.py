@@ -0,0 +1,44 @@
+import tempfile
+from meta_cache import MetaCache, perp_universe
+
+
+def test_ttl_refresh_ahead_and_stale_fallback():
+    with tempfile.TemporaryDirectory() as d:
+        cache = MetaCache(directory=d)
+        calls = []
+
+        def loader():
+            calls.append(1)
+            return {'v': len(calls)}
+
+        assert cache.get('markets', loader, ttl=60) == {'v': 1}
+        # 热启动: 未过期不请求
+        assert MetaCache(directory=d).get('markets', loader, ttl=60) == {'v': 1}
+        assert len(calls) == 1
+
+        # 接近过期: 先返回旧值, 后台刷新
+        cache = MetaCache(directory=d, refresh_at=0.0)
+        assert cache.get('markets', loader, ttl=60) == {'v': 1}
+        cache.join(5)
+        assert MetaCache(directory=d).get('markets', loader, ttl=60) == {'v': 2}
+
+        # 已过期且拉取失败: 用过期数据
+        assert MetaCache(directory=d).get('markets', lambda: None, ttl=0) == {'v': 2}
+
+
+def test_perp_universe_filters_status_and_contract_type():
+    info = {'symbols': [
+        {'symbol': 'BTCUSDT', 'status': 'TRADING', 'contractType': 'PERPETUAL', 'quoteAsset': 'USDT'},
+        {'symbol': 'BTCUSDT_250328', 'status': 'TRADING', 'contractType': 'CURRENT_QUARTER', 'quoteAsset': 'USDT'},
+        {'symbol': 'OLDUSDT', 'status': 'SETTLING', 'contractType': 'PERPETUAL', 'quoteAsset': 'USDT'},
+        {'symbol': 'ETHUSDC', 'status': 'TRADING', 'contractType': 'PERPETUAL', 'quoteAsset': 'USDC'},
+    ]}
+    assert perp_universe(info) == ['BTCUSDT']
+    assert perp_universe({'code': -1003, 'msg': 'banned'}) == []
+    assert perp_universe(None) is None
+
+
+if __name__ == "__main__":
+    test_ttl_refresh_ahead_and_stale_fallback()
+    test_perp_universe_filters_status_and_contract_type()
+    print("[TEST] meta cache OK")
@@ -0,0 +1,108 @@
+import os
+import asyncio
+import tempfile
+from aiohttp import web
+from notifier import TelegramNotifier, split_message, TG_MAX_LEN
+from outbox import Outbox
+from main import OIMonitor
+
+
+def test_split_on_lines_and_close_fences():
+    text = "\n".join(f"• `COIN{i}USDT`: +{i}.0%" for i in range(600))
+    chunks = split_message(text)
+    assert len(chunks) > 1
+    assert all(len(c) <= TG_MAX_LEN for c in chunks)
+    assert "\n".join(chunks) == text
+
+    fenced = "head\n```\n" + "\n".join("x" * 50 for _ in range(200)) + "\n```\ntail"
+    chunks = split_message(fenced, limit=1000)
+    assert all(len(c) <= 1000 and c.count("```") % 2 == 0 for c in chunks)
+
+    assert all(len(c) <= 100 for c in split_message("y" * 350, limit=100))
+
+
+async def fake_telegram(script):
+    """本地替身: 按 script 依次返回 (状态码, 响应), 记录收到的消息"""
+    received = []
+
+    async def handler(request):
+        body = await request.json()
+        body['_peer'] = request.transport.get_extra_info('peername')
+        received.append(body)
+        status, data = script.pop(0) if script else (200, {"ok": True})
+        if data is None:
+            return web.Response(status=status, body=b'')   # 空 body (例如代理吞掉响应)
+        return web.json_response(data, status=status)
+
+    app = web.Application()
+    app.router.add_post('/botTOKEN/sendMessage', handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}", received
+
+
+def test_fanout_retry_after_and_markdown_fallback():
+    async def run():
+        script = [
+            (429, {"ok": False, "parameters": {"retry_after": 0.2}}),
+            (400, {"ok": False, "description": "Bad Request: can't parse entities"}),
+        ]
+        runner, base, received = await fake_telegram(script)
+        try:
+            async with TelegramNotifier("TOKEN", "1, 2", per_chat_rate=50, api_base=base) as tg:
+                ok = await tg.send("line\n" * 1000)
+        finally:
+            await runner.cleanup()
+        return ok, received
+
+    ok, received = asyncio.run(run())
+    assert ok
+    per_chat = {c: [r['text'] for r in received if r['chat_id'] == c] for c in ('1', '2')}
+    # 每个 chat 都完整收到全部分段 (包括被 429 / 400 打断后重发的)
+    assert "".join(per_chat['1']).count("line") >= 1000 and "".join(per_chat['2']).count("line") >= 1000
+    assert any('parse_mode' not in r for r in received)
+
+
+def test_empty_body_is_retried():
+    async def run():
+        runner, base, received = await fake_telegram([(200, None), (502, None)])
+        try:
+            async with TelegramNotifier("TOKEN", "1", per_chat_rate=50, api_base=base) as tg:
+                ok = await tg.send("hello")
+        finally:
+            await runner.cleanup()
+        return ok, received
+
+    ok, received = asyncio.run(run())
+    assert ok and [r['text'] for r in received] == ["hello"] * 3
+
+
+def test_monitor_sends_reuse_one_connection():
+    with tempfile.TemporaryDirectory() as d:
+        monitor = OIMonitor("TOKEN", "1")
+        monitor.outbox = Outbox(os.path.join(d, 'outbox.jsonl'))
+        # 替身服务跑在 monitor 自己的事件循环上
+        runner, base, received = monitor.run(fake_telegram([]))
+        monitor.notifier.api_base = base
+        monitor.notifier.per_chat_rate = 50
+        try:
+            assert monitor.send_telegram("oi report")
+            assert monitor.send_telegram("trend report")
+        finally:
+            monitor.run(runner.cleanup())
+            monitor.close()
+        # 两次推送走同一个 TCP 连接, 不是每次重新握手
+        assert [r['text'] for r in received] == ["oi report", "trend report"]
+        assert received[0]['_peer'] == received[1]['_peer']
+        assert monitor.notifier._session is None
+
+
+if __name__ == "__main__":
+    test_split_on_lines_and_close_fences()
+    test_fanout_retry_after_and_markdown_fallback()
+    test_empty_body_is_retried()
+    test_monitor_sends_reuse_one_connection()
+    print("[TEST] notifier OK")
@@ -0,0 +1,65 @@
+import tempfile
+from oi_store import OISeriesStore, MINUTE_MS
+
+T0 = 1_700_000_100_000 // (5 * MINUTE_MS) * (5 * MINUTE_MS)
+BAR = 5 * MINUTE_MS
+
+
+def oi_rows(start, n, base=100.0):
+    return [{"timestamp": start + i * BAR, "sumOpenInterest": str(base + i)} for i in range(n)]
+
+
+def test_incremental_fetch_limits():
+    with tempfile.TemporaryDirectory() as d:
+        store = OISeriesStore(directory=d)
+        # 本地没有数据: 首次拉取根数
+        assert store.fetch_limits("BTCUSDT", now_ms=T0) == {'oi_hist': 7, 'ls_ratio': 1}
+        store.ingest("BTCUSDT", 'oi', oi_rows(T0 - 6 * BAR, 7))
+        # 最新一根还在当前周期内: 不请求
+        assert store.fetch_limit("BTCUSDT", 'oi', now_ms=T0 + BAR - 1) == 0
+        # 缺 3 根: 多拉 1 根与本地重叠
+        assert store.fetch_limit("BTCUSDT", 'oi', now_ms=T0 + 3 * BAR) == 4
+        assert store.fetch_limit("BTCUSDT", 'oi', now_ms=T0 + 10_000 * BAR) == 500
+
+        # 重叠的一根视为修订, 只追加更新的
+        assert store.ingest("BTCUSDT", 'oi', oi_rows(T0, 4, base=106.5)) == 3
+        assert len(store.series("BTCUSDT", 'oi')) == 10
+        assert store.series("BTCUSDT", 'oi').value_at(T0, tolerance=0) == 106.5
+
+        assert store.save() == 1
+        reloaded = OISeriesStore(directory=d)
+        assert list(reloaded.series("BTCUSDT", 'oi').val) == list(store.series("BTCUSDT", 'oi').val)
+
+
+def test_ring_buffer_drops_oldest():
+    with tempfile.TemporaryDirectory() as d:
+        store = OISeriesStore(directory=d, capacity=12)
+        store.ingest("ETHUSDT", 'oi', oi_rows(T0, 10))
+        store.ingest("ETHUSDT", 'oi', oi_rows(T0 + 10 * BAR, 5, base=110.0))
+        s = store.series("ETHUSDT", 'oi')
+        assert len(s) == 12
+        assert s.ts[0] == T0 + 3 * BAR and s.val[-1] == 114.0
+        # 容量在重新加载后仍然生效
+        store.save()
+        s = OISeriesStore(directory=d, capacity=12).series("ETHUSDT", 'oi')
+        assert len(s) == 12 and s.ts[-1] == T0 + 14 * BAR
+
+
+def test_growth_rejects_stale_series():
+    with tempfile.TemporaryDirectory() as d:
+        store = OISeriesStore(directory=d)
+        store.ingest("SOLUSDT", 'oi', oi_rows(T0, 7))
+        last = T0 + 6 * BAR
+        oi_now, growth = store.oi_growth("SOLUSDT", minutes=30, now_ms=last + MINUTE_MS)
+        assert oi_now == 106.0 and abs(growth - 6.0) < 1e-9
+        # 拉取失败, 本地最新一根已是几天前: 不能当作当前增长
+        assert store.oi_growth("SOLUSDT", minutes=30, now_ms=last + 3 * 86400 * 1000) is None
+        assert store.oi_growth("SOLUSDT", minutes=30, now_ms=last + 2 * BAR + 1) is None
+        assert store.oi_growth("MISSINGUSDT", now_ms=last) is None
+
+
+if __name__ == "__main__":
+    test_incremental_fetch_limits()
+    test_ring_buffer_drops_oldest()
+    test_growth_rejects_stale_series()
+    print("[TEST] oi store OK")
@@ -0,0 +1,95 @@
+import os
+import asyncio
+import tempfile
+from aiohttp import web
+import btc_monitor
+from outbox import Outbox
+
+
+def test_retry_backoff_and_restart_flush():
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, 'outbox.jsonl')
+        box = Outbox(path, base_delay=0.05)
+        calls = []
+
+        def flaky(dest, payload):
+            calls.append(payload['text'])
+            return len(calls) > 2          # 前两次失败
+
+        assert box.enqueue('telegram', 'chat1', {'text': 'a'}, key='k1')
+        assert box.enqueue('telegram', 'chat1', {'text': 'b'}, key='k2')
+        assert not box.enqueue('telegram', 'chat1', {'text': 'a'}, key='k1')   # 幂等键去重
+        assert asyncio.run(box.flush({'telegram': flaky}, wait=5)) == 0
+        # 同一目的地按顺序投递: a 成功之前 b 不会被发送
+        assert calls == ['a', 'a', 'a', 'b']
+
+        # 重启后已发送的键仍然去重
+        box = Outbox(path)
+        assert not box.enqueue('telegram', 'chat1', {'text': 'a'}, key='k1')
+
+
+def test_pending_survive_restart():
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, 'outbox.jsonl')
+        box = Outbox(path, base_delay=60)
+        box.enqueue('discord', 'webhook', {'embeds': [1]})
+        assert asyncio.run(box.flush({'discord': lambda dest, p: False}, wait=0)) == 1
+
+        # 下次启动: 遗留消息不用等退避到期, 立即补发
+        box = Outbox(path, base_delay=60)
+        assert len(box.pending()) == 1
+
+        async def ok(dest, payload):
+            return True
+        assert asyncio.run(box.flush({'discord': ok}, wait=0)) == 0
+        assert Outbox(path).pending() == []
+
+
+def test_discord_sender_honours_retry_after_off_loop():
+    with tempfile.TemporaryDirectory() as d:
+        box = Outbox(os.path.join(d, 'outbox.jsonl'))
+        box.enqueue('discord', 'webhook', {'embeds': [1]})
+        hits = []
+
+        async def webhook(request):
+            hits.append(asyncio.get_running_loop().time())
+            if len(hits) == 1:
+                return web.json_response({'message': 'You are being rate limited.', 'retry_after': 0.3}, status=429)
+            await asyncio.sleep(0.2)
+            return web.Response(status=204)
+
+        async def run():
+            app = web.Application()
+            app.router.add_post('/hook', webhook)
+            runner = web.AppRunner(app)
+            await runner.setup()
+            site = web.TCPSite(runner, '127.0.0.1', 0)
+            await site.start()
+            original, btc_monitor.DISCORD_WEBHOOK_URL = btc_monitor.DISCORD_WEBHOOK_URL, f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/hook"
+            ticks = 0
+
+            async def heartbeat():
+                nonlocal ticks
+                for _ in range(20):
+                    await asyncio.sleep(0.02)
+                    ticks += 1
+            try:
+                # 替身服务与发件箱在同一个事件循环上: 阻塞的 POST 会让它无法应答
+                left, _ = await asyncio.gather(
+                    box.flush({'discord': btc_monitor.BtcMonitor._post_discord}, wait=0), heartbeat())
+            finally:
+                btc_monitor.DISCORD_WEBHOOK_URL = original
+                await runner.cleanup()
+            return left, ticks
+
+        left, ticks = asyncio.run(run())
+        # 429 后等 retry_after 再发, 同一次投递内成功, 不消耗发件箱的退避
+        assert left == 0 and len(hits) == 2 and hits[1] - hits[0] >= 0.3
+        assert ticks == 20 and box.entries[next(iter(box.entries))]['attempts'] == 1
+
+
+if __name__ == "__main__":
+    test_retry_backoff_and_restart_flush()
+    test_pending_survive_restart()
+    test_discord_sender_honours_retry_after_off_loop()
+    print("[TEST] outbox OK")
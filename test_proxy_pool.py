@@ -0,0 +1,120 @@
+import os
+import time
+import asyncio
+import tempfile
+import threading
+from proxy_pool import ProxyPool, parse_proxy_line
+
+
+def make_pool(d, good=(), sources=('src1', 'src2'), delay=0, **kw):
+    """代理源 / 验证都换成替身: src1 给 p0..p9, src2 给 p5..p14; good 里的验证通过"""
+    pool = ProxyPool(cache_file=os.path.join(d, 'pool.json'), sources=list(sources), ttl=3600, **kw)
+    listed = {'src1': [f"http://p{i}:80" for i in range(10)], 'src2': [f"http://p{i}:80" for i in range(5, 15)]}
+    pool.validated = []
+    lock = threading.Lock()
+
+    def validate(proxy):
+        time.sleep(delay)
+        with lock:
+            pool.validated.append(proxy)
+        return proxy, proxy in good, 0.1
+
+    pool._fetch_source = lambda url: listed.get(url, [])
+    pool._validate = validate
+    return pool
+
+
+def test_parse_proxy_line():
+    assert parse_proxy_line("1.2.3.4:8080 US") == "http://1.2.3.4:8080"
+    assert parse_proxy_line("garbage") is None
+
+
+def test_ranking_and_failure_streak():
+    with tempfile.TemporaryDirectory() as d:
+        pool = make_pool(d)
+        pool._loaded = True
+        pool.record('fast', True, 0.2)
+        pool.record('slow', True, 2.0)
+        pool.record('flaky', True, 0.2)
+        pool.record('flaky', False)
+        assert pool.best() == ['fast', 'flaky', 'slow']
+        # 连续失败 3 次的不再返回, 成功一次后恢复
+        for _ in range(2):
+            pool.record('flaky', False)
+        assert pool.best() == ['fast', 'slow']
+        pool.record('flaky', True, 0.2)
+        assert 'flaky' in pool.best()
+        # 轮询按排名
+        assert [pool.get_next() for _ in range(4)] == ['fast', 'flaky', 'slow', 'fast']
+
+
+def test_refresh_stops_after_target_size():
+    with tempfile.TemporaryDirectory() as d:
+        good = {f"http://p{i}:80" for i in range(15)}
+        pool = make_pool(d, good=good, target_size=3, workers=1, delay=0.05)
+        pool.refresh()
+        # 两个源去重后 15 个候选, 验证出 3 个就提前结束
+        assert len(pool.best()) == 3
+        time.sleep(0.2)
+        # 剩下排队的验证被取消 (最多还有一个已在途)
+        assert len(pool.validated) <= 4
+        assert len(set(pool.validated)) == len(pool.validated)
+
+
+def test_cache_ttl_skips_refresh():
+    with tempfile.TemporaryDirectory() as d:
+        good = {f"http://p{i}:80" for i in range(6)}
+        pool = make_pool(d, good=good, target_size=6)
+        pool.ensure()
+        assert pool.validated and len(pool.best()) == 6
+        pool.save()
+
+        # TTL 内且可用代理够多: 直接用缓存, 不再拉取验证
+        cached = make_pool(d, good=good, target_size=6)
+        assert cached.best() == pool.best() and cached.validated == []
+
+        # 缓存过期: 重新刷新
+        expired = make_pool(d, good=good, target_size=6)
+        expired.ttl = 0
+        expired.ensure()
+        assert expired.validated and len(expired.best()) == 6
+
+
+def test_async_callers_share_one_refresh():
+    with tempfile.TemporaryDirectory() as d:
+        pool = make_pool(d, good={"http://p1:80"})
+        refreshes = []
+        original = pool.refresh
+
+        def slow_refresh():
+            refreshes.append(1)
+            time.sleep(0.3)
+            original()
+
+        pool.refresh = slow_refresh
+
+        async def run():
+            ticks = 0
+
+            async def heartbeat():
+                nonlocal ticks
+                for _ in range(5):
+                    await asyncio.sleep(0.02)
+                    ticks += 1
+
+            results = await asyncio.gather(pool.get_next_async(), pool.best_async(), heartbeat())
+            return results, ticks
+
+        (first, best, _), ticks = asyncio.run(run())
+        # 刷新期间事件循环照常运行, 两个调用方只触发一次刷新
+        assert ticks == 5 and refreshes == [1]
+        assert first == "http://p1:80" and best == ["http://p1:80"]
+
+
+if __name__ == "__main__":
+    test_parse_proxy_line()
+    test_ranking_and_failure_streak()
+    test_refresh_stops_after_target_size()
+    test_cache_ttl_skips_refresh()
+    test_async_callers_share_one_refresh()
+    print("[TEST] proxy pool OK")
@@ -0,0 +1,147 @@
+import time
+import asyncio
+from rate_limit import SlidingWindowLimiter, BinanceWeightScheduler
+from host_health import HostHealth
+from main import OIMonitor
+
+TICKERS = "https://fapi.binance.com/fapi/v1/ticker/24hr"
+OI_HIST = "https://fapi.binance.com/futures/data/openInterestHist?symbol=BTCUSDT&period=5m&limit=7"
+
+
+def test_sliding_window_allows_burst_then_waits():
+    limiter = SlidingWindowLimiter(limit=40, window=60)
+    waits = [limiter.reserve() for _ in range(45)]
+    # 额度内连发, 不需要等待
+    assert all(w == 0 for w in waits[:40])
+    # 超出部分等最早的请求滑出窗口
+    assert all(59 < w <= 60 for w in waits[40:])
+
+
+def test_retry_after_pauses_everyone():
+    limiter = SlidingWindowLimiter(limit=40, window=60)
+    limiter.reserve()
+    limiter.pause(5)
+    assert 4.9 < limiter.reserve() <= 5
+
+
+def test_binance_weight_reservation():
+    s = BinanceWeightScheduler()
+    assert s.weight(TICKERS) == 40 and s.weight(TICKERS + "?symbol=BTCUSDT") == 1
+    assert s.weight("https://fapi.binance.com/fapi/v1/klines?symbol=BTCUSDT&limit=500") == 5
+    # 容量 240 (2400 * 0.1): 6 次全市场 ticker 不用等, 之后按 36 权重/秒 补充
+    assert [s.reserve(TICKERS) for _ in range(6)] == [0.0] * 6
+    assert 1.0 < s.reserve(TICKERS) <= 40 / 36
+    # /futures/data 是独立的桶
+    assert s.reserve(OI_HIST) == 0.0
+
+
+def test_used_weight_header_clamps_direct_only():
+    s = BinanceWeightScheduler()
+    # 经代理的响应头是代理 IP 的额度, 不影响本机的桶
+    s.observe(TICKERS, 200, {'X-MBX-USED-WEIGHT-1M': '2150'}, direct=False)
+    assert s.reserve(TICKERS) == 0.0
+    # 直连: 服务端说已用 2150, 剩余 2160 - 2150 = 10
+    s = BinanceWeightScheduler()
+    s.observe(TICKERS, 200, {'X-MBX-USED-WEIGHT-1M': '2150'})
+    assert 0.8 < s.reserve(TICKERS) <= 30 / 36
+    # 服务端用量比本地估计少时不放宽
+    s = BinanceWeightScheduler()
+    s.observe(TICKERS, 200, {'X-MBX-USED-WEIGHT-1M': '0'})
+    assert [s.reserve(TICKERS) for _ in range(6)] == [0.0] * 6 and s.reserve(TICKERS) > 1.0
+
+
+def test_binance_retry_after_pauses_family():
+    s = BinanceWeightScheduler()
+    s.observe(OI_HIST, 429, {'Retry-After': '7'}, direct=False)
+    assert s.reserve(OI_HIST) == 0.0
+    s.observe(OI_HIST, 429, {'Retry-After': '7'})
+    assert 6.9 < s.reserve(OI_HIST) <= 7
+    assert s.reserve(TICKERS) == 0.0
+    # 418 没有 Retry-After 时至少退避 2 分钟
+    s.observe(TICKERS, 418, {})
+    assert 119 < s.reserve(TICKERS) <= 120
+
+
+def test_cancelled_wait_is_refunded():
+    s = BinanceWeightScheduler()
+    for _ in range(6):
+        s.reserve(TICKERS)
+
+    async def run():
+        task = asyncio.ensure_future(s.acquire_async(TICKERS))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(run())
+    # 被取消的请求没有发出, 预占的 40 退还: 下一次只需等桶补满 40
+    assert s.reserve(TICKERS) <= 40 / 36
+
+
+def test_only_direct_requests_reserve_weight():
+    monitor = OIMonitor("TOKEN", "1", hedge_delay=0)
+    monitor.health = HostHealth(state_file=None)
+    bucket = monitor.limiter.buckets['fapi']
+    sent = []
+
+    async def get_json(session, url, timeout, proxy=None):
+        sent.append(proxy)
+        return (200, {'ok': True}) if proxy else (451, None)
+
+    monitor._get_json_async = get_json
+    monitor.proxies = [{'http': 'http://p1:80', 'https': 'http://p1:80'}]
+    monitor.proxy_pool.record = lambda *a, **kw: None
+
+    before = bucket.tokens
+    assert asyncio.run(monitor.request_with_retry_async(None, TICKERS)) == {'ok': True}
+    assert sent == [None, 'http://p1:80']
+    # 只有直连那一次占了 40, 代理请求不占本机额度
+    assert before - 40 - 0.5 < bucket.tokens <= before - 40 + 0.5
+
+    # 直连熔断时全部走代理, 不占权重
+    before = bucket.tokens
+    assert asyncio.run(monitor.request_with_retry_async(None, TICKERS)) == {'ok': True}
+    assert abs(bucket.tokens - before) < 0.5
+
+
+def test_cancelled_before_send_refunds_direct_slot():
+    monitor = OIMonitor("TOKEN", "1", host_concurrency=1, hedge_delay=0)
+    monitor.health = HostHealth(state_file=None)
+    bucket = monitor.limiter.buckets['fapi']
+
+    async def get_json(session, url, timeout, proxy=None):
+        await asyncio.sleep(0.3)
+        return 200, {'ok': True}
+
+    monitor._get_json_async = get_json
+
+    async def run():
+        first = asyncio.ensure_future(monitor.request_with_retry_async(None, TICKERS))
+        await asyncio.sleep(0.01)
+        before = bucket.tokens
+        # 第二个请求排队等主机名额时超时取消: 没有发出, 权重退还
+        try:
+            await asyncio.wait_for(monitor.request_with_retry_async(None, TICKERS), timeout=0.1)
+        except asyncio.TimeoutError:
+            pass
+        after = bucket.tokens
+        await first
+        return before, after
+
+    before, after = asyncio.run(run())
+    assert abs(after - before) < 0.5 * 36 * 0.2 + 1
+
+
+if __name__ == "__main__":
+    test_sliding_window_allows_burst_then_waits()
+    test_retry_after_pauses_everyone()
+    test_binance_weight_reservation()
+    test_used_weight_header_clamps_direct_only()
+    test_binance_retry_after_pauses_family()
+    test_cancelled_wait_is_refunded()
+    test_only_direct_requests_reserve_weight()
+    test_cancelled_before_send_refunds_direct_slot()
+    print("[TEST] rate limit OK")
@@ -0,0 +1,76 @@
+import os
+import time
+import tempfile
+from scan_store import ScanStore, SQLiteScanStore
+
+
+def metrics(n, ls):
+    return [{"symbol": f"C{i}USDT", "price_chg": 1.0, "oi_chg": 2.0, "ls": ls + i, "funding": 0.01}
+            for i in range(n)]
+
+
+def test_cycle_counter_and_reset():
+    with tempfile.TemporaryDirectory() as d:
+        store = SQLiteScanStore(os.path.join(d, 'h.sqlite'))
+        for i in range(4):
+            n = store.add_report_to_cycle({"timestamp": f"2024-01-01T00:{i:02d}:00", "coins": {}})
+        assert n == 4
+        assert store.conn.execute('SELECT COUNT(*) FROM reports').fetchone()[0] == 4
+        store.add_report_to_cycle({"timestamp": "2024-01-01T00:04:00", "coins": {}})
+        store.reset_cycle(n)
+        assert store.add_report_to_cycle({"timestamp": "2024-01-01T00:05:00", "coins": {}}) == 2
+        store.close()
+
+
+def test_history_query_and_retention():
+    with tempfile.TemporaryDirectory() as d:
+        store = SQLiteScanStore(os.path.join(d, 'h.sqlite'), history_days=1)
+        now = int(time.time() * 1000)
+        # 两天内每 30 分钟一次扫描, 500 个币种
+        for k in range(96, -1, -1):
+            store.record_scan(now - k * 30 * 60 * 1000, metrics(500, k / 100))
+
+        h = store.history('C7USDT')
+        assert len(h['ts']) == 49                        # 超过 1 天的已清理
+        assert h['ts'] == sorted(h['ts'])
+        assert h['ls'][-1] == 7.0
+
+        start = time.perf_counter()
+        h = store.history('C7USDT', since=now - 6 * 3600 * 1000)
+        assert len(h['ls']) == 13                       # 含两端
+        assert time.perf_counter() - start < 0.05
+        store.close()
+
+
+def test_fallback_ls_stored_as_null():
+    with tempfile.TemporaryDirectory() as d:
+        store = SQLiteScanStore(os.path.join(d, 'h.sqlite'))
+        now = int(time.time() * 1000)
+        rows = metrics(2, 1.5)
+        rows[1].update(ls=1.0, ls_ok=False)
+        store.record_scan(now, rows)
+        assert store.history('C0USDT')['ls'] == [1.5]
+        assert store.history('C1USDT')['ls'] == [None]
+        store.close()
+
+
+def test_interface_is_abstract():
+    class Partial(ScanStore):
+        def add_report_to_cycle(self, report):
+            return 1
+
+    try:
+        Partial()
+    except TypeError:
+        pass
+    else:
+        raise AssertionError("a backend without reset_cycle must not be instantiable")
+    assert not hasattr(ScanStore, 'history')
+
+
+if __name__ == "__main__":
+    test_cycle_counter_and_reset()
+    test_history_query_and_retention()
+    test_fallback_ls_stored_as_null()
+    test_interface_is_abstract()
+    print("[TEST] scan store OK")
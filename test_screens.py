@@ -0,0 +1,44 @@
+import random
+from screens import MetricTable, run_screens, OI_SCREENS
+
+
+def legacy_screens(all_metrics):
+    """改成声明式规则之前 main.py / local_scan.py 里的列表推导式"""
+    return {
+        'accumulation': [d for d in all_metrics if -2 < d['price_chg'] < 5 and d['oi_chg'] > 1.5 and d['ls'] > 1.2],
+        'top_oi': sorted(all_metrics, key=lambda x: x['oi_chg'], reverse=True)[:5],
+        'ext_neg': sorted([d for d in all_metrics if d['funding'] < 0], key=lambda x: x['funding'])[:3],
+        'ext_pos': sorted([d for d in all_metrics if d['funding'] > 0], key=lambda x: x['funding'], reverse=True)[:3],
+    }
+
+
+def fixture(n, seed):
+    rng = random.Random(seed)
+    # 取值很粗, 制造大量并列和恰好落在阈值上的点
+    return [{
+        "symbol": f"C{i}USDT",
+        "price_chg": rng.choice([-2.0, -1.0, 0.0, 4.5, 5.0, 8.0]),
+        "oi_chg": rng.choice([0.0, 1.5, 2.0, 2.0, 3.0, 7.5]),
+        "ls": rng.choice([1.0, 1.2, 1.21, 2.0]),
+        "funding": rng.choice([-0.05, -0.01, 0.0, 0.01, 0.01, 0.1]),
+    } for i in range(n)]
+
+
+def test_matches_legacy_lists_and_tie_order():
+    for seed in range(20):
+        metrics = fixture(200, seed)
+        hits = run_screens(MetricTable.from_records(metrics), OI_SCREENS)
+        for name, expected in legacy_screens(metrics).items():
+            assert hits[name] == expected, (seed, name)
+
+
+def test_empty_and_small_scans():
+    for metrics in ([], fixture(2, 0)):
+        hits = run_screens(MetricTable.from_records(metrics), OI_SCREENS)
+        assert hits == legacy_screens(metrics)
+
+
+if __name__ == "__main__":
+    test_matches_legacy_lists_and_tie_order()
+    test_empty_and_small_scans()
+    print("[TEST] screens OK")
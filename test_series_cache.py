@@ -0,0 +1,45 @@
+import os
+import tempfile
+from series_cache import SeriesCache, parse_points, percentile_rank, DAY_MS
+
+T0 = 1700000000000 // DAY_MS * DAY_MS
+
+
+def test_parse_formats():
+    assert parse_points([[T0 // 1000, "1.5"], {'t': T0 + DAY_MS, 'v': 2}, {'time': T0, 'value': 3}, None]) == \
+        [(T0, 3.0), (T0 + DAY_MS, 2.0)]
+
+
+def test_incremental_fetch():
+    history = [{'t': T0 + i * DAY_MS, 'v': float(i)} for i in range(500)]
+    calls = []
+
+    def fetch(start):
+        calls.append(start)
+        # the API may ignore startTime and return everything: only newer points are kept
+        return history[:available]
+
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, 's.json')
+        available = 400
+        cache = SeriesCache('mvrv_z', path=path)
+        assert cache.update(fetch, now_ms=T0 + 400 * DAY_MS) == 400
+
+        # restart: the cache is less than a day old, no request
+        cache = SeriesCache('mvrv_z', path=path)
+        assert cache.update(fetch, now_ms=T0 + 399 * DAY_MS + 3600_000) == 0
+        assert calls == [None]
+
+        available = 402
+        assert cache.update(fetch, now_ms=T0 + 402 * DAY_MS) == 2
+        assert calls[-1] == T0 + 399 * DAY_MS + 1
+        assert cache.latest() == 401.0 and len(SeriesCache('mvrv_z', path=path).values()) == 402
+
+        assert percentile_rank(cache.values(), 401.0) == 100
+        assert percentile_rank(cache.values(), 200.5) == 201 / 402 * 100
+
+
+if __name__ == "__main__":
+    test_parse_formats()
+    test_incremental_fetch()
+    print("[TEST] series_cache OK")